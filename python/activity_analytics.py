@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Activity Analytics - Vectorized aggregates over the columnar activity export
+
+Aggregates for multi-month views (weekday/hour heatmaps, category
+timelines, week-over-week comparisons, app totals) are computed with NumPy
+over the memory-mapped month partitions written by activity_export. Only the
+months overlapping the requested days are opened, and they are processed in
+fixed-size chunks of rows, so memory stays bounded however long the history
+is. Intervals are split at hour boundaries first, so time is credited to the
+hours (and days) it actually covered.
+'''
+
+from datetime import date, timedelta
+
+import activity_export
+
+# Rows processed per vectorized step
+CHUNK_ROWS = 1 << 20
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+_EPOCH_DAY = date(1970, 1, 1)
+
+def _day_number(day):
+    """Days since 1970-01-01 for a YYYY-MM-DD string or date"""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return (day - _EPOCH_DAY).days
+
+def _weekday(day_numbers):
+    # 1970-01-01 was a Thursday; Monday is 0
+    return (day_numbers + 3) % 7
+
+def _months_between(start_day, end_day):
+    """
+    YYYY-MM names of the months covering a day range, plus the month before
+    (its last intervals can run into the range)
+    """
+    first = date.fromisoformat(start_day).replace(day=1) - timedelta(days=1)
+    last = date.fromisoformat(end_day)
+    months = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def hour_pieces(start, duration, low, high, values=()):
+    """
+    Split intervals at hour boundaries, clipped to [low, high) seconds.
+
+    Returns (hours, seconds, values): the absolute hour number of each piece,
+    the seconds it covers, and each array in `values` (one entry per
+    interval) expanded to one entry per piece. Most intervals lie within one
+    hour and inside the range, so those are passed through without copying.
+    """
+    import numpy as np
+
+    start = np.asarray(start, dtype=np.int64)
+    seconds = np.asarray(duration, dtype=np.int64)
+    if seconds.min() < 0:
+        seconds = np.maximum(seconds, 0)
+    end = start + seconds
+
+    if start.min() < low or end.max() > high:
+        start = np.maximum(start, low)
+        seconds = np.minimum(end, high) - start
+        keep = np.flatnonzero(seconds > 0)
+        start, seconds = start[keep], seconds[keep]
+        values = [np.asarray(column)[keep] for column in values]
+        end = start + seconds
+
+    hours = start // 3600
+    # Cheaper than a second division: an interval spans hours if it runs past its first one
+    spanning = np.flatnonzero(start - hours * 3600 + seconds > 3600)
+    if not len(spanning):
+        return hours, seconds, values
+
+    # Intervals crossing an hour boundary keep their first piece in place;
+    # the pieces for the following hours are appended
+    first_hours = hours[spanning]
+    counts = (end[spanning] - 1) // 3600 - first_hours
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    extra_hours = np.repeat(first_hours, counts) + offsets + 1
+    extra_seconds = np.minimum((extra_hours + 1) * 3600, np.repeat(end[spanning], counts)) - extra_hours * 3600
+
+    seconds = seconds.copy()
+    seconds[spanning] = (first_hours + 1) * 3600 - start[spanning]
+    values = [np.concatenate([column, np.repeat(np.asarray(column)[spanning], counts)]) for column in values]
+    return np.concatenate([hours, extra_hours]), np.concatenate([seconds, extra_seconds]), values
+
+def _hour_totals(hours, seconds, keys=None, key_count=1):
+    """
+    Sum seconds per (hour, key) into a small array covering just the hours
+    present: returns (first hour, array of shape (hours, key_count))
+    """
+    import numpy as np
+
+    first = int(hours.min())
+    cells = hours - first
+    if keys is not None:
+        cells = cells * key_count + keys
+    span = int(hours.max()) - first + 1
+    totals = np.bincount(cells, weights=seconds, minlength=span * key_count)
+    return first, totals.reshape(span, key_count)
+
+class ActivityAnalytics:
+    """Aggregates over a ColumnarExport"""
+
+    def __init__(self, export=None, chunk_rows=CHUNK_ROWS):
+        self.export = export or activity_export.ColumnarExport()
+        self.chunk_rows = chunk_rows
+
+    def _pieces(self, start_day, end_day, columns=()):
+        """
+        Yield (hours, seconds, [values per piece for each column]) for every
+        chunk of intervals overlapping start_day..end_day (inclusive)
+        """
+        low = _day_number(start_day) * 86400
+        high = (_day_number(end_day) + 1) * 86400
+        for month in _months_between(start_day, end_day):
+            rows = self.export.months.get(month, 0)
+            if not rows:
+                continue
+            starts = self.export.column(month, "start")
+            durations = self.export.column(month, "duration")
+            extra = [self.export.column(month, column) for column in columns]
+            for offset in range(0, rows, self.chunk_rows):
+                chunk = slice(offset, offset + self.chunk_rows)
+                hours, seconds, values = hour_pieces(starts[chunk], durations[chunk], low, high,
+                                                     [column[chunk] for column in extra])
+                if len(hours):
+                    yield hours, seconds, values
+
+    def heatmap(self, start_day, end_day):
+        """Seconds per weekday (rows, Monday first) and hour of day (columns), as a 7x24 array"""
+        import numpy as np
+
+        totals = np.zeros(7 * 24)
+        for hours, seconds, _ in self._pieces(start_day, end_day):
+            first, per_hour = _hour_totals(hours, seconds)
+            absolute = np.arange(first, first + len(per_hour))
+            cells = _weekday(absolute // 24) * 24 + absolute % 24
+            totals += np.bincount(cells, weights=per_hour[:, 0], minlength=7 * 24)
+        return totals.astype(np.int64).reshape(7, 24)
+
+    def category_timeline(self, start_day, end_day):
+        """Seconds per day (rows) and category id (columns)"""
+        import numpy as np
+
+        first_day = _day_number(start_day)
+        categories = len(self.export.dictionaries["category"])
+        totals = np.zeros((_day_number(end_day) - first_day + 1, categories))
+        for hours, seconds, (category,) in self._pieces(start_day, end_day, ("category",)):
+            first, per_hour = _hour_totals(hours, seconds, category, categories)
+            days = np.arange(first, first + len(per_hour)) // 24 - first_day
+            np.add.at(totals, days, per_hour)
+        return totals.astype(np.int64)
+
+    def weekly_categories(self, start_day, end_day):
+        """
+        Seconds per week (rows, Monday-based, the first one containing
+        start_day) and category id (columns)
+        """
+        import numpy as np
+
+        timeline = self.category_timeline(start_day, end_day)
+        # Pad the front so rows line up with Mondays, then fold days into weeks
+        lead = int(_weekday(_day_number(start_day)))
+        tail = -(lead + len(timeline)) % 7
+        padded = np.pad(timeline, ((lead, tail), (0, 0)))
+        return padded.reshape(len(padded) // 7, 7, timeline.shape[1]).sum(axis=1)
+
+    def app_totals(self, start_day, end_day):
+        """Seconds per app id"""
+        import numpy as np
+
+        apps = len(self.export.dictionaries["app"])
+        totals = np.zeros(apps)
+        for _, seconds, (app,) in self._pieces(start_day, end_day, ("app",)):
+            totals += np.bincount(app, weights=seconds, minlength=apps)
+        return totals.astype(np.int64)
+
+def _named(values, names):
+    """{name: value} for the non-zero entries of a per-id array"""
+    return {names[i]: int(values[i]) for i in values.nonzero()[0]}
+
+def summarize(kind, start_day, end_day, export=None):
+    """JSON-ready result of one aggregate for the CLI"""
+    analytics = ActivityAnalytics(export)
+    names = analytics.export.dictionaries
+    result = {"kind": kind, "start_day": start_day, "end_day": end_day}
+
+    if kind == "heatmap":
+        heatmap = analytics.heatmap(start_day, end_day)
+        result["heatmap"] = {WEEKDAYS[i]: heatmap[i].tolist() for i in range(7)}
+    elif kind == "timeline":
+        timeline = analytics.category_timeline(start_day, end_day)
+        first = date.fromisoformat(start_day)
+        result["timeline"] = {(first + timedelta(days=i)).isoformat(): _named(row, names["category"])
+                              for i, row in enumerate(timeline)}
+    elif kind == "weeks":
+        weeks = analytics.weekly_categories(start_day, end_day)
+        monday = date.fromisoformat(start_day) - timedelta(days=int(_weekday(_day_number(start_day))))
+        result["weeks"] = []
+        previous = None
+        for i, row in enumerate(weeks):
+            total = int(row.sum())
+            week = {"week_start": (monday + timedelta(weeks=i)).isoformat(), "total": total,
+                    "categories": _named(row, names["category"])}
+            if previous:
+                week["change"] = round((total - previous) / previous, 4)
+            result["weeks"].append(week)
+            previous = total
+    elif kind == "apps":
+        totals = analytics.app_totals(start_day, end_day)
+        order = totals.argsort()[::-1]
+        result["apps"] = [[names["app"][i], int(totals[i])] for i in order if totals[i]]
+    else:
+        raise ValueError(f"Unknown analytics kind: {kind}")
+    return result
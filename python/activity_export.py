@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Activity Export - Columnar, month-partitioned copy of the activities table
+
+Multi-month views would otherwise walk every activities row in SQLite. The
+export keeps a columnar copy under data/columnar: one directory per month
+(YYYY-MM, by start time) holding one flat binary file per column, which
+analytics can memory-map with NumPy instead of loading. App names, window
+titles and categories are dictionary-encoded into integer ids shared by all
+months; times are int64 seconds of local wall-clock time since 1970-01-01,
+the same clock the Kotlin monitor writes.
+
+Exports are incremental: only activities with an id above the last exported
+one are read, and their values are appended to the month files. The
+manifest is replaced atomically after the data is written, and files are
+cut back to the manifest's row counts before appending, so an interrupted
+export never leaves rows the manifest doesn't account for.
+
+NumPy is only needed here and in activity_analytics.
+'''
+
+import os
+import json
+from datetime import datetime
+
+import activity_sampler
+import diagnostics
+from activity_report import parse_timestamp
+from icon_cache import DATA_DIR
+
+EXPORT_DIR = os.path.join(DATA_DIR, "columnar")
+MANIFEST_FILE = "manifest.json"
+DICTIONARY_FILE = "dictionaries.json"
+
+# Column name -> NumPy dtype; every month directory has one <name>.bin per column
+COLUMNS = {
+    "id": "int64",
+    "start": "int64",
+    "duration": "int64",
+    "app": "int32",
+    "title": "int32",
+    "category": "int32",
+}
+
+# Dictionary-encoded columns and the activities field each one comes from
+DICTIONARY_COLUMNS = {"app": "app_name", "title": "window_title", "category": "category"}
+
+# Rows fetched from SQLite per round trip
+FETCH_SIZE = 100000
+
+_EPOCH = datetime(1970, 1, 1)
+
+def to_seconds(value):
+    """Local wall-clock seconds since 1970-01-01 for an activities timestamp"""
+    return int((parse_timestamp(value) - _EPOCH).total_seconds())
+
+def require_numpy():
+    """Raise a readable error if NumPy, which the export and analytics need, is missing"""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("The columnar export needs numpy (pip install numpy)")
+
+def _write_json(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as json_file:
+        json.dump(data, json_file)
+    os.replace(temp_path, path)
+
+def _read_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as json_file:
+            return json.load(json_file)
+    except FileNotFoundError:
+        return default
+
+class ColumnarExport:
+    """The on-disk export: manifest, dictionaries and month partitions"""
+
+    def __init__(self, root=EXPORT_DIR):
+        self.root = root
+        manifest = _read_json(os.path.join(root, MANIFEST_FILE), {})
+        self.last_activity_id = manifest.get("last_activity_id", 0)
+        # Month ("YYYY-MM") -> row count
+        self.months = manifest.get("months", {})
+        self.dictionaries = _read_json(os.path.join(root, DICTIONARY_FILE),
+                                       {name: [] for name in DICTIONARY_COLUMNS})
+        self._ids = {name: {value: i for i, value in enumerate(values)}
+                     for name, values in self.dictionaries.items()}
+
+    def column_path(self, month, column):
+        return os.path.join(self.root, month, f"{column}.bin")
+
+    def encode(self, name, value):
+        """Dictionary id for a value, adding it if new"""
+        ids = self._ids[name]
+        code = ids.get(value)
+        if code is None:
+            code = ids[value] = len(self.dictionaries[name])
+            self.dictionaries[name].append(value)
+        return code
+
+    def column(self, month, column):
+        """Read-only memory map of one column of a month (empty if there are no rows)"""
+        import numpy as np
+
+        rows = self.months.get(month, 0)
+        if rows == 0:
+            return np.empty(0, dtype=COLUMNS[column])
+        return np.memmap(self.column_path(month, column), dtype=COLUMNS[column], mode='r', shape=(rows,))
+
+    def month_columns(self, month):
+        """All columns of a month as {name: memmap}"""
+        return {column: self.column(month, column) for column in COLUMNS}
+
+    def _append(self, month, columns):
+        """Append {column: array} to a month's files, after dropping any unrecorded tail"""
+        import numpy as np
+
+        os.makedirs(os.path.join(self.root, month), exist_ok=True)
+        recorded = self.months.get(month, 0)
+        for column, dtype in COLUMNS.items():
+            path = self.column_path(month, column)
+            with open(path, 'ab') as column_file:
+                column_file.truncate(recorded * np.dtype(dtype).itemsize)
+                np.asarray(columns[column], dtype=dtype).tofile(column_file)
+        self.months[month] = recorded + len(columns["id"])
+
+    def _save_metadata(self):
+        os.makedirs(self.root, exist_ok=True)
+        # Dictionaries first: the manifest must never reference ids they don't have
+        _write_json(os.path.join(self.root, DICTIONARY_FILE), self.dictionaries)
+        _write_json(os.path.join(self.root, MANIFEST_FILE),
+                    {"last_activity_id": self.last_activity_id, "months": self.months})
+
+    def append_rows(self, rows):
+        """
+        Encode and append (id, app_name, window_title, start_time, duration,
+        category) rows, partitioned by the month they start in
+        """
+        by_month = {}
+        for activity_id, app_name, window_title, start_time, duration, category in rows:
+            try:
+                start = to_seconds(start_time)
+            except ValueError:
+                diagnostics.report(f"Skipping activity {activity_id} with bad start time: {start_time}")
+                continue
+            month = start_time[:7]
+            columns = by_month.get(month)
+            if columns is None:
+                columns = by_month[month] = {column: [] for column in COLUMNS}
+            columns["id"].append(activity_id)
+            columns["start"].append(start)
+            columns["duration"].append(duration or 0)
+            columns["app"].append(self.encode("app", app_name))
+            columns["title"].append(self.encode("title", window_title))
+            columns["category"].append(self.encode("category", category or "Unknown"))
+
+        for month, columns in by_month.items():
+            self._append(month, columns)
+        return sum(len(columns["id"]) for columns in by_month.values())
+
+    def update(self, conn, fetch_size=FETCH_SIZE):
+        """Append activities newer than the last export; returns the number of rows added"""
+        added = 0
+        cursor = conn.execute(
+            "SELECT id, app_name, window_title, start_time, duration, category FROM activities "
+            "WHERE id > ? ORDER BY id", (self.last_activity_id,))
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            added += self.append_rows(rows)
+            self.last_activity_id = rows[-1][0]
+            self._save_metadata()
+        return added
+
+    def stats(self):
+        return {
+            "root": self.root,
+            "last_activity_id": self.last_activity_id,
+            "months": self.months,
+            "rows": sum(self.months.values()),
+            "dictionary_sizes": {name: len(values) for name, values in self.dictionaries.items()},
+        }
+
+def export_activities(db_path=activity_sampler.DB_PATH, root=EXPORT_DIR, rebuild=False):
+    """Bring the columnar export up to date with the activity database"""
+    if rebuild and os.path.isdir(root):
+        import shutil
+        shutil.rmtree(root)
+
+    export = ColumnarExport(root)
+    conn = activity_sampler.connect(db_path)
+    try:
+        added = export.update(conn)
+    finally:
+        conn.close()
+    return dict(export.stats(), added=added)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Activity Report - Rollup tables and text reports for tracked activity
+
+Reports used to be recomputed from every raw activities row. Instead, two
+rollup tables are kept up to date incrementally: daily_app_usage (seconds
+per day and app) and hourly_category_usage (seconds per day, hour and
+category). Each update only reads activities newer than the last processed
+id, so a report for any day or range is a few indexed lookups regardless of
+how much history there is. Time is attributed to the hours (and days) it
+actually covered, so intervals spanning midnight are split.
+
+Reports keep the plain-text daily_report_<date>.txt format.
+'''
+
+import os
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import activity_sampler
+import diagnostics
+from icon_cache import DATA_DIR
+
+REPORTS_DIR = os.path.join(DATA_DIR, "reports")
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS daily_app_usage (
+        day TEXT NOT NULL,
+        app_name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        seconds INTEGER NOT NULL,
+        PRIMARY KEY (day, app_name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS hourly_category_usage (
+        day TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        seconds INTEGER NOT NULL,
+        PRIMARY KEY (day, hour, category)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        last_activity_id INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_activities_start_time ON activities (start_time)",
+    "CREATE INDEX IF NOT EXISTS idx_activities_app_name ON activities (app_name)",
+    "CREATE INDEX IF NOT EXISTS idx_hourly_category_usage_category ON hourly_category_usage (category, day)",
+]
+
+ROLLUP_NAME = "usage"
+
+_FRACTION = re.compile(r"(\.\d{6})\d+")
+
+def parse_timestamp(value):
+    """Parse an ISO_LOCAL_DATE_TIME timestamp (Java may write 7+ fractional digits)"""
+    return datetime.fromisoformat(_FRACTION.sub(r"\1", value))
+
+def split_by_hour(start, seconds):
+    """Yield (day, hour, seconds) pieces of an interval starting at `start`"""
+    remaining = seconds
+    cursor = start
+    while remaining > 0:
+        next_hour = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        piece = min(remaining, (next_hour - cursor).total_seconds())
+        yield cursor.date().isoformat(), cursor.hour, piece
+        remaining -= piece
+        cursor = next_hour
+
+def connect(db_path=activity_sampler.DB_PATH):
+    """Open the activity database with the rollup tables and indexes in place"""
+    conn = activity_sampler.connect(db_path)
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    return conn
+
+def update_rollups(conn, rebuild=False):
+    """
+    Fold activities added since the last update into the rollup tables.
+    Returns the number of activities processed.
+    """
+    with conn:
+        if rebuild:
+            conn.execute("DELETE FROM daily_app_usage")
+            conn.execute("DELETE FROM hourly_category_usage")
+            conn.execute("DELETE FROM rollup_state WHERE name = ?", (ROLLUP_NAME,))
+
+        row = conn.execute("SELECT last_activity_id FROM rollup_state WHERE name = ?", (ROLLUP_NAME,)).fetchone()
+        last_id = row[0] if row else 0
+
+        daily = defaultdict(float)
+        daily_category = {}
+        hourly = defaultdict(float)
+        processed = 0
+
+        for activity_id, app_name, start_time, duration, category in conn.execute(
+                "SELECT id, app_name, start_time, duration, category FROM activities WHERE id > ? ORDER BY id",
+                (last_id,)):
+            category = category or "Unknown"
+            try:
+                start = parse_timestamp(start_time)
+            except ValueError:
+                diagnostics.report(f"Skipping activity {activity_id} with bad start time: {start_time}")
+                continue
+
+            for day, hour, seconds in split_by_hour(start, duration or 0):
+                daily[(day, app_name)] += seconds
+                daily_category[(day, app_name)] = category
+                hourly[(day, hour, category)] += seconds
+            last_id = activity_id
+            processed += 1
+
+        conn.executemany(
+            "INSERT INTO daily_app_usage (day, app_name, category, seconds) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (day, app_name) DO UPDATE SET "
+            "seconds = seconds + excluded.seconds, category = excluded.category",
+            [(day, app_name, daily_category[(day, app_name)], round(seconds))
+             for (day, app_name), seconds in daily.items()])
+        conn.executemany(
+            "INSERT INTO hourly_category_usage (day, hour, category, seconds) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (day, hour, category) DO UPDATE SET seconds = seconds + excluded.seconds",
+            [(day, hour, category, round(seconds)) for (day, hour, category), seconds in hourly.items()])
+        conn.execute(
+            "INSERT OR REPLACE INTO rollup_state (name, last_activity_id) VALUES (?, ?)",
+            (ROLLUP_NAME, last_id))
+
+    return processed
+
+def app_usage(conn, start_day, end_day):
+    """
+    [(app_name, category, seconds)] for a day range, longest first. An app
+    recategorized within the range is listed under its category on the
+    latest day, like each day's row is under its latest category.
+    """
+    return conn.execute(
+        """
+        SELECT app_name, category, total FROM (
+            SELECT app_name, category,
+                   SUM(seconds) OVER (PARTITION BY app_name) AS total,
+                   ROW_NUMBER() OVER (PARTITION BY app_name ORDER BY day DESC) AS recency
+            FROM daily_app_usage
+            WHERE day BETWEEN ? AND ?
+        )
+        WHERE recency = 1
+        ORDER BY total DESC, app_name DESC
+        """, (start_day, end_day)).fetchall()
+
+def category_usage(conn, start_day, end_day):
+    """[(category, seconds)] for a day range, longest first"""
+    return conn.execute(
+        """
+        SELECT category, SUM(seconds) AS total
+        FROM hourly_category_usage
+        WHERE day BETWEEN ? AND ?
+        GROUP BY category
+        ORDER BY total DESC, category
+        """, (start_day, end_day)).fetchall()
+
+def format_duration(seconds):
+    """HH:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def _percentage(seconds, total):
+    return f"{(seconds / total * 100) if total else 0:.2f}%"
+
+def render_report(title, apps, categories):
+    """Render the plain-text report"""
+    total = sum(seconds for _, _, seconds in apps)
+    category_total = sum(seconds for _, seconds in categories)
+
+    lines = [
+        f"ACTIVITY REPORT FOR {title}",
+        "=" * 40,
+        "",
+        f"Total computer usage time: {format_duration(total)}",
+        "",
+        "APPLICATION DETAILS:",
+        "-" * 70,
+        f"{'Application':<30} {'Category':<15} {'Time':<15} Percentage",
+        "-" * 70,
+    ]
+    for app_name, category, seconds in apps:
+        lines.append(f"{app_name:<30} {category:<15} {format_duration(seconds):<15} {_percentage(seconds, total)}")
+
+    lines += [
+        "",
+        "",
+        "CATEGORY SUMMARY:",
+        "-" * 50,
+        f"{'Category':<20} {'Time':<15} Percentage",
+        "-" * 50,
+    ]
+    for category, seconds in categories:
+        lines.append(f"{category:<20} {format_duration(seconds):<15} {_percentage(seconds, category_total)}")
+
+    return "\n".join(lines) + "\n"
+
+def generate_report(start_day=None, end_day=None, db_path=activity_sampler.DB_PATH, rebuild=False):
+    """Bring the rollups up to date and render the report for a day or range"""
+    start_day = start_day or date.today().isoformat()
+    end_day = end_day or start_day
+
+    conn = connect(db_path)
+    try:
+        update_rollups(conn, rebuild=rebuild)
+        apps = app_usage(conn, start_day, end_day)
+        categories = category_usage(conn, start_day, end_day)
+    finally:
+        conn.close()
+
+    title = start_day if start_day == end_day else f"{start_day} TO {end_day}"
+    return render_report(title, apps, categories)
+
+def report_path(start_day, end_day=None):
+    """Where a report is saved: daily_report_<day>.txt, or range_report_<start>_<end>.txt"""
+    if not end_day or end_day == start_day:
+        return os.path.join(REPORTS_DIR, f"daily_report_{start_day}.txt")
+    return os.path.join(REPORTS_DIR, f"range_report_{start_day}_{end_day}.txt")
+
+def save_report(text, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as report_file:
+        report_file.write(text)
+    return path
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Activity Sampler - Run-length coalesced activity intervals with batched writes
+
+Samples the active window about once a second, but only keeps the current
+(app, title, category) interval in memory and extends it while the sample
+stays the same. When the sample changes, the interval is closed and queued;
+queued intervals are written to the activities table of
+data/activity_tracker.db in one transaction per flush (WAL mode), whenever
+enough have accumulated, enough time has passed, or the sampler shuts down.
+
+While the user is idle or the screen is locked (see idle_state) the open
+interval is ended at the last input instead of growing, nothing is
+recorded, and sampling backs off to the idle interval. Each change between
+active, idle and locked is written to system_events.
+
+The sample source is any callable returning an active_window_info-style
+dict, so the sampler can be driven by a stub instead of a real desktop.
+'''
+
+import os
+import time
+import signal
+import sqlite3
+from datetime import datetime, timedelta
+
+import diagnostics
+import idle_state
+from icon_cache import DATA_DIR
+
+DB_PATH = os.environ.get("ACTIVITY_TRACKER_DB", os.path.join(DATA_DIR, "activity_tracker.db"))
+
+DEFAULT_SAMPLE_INTERVAL = 1.0
+# Flush when this many intervals are queued, or this many seconds have passed
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 60.0
+# A gap this many sample intervals long (e.g. a suspended machine) ends the
+# current interval at the last sample instead of stretching it over the gap
+MAX_GAP_SAMPLES = 5
+
+# Same schema the Kotlin DatabaseManager creates
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS activities (
+        id INTEGER PRIMARY KEY,
+        app_name TEXT NOT NULL,
+        window_title TEXT NOT NULL,
+        start_time TIMESTAMP NOT NULL,
+        end_time TIMESTAMP NOT NULL,
+        duration INTEGER NOT NULL,
+        category TEXT DEFAULT "Unknown"
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS system_events (
+        id INTEGER PRIMARY KEY,
+        event_type TEXT NOT NULL,
+        timestamp TIMESTAMP NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS app_categories (
+        id INTEGER PRIMARY KEY,
+        app_name TEXT UNIQUE NOT NULL,
+        category TEXT NOT NULL
+    )
+    """,
+]
+
+def connect(db_path=DB_PATH):
+    """Open the activity database in WAL mode, creating the tables if needed"""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10)
+    # WAL lets the app keep reading while we write; NORMAL sync is durable enough with WAL
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    return conn
+
+class ActivityWriter:
+    """Writes closed intervals and system events, one transaction per batch"""
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._conn = None
+        self.rows_written = 0
+        self.flushes = 0
+
+    def write(self, intervals, events=()):
+        if not intervals and not events:
+            return
+        if self._conn is None:
+            self._conn = connect(self.db_path)
+
+        rows = [(i["app_name"], i["window_title"], i["start"].isoformat(), i["end"].isoformat(),
+                 duration_seconds(i), i["category"]) for i in intervals]
+        categories = {i["app_name"]: i["category"] for i in intervals if i["category"] != "Unknown"}
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO activities (app_name, window_title, start_time, end_time, duration, category) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO app_categories (app_name, category) VALUES (?, ?)",
+                categories.items())
+            self._conn.executemany(
+                "INSERT INTO system_events (event_type, timestamp) VALUES (?, ?)",
+                [(event_type, timestamp.isoformat()) for event_type, timestamp in events])
+
+        self.rows_written += len(rows)
+        self.flushes += 1
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def duration_seconds(interval):
+    """Whole seconds covered by an interval, as the Kotlin monitor records them"""
+    return int((interval["end"] - interval["start"]).total_seconds())
+
+class ActivitySampler:
+    """
+    Coalesces consecutive identical samples into intervals and hands closed
+    intervals, and idle/lock transitions, to `write` in batches.
+    """
+
+    def __init__(self, read_sample, write, interval=DEFAULT_SAMPLE_INTERVAL, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, clock=datetime.now):
+        self.read_sample = read_sample
+        self.write = write
+        self.interval = interval
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.current = None
+        self.pending = []
+        self.pending_events = []
+        self.samples = 0
+        self._last_flush = None
+        self._running = False
+
+    def _close_current(self):
+        if self.current is not None and duration_seconds(self.current) > 0:
+            self.pending.append(self.current)
+        self.current = None
+
+    def observe(self, sample, now):
+        """Feed one sample taken at `now` (a datetime)"""
+        self.samples += 1
+        if self._last_flush is None:
+            self._last_flush = now
+
+        idle = sample.get("idle_state")
+        if idle is not None and idle["changed"]:
+            self.pending_events.append((idle["state"], datetime.fromisoformat(idle["since"])))
+        if idle is not None and idle["state"] != idle_state.ACTIVE:
+            # Away since the last input (or the lock): end the interval there
+            if self.current is not None:
+                since = datetime.fromisoformat(idle["since"])
+                self.current["end"] = max(self.current["start"], min(self.current["end"], since))
+                self._close_current()
+            if self.flush_due(now):
+                self.flush(now)
+            return
+
+        key = (sample.get("app_name", ""), sample.get("window_title", ""), sample.get("category") or "Unknown")
+        current = self.current
+
+        if current is not None and now - current["end"] > timedelta(seconds=self.interval * MAX_GAP_SAMPLES):
+            # Nothing was sampled for a while; don't credit the gap to this app
+            self._close_current()
+            current = None
+
+        if current is not None and (current["app_name"], current["window_title"], current["category"]) == key:
+            current["end"] = now
+        else:
+            if current is not None:
+                current["end"] = now
+                self._close_current()
+            if key[0]:
+                self.current = {"app_name": key[0], "window_title": key[1], "category": key[2],
+                                "start": now, "end": now}
+
+        if self.flush_due(now):
+            self.flush(now)
+
+    def flush_due(self, now):
+        if not self.pending and not self.pending_events:
+            return False
+        return (len(self.pending) >= self.batch_size
+                or (now - self._last_flush).total_seconds() >= self.flush_interval)
+
+    def flush(self, now=None):
+        """Write all queued intervals and events in one batch"""
+        self._last_flush = now or self.clock()
+        if not self.pending and not self.pending_events:
+            return
+        batch, self.pending = self.pending, []
+        events, self.pending_events = self.pending_events, []
+        try:
+            self.write(batch, events)
+        except Exception as e:
+            # Keep the intervals for the next attempt rather than losing them
+            diagnostics.report(f"Error writing activities: {str(e)}")
+            self.pending = batch + self.pending
+            self.pending_events = events + self.pending_events
+
+    def shutdown(self):
+        """Close the open interval at the current time and flush everything"""
+        if self.current is not None:
+            self.current["end"] = self.clock()
+            self._close_current()
+        self.flush()
+
+    def next_interval(self, sample):
+        """Seconds until the next sample: the idle interval while the user is away"""
+        idle = sample.get("idle_state")
+        if idle is not None and idle["state"] != idle_state.ACTIVE:
+            return max(self.interval, idle["next_interval_s"])
+        return self.interval
+
+    def stop(self, *args):
+        self._running = False
+
+    def run(self, max_samples=None):
+        """Sample until stopped (SIGINT/SIGTERM, or max_samples), then flush"""
+        self._running = True
+        try:
+            while self._running:
+                started = time.monotonic()
+                try:
+                    sample = self.read_sample()
+                except Exception as e:
+                    diagnostics.report(f"Error reading sample: {str(e)}")
+                    sample = {}
+                self.observe(sample, self.clock())
+
+                if max_samples is not None and self.samples >= max_samples:
+                    break
+                time.sleep(max(self.next_interval(sample) - (time.monotonic() - started), 0))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+def sample_active_window():
+    """
+    Default sample source: the idle state, and unless the user is away the
+    active window (without icon lookup)
+    """
+    from window_utils import active_window_info
+    idle = idle_state.get_default_monitor().check()
+    if idle["state"] != idle_state.ACTIVE:
+        return {"idle_state": idle}
+    return dict(active_window_info(include_icon=False), idle_state=idle)
+
+def run_sampler(interval=DEFAULT_SAMPLE_INTERVAL, batch_size=DEFAULT_BATCH_SIZE,
+                flush_interval=DEFAULT_FLUSH_INTERVAL, db_path=DB_PATH, read_sample=sample_active_window):
+    """Sample the active window into the activity database until interrupted or terminated"""
+    writer = ActivityWriter(db_path)
+    sampler = ActivitySampler(read_sample, writer.write, interval=interval, batch_size=batch_size,
+                              flush_interval=flush_interval)
+    signal.signal(signal.SIGTERM, sampler.stop)
+    try:
+        sampler.run()
+    finally:
+        writer.close()
+    return {"samples": sampler.samples, "rows_written": writer.rows_written, "flushes": writer.flushes}
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+App Categorizer - Category lookup over a normalized index of app_categories.json
+
+Keys in app_categories.json are a mix of bare executable names and full
+paths that embed version directories (...\\discord\\app-1.0.9190\\discord.exe),
+which stop matching after every update. Keys are indexed in normalized form:
+lowercased, with "/" separators and version segments stripped from the
+directories, plus the bare file name (with and without ".exe") so a path
+entry still covers the plain app name. Keys starting with "re:" are regular
+expressions (matched from the start of the normalized key) and keys
+containing * or ? are globs; all of them are compiled into one matcher,
+tried in file order.
+
+When none of those match, the remaining steps are the ones of the Kotlin
+AppCategorizer.getCategory, in its order, so both sides record the same
+category for an app: a partial match against the known apps (either name
+containing the other), the keyword heuristics, explorer.exe/Finder as
+Utility, any other .exe as Utility, and otherwise Unknown. They run on the
+normalized name where Kotlin uses the lowercased one, which only differs
+for version directories and path separators.
+
+Lookups are memoized per app name, and the file is only reloaded when its
+mtime changes.
+'''
+
+import os
+import re
+import json
+import time
+import fnmatch
+import threading
+
+import diagnostics
+from icon_cache import DATA_DIR
+
+CATEGORIES_FILE = os.environ.get("ACTIVITY_TRACKER_CATEGORIES", os.path.join(DATA_DIR, "app_categories.json"))
+
+UNKNOWN = "Unknown"
+
+# Seconds between checks of the categories file's mtime
+RELOAD_CHECK_INTERVAL = 2.0
+
+# A directory segment's version suffix: "app-1.0.9190", "zalo-25.4.2", "0.275.0.13",
+# "intellij idea 2024.3.1.1", "spotifymusic_1.262.580.0_x64__zpdnekdrzrea0"
+_VERSION_SUFFIX = re.compile(r"[-_. ]*v?\d+(?:\.\d+)+.*$")
+
+# Keyword heuristics, in the same order as the Kotlin AppCategorizer
+HEURISTICS = [
+    ("Browser", ["chrome", "firefox", "edge", "opera", "safari", "brave"]),
+    ("Development", ["code", "studio", "edit", "ide", "notepad", "vim", "emacs", "compiler", "terminal",
+                     "python", "java", "node", "npm"]),
+    ("Productivity", ["word", "excel", "powerpoint", "ppt", "doc", "spreadsheet", "calc", "write", "office",
+                      "libre", "outlook", "mail", "acrobat", "pdf"]),
+    ("Entertainment", ["play", "media", "vlc", "netflix", "spotify", "music", "video", "audio", "game", "steam",
+                       "player", "movie", "tv"]),
+    ("Communication", ["chat", "talk", "meet", "zoom", "teams", "skype", "discord", "slack", "messenger",
+                       "whatsapp", "telegram", "signal", "claude"]),
+]
+
+def normalize_path(app_name):
+    """Lowercase, use "/" separators and strip version suffixes from directory segments"""
+    parts = app_name.strip().lower().replace("\\", "/").split("/")
+    directories = []
+    for segment in parts[:-1]:
+        segment = _VERSION_SUFFIX.sub("", segment)
+        if segment:
+            directories.append(segment)
+    return "/".join(directories + parts[-1:])
+
+def _stem(name):
+    return name[:-4] if name.endswith(".exe") else name
+
+def _compile_patterns(patterns):
+    """
+    Compile (regex, category) pairs into one alternation of named groups;
+    returns (matcher, {group name: category}) or (None, {})
+    """
+    if not patterns:
+        return None, {}
+    groups = {}
+    alternatives = []
+    for index, (pattern, category) in enumerate(patterns):
+        name = f"r{index}"
+        groups[name] = category
+        alternatives.append(f"(?P<{name}>{pattern})")
+    return re.compile("|".join(alternatives)), groups
+
+def _heuristic_patterns():
+    # ".*?" lets each keyword list match anywhere while the lists keep their priority order
+    return [(".*?(?:" + "|".join(re.escape(word) for word in words) + ")", category)
+            for category, words in HEURISTICS]
+
+class AppCategorizer:
+    """Normalized, memoized category lookup that follows changes to the categories file"""
+
+    def __init__(self, path=CATEGORIES_FILE):
+        self.path = path
+        self._loaded = False
+        self._mtime = None
+        self._next_check = 0
+        self._paths = {}
+        self._names = {}
+        # (normalized key, category) of the plain keys, in file order
+        self._partials = []
+        self._rules = None
+        self._rule_groups = {}
+        self._heuristics, self._heuristic_groups = _compile_patterns(_heuristic_patterns())
+        self._memo = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as categories_file:
+                entries = json.load(categories_file)
+        except (OSError, ValueError) as e:
+            diagnostics.report(f"Error loading app categories: {str(e)}")
+            entries = {}
+
+        paths = {}
+        names = {}
+        path_names = {}
+        rules = []
+        partials = []
+        for key, category in entries.items():
+            if key.startswith("re:"):
+                rules.append((key[3:], category))
+            elif "*" in key or "?" in key:
+                rules.append((fnmatch.translate(normalize_path(key)), category))
+            else:
+                normalized = normalize_path(key)
+                if normalized:
+                    partials.append((normalized, category))
+                name = normalized.rsplit("/", 1)[-1]
+                if "/" in normalized:
+                    paths[normalized] = category
+                    # A path entry also covers the bare name, unless that has its own entry
+                    path_names.setdefault(name, category)
+                else:
+                    names[name] = category
+
+        for name, category in path_names.items():
+            names.setdefault(name, category)
+        for name, category in list(names.items()):
+            names.setdefault(_stem(name), category)
+
+        try:
+            self._rules, self._rule_groups = _compile_patterns(rules)
+        except re.error as e:
+            diagnostics.report(f"Invalid app category rule: {str(e)}")
+            self._rules, self._rule_groups = None, {}
+        self._paths = paths
+        self._names = names
+        self._partials = partials
+        self._memo = {}
+
+    def _refresh(self):
+        """Reload the index if the file changed, checking at most every RELOAD_CHECK_INTERVAL"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + RELOAD_CHECK_INTERVAL
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._loaded and mtime == self._mtime:
+            return
+        self._mtime = mtime
+        self._loaded = True
+        self._load()
+
+    def _lookup(self, app_name):
+        normalized = normalize_path(app_name)
+        category = self._paths.get(normalized)
+        if category:
+            return category
+
+        name = normalized.rsplit("/", 1)[-1]
+        category = self._names.get(name) or self._names.get(_stem(name))
+        if category:
+            return category
+
+        # Alternatives are tried in order, so the first matching rule wins
+        if self._rules is not None:
+            match = self._rules.match(normalized)
+            if match:
+                return self._rule_groups[match.lastgroup]
+        # From here on, the steps of the Kotlin categorizer, in its order
+        for known_app, category in self._partials:
+            if known_app in normalized or normalized in known_app:
+                return category
+
+        match = self._heuristics.match(normalized)
+        if match:
+            return self._heuristic_groups[match.lastgroup]
+
+        if normalized == "explorer.exe" or "finder" in normalized:
+            return "Utility"
+        if normalized.endswith(".exe"):
+            return "Utility"
+        return UNKNOWN
+
+    def categorize(self, app_name):
+        """Category for an app name or executable path"""
+        if not app_name:
+            return UNKNOWN
+        with self._lock:
+            self._refresh()
+            category = self._memo.get(app_name)
+            if category is None:
+                self.misses += 1
+                category = self._memo[app_name] = self._lookup(app_name)
+            else:
+                self.hits += 1
+            return category
+
+_default_categorizer = None
+
+def get_default_categorizer():
+    """Get the process-wide categorizer"""
+    global _default_categorizer
+    if _default_categorizer is None:
+        _default_categorizer = AppCategorizer()
+    return _default_categorizer
+
+def categorize(app_name):
+    """Category for an app, using the default categorizer"""
+    return get_default_categorizer().categorize(app_name)
@@ -6,265 +6,415 @@ App Icon Utilities - Advanced app icon retrieval methods
 
 This module provides platform-specific app icon retrieval functionality
 that may be complex to implement directly in Java/Kotlin.
+
+Icons are looked up through icon_cache, keyed by the app name and the
+resolved source file, so repeated lookups skip extraction entirely. Every
+source is normalized by icon_normalize to a fixed size and compact encoding,
+and written once to the content-addressed icon_store.
 '''
 
 import os
 import platform
-import subprocess
 import json
 import sys
-import base64
-import io
-from PIL import Image, ImageDraw
-import tempfile
+import icon_normalize
+import icon_store
+import icon_cache
+import diagnostics
+
+# PIL, the thread pool and the win32/COM modules are imported inside the
+# functions that need them: a cache hit never touches them, and keeping them
+# out of module import keeps one-shot invocations fast to start.
+
+# Default worker count for get_app_icons; extraction is mostly I/O and
+# subprocess bound, so threads beat processes here
+DEFAULT_ICON_WORKERS = int(os.environ.get("ACTIVITY_TRACKER_ICON_WORKERS", 8))
 
-def get_app_icon(app_name):
-    """Get application icon using platform-specific methods and return as base64"""
+# Seconds an external icon extraction command may take
+ICON_COMMAND_DEADLINE = 10
+
+def resolve_icon_source(app_name):
+    """Find the file an app's icon is taken from, or None if there is none"""
     system = platform.system()
-    result = {"error": "Icon not found"}
-    icon_data = None
     
     try:
         if system == "Windows":
-            # For Windows, we try different methods
-            try:
-                import win32ui
-                import win32gui
-                import win32con
-                import win32api
-                import pywintypes
+            if os.path.isabs(app_name) and os.path.isfile(app_name):
+                return app_name
+            
+            if app_name.lower().endswith('.exe'):
+                # Try different paths where the executable might be
+                program_files = os.environ.get('ProgramFiles', 'C:\\Program Files')
+                program_files_x86 = os.environ.get('ProgramFiles(x86)', 'C:\\Program Files (x86)')
                 
-                # Check if the app name is an executable
-                if app_name.lower().endswith('.exe'):
-                    # Try different paths where the executable might be
-                    program_files = os.environ.get('ProgramFiles', 'C:\\Program Files')
-                    program_files_x86 = os.environ.get('ProgramFiles(x86)', 'C:\\Program Files (x86)')
+                # Extract folder name (without .exe)
+                app_folder = os.path.splitext(app_name)[0]
+                paths = [
+                    os.path.join(program_files, app_name),
+                    os.path.join(program_files_x86, app_name),
+                    os.path.join(program_files, app_folder, app_name),
+                    os.path.join(program_files_x86, app_folder, app_name),
+                ]
+                
+                for path in paths:
+                    if os.path.isfile(path):
+                        return path
+        
+        elif system == "Darwin":  # macOS
+            for apps_dir in ["/Applications", "/System/Applications"]:
+                path = os.path.join(apps_dir, f"{app_name}.app")
+                if os.path.exists(path):
+                    return path
+        
+        elif system == "Linux":
+            # Look the icon up in the prebuilt icon theme index
+            import icon_index
+            return icon_index.get_default_index().lookup(app_name)
+    except Exception as e:
+        diagnostics.report(f"Error resolving icon source for {app_name}: {str(e)}")
+    
+    return None
+
+def _init_icon_worker():
+    """Worker thread setup: the shell shortcut fallback uses COM on Windows"""
+    if platform.system() == "Windows":
+        try:
+            import pythoncom
+            pythoncom.CoInitialize()
+        except ImportError:
+            pass
+
+def _icon_result(app_name, size, image_format):
+    """Resolve one app's icon into a result dict with either an icon reference or error"""
+    try:
+        return dict(get_app_icon_ref(app_name, size, image_format), app_name=app_name)
+    except Exception as e:
+        return {"app_name": app_name, "error": str(e)}
+
+def get_app_icons(app_names, workers=DEFAULT_ICON_WORKERS, size=icon_normalize.DEFAULT_ICON_SIZE, image_format="png"):
+    """
+    Resolve icons for many apps concurrently on a thread pool.
+    
+    Yields one {"app_name", "hash", "path", "mime"} dict per app as soon as
+    it finishes, in completion order. A failing app yields an "error" entry
+    instead of failing the batch.
+    """
+    app_names = list(dict.fromkeys(name for name in app_names if name))
+    if not app_names:
+        return
+    
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    workers = max(1, min(workers, len(app_names)))
+    with ThreadPoolExecutor(max_workers=workers, initializer=_init_icon_worker) as pool:
+        futures = [pool.submit(_icon_result, app_name, size, image_format) for app_name in app_names]
+        for future in as_completed(futures):
+            yield future.result()
+
+def _read_app_names(stream):
+    """Read app names from stdin: a JSON array, or one name per line"""
+    text = stream.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def get_icon_key(app_name):
+    """
+    Cheap reference to an app's icon that changes whenever the icon would.
+    
+    Only resolves the icon source, without extracting or encoding anything,
+    so enumerations can hand out keys and clients fetch icons lazily.
+    """
+    source = icon_cache.get_default_cache().source(app_name, resolve_icon_source)
+    return icon_cache.key_digest(icon_cache.make_key(app_name, source))
+
+def get_app_icon(app_name, size=icon_normalize.DEFAULT_ICON_SIZE, image_format="png", use_cache=True):
+    """
+    Get application icon as a normalized base64 data URL.
+    
+    The icon is scaled to a size x size square and encoded as PNG or WebP.
+    Prefer get_app_icon_ref where the caller can read the stored file itself.
+    """
+    try:
+        size, image_format = icon_normalize.validate(size, image_format)
+        return get_app_icon_variants(app_name, [size], image_format, use_cache)[size]
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+def get_app_icon_ref(app_name, size=icon_normalize.DEFAULT_ICON_SIZE, image_format="png", use_cache=True):
+    """
+    Get a reference to the app's stored icon: {"hash", "path", "mime"}.
+    
+    The icon bytes live in the content-addressed icon store, so responses
+    carry only this small reference instead of inline base64.
+    """
+    size, image_format = icon_normalize.validate(size, image_format)
+    return get_app_icon_refs(app_name, [size], image_format, use_cache)[size]
+
+def get_app_icon_refs(app_name, sizes, image_format="png", use_cache=True):
+    """
+    Get references to an app's icon at several sizes as {size: ref}.
+    
+    The source is only loaded (once per size for vector icons) for sizes
+    that are not already cached and stored.
+    """
+    sizes = [icon_normalize.validate(size, image_format)[0] for size in sizes]
+    cache = icon_cache.get_default_cache() if use_cache else None
+    with diagnostics.phase("icon_resolve"):
+        source = cache.source(app_name, resolve_icon_source) if cache else resolve_icon_source(app_name)
+    store = icon_store.get_default_store()
+    
+    refs = {}
+    for size in sizes:
+        key = icon_cache.make_key(app_name, source, f"{size}.{image_format}")
+        cached = cache.get(key) if cache else None
+        ref = json.loads(cached) if cached else None
+        
+        # The store may have evicted the file since the reference was cached
+        if not store.exists(ref):
+            with diagnostics.phase("icon_load"):
+                image = load_app_icon_image(app_name, source, size)
+            with diagnostics.phase("icon_encode"):
+                data, mime = icon_normalize.encode_icon(image, size, image_format)
+            ref = store.put(data, mime)
+            # Placeholders are cached as well, so misses aren't rebuilt every sample
+            if cache:
+                cache.put(key, json.dumps(ref))
+        refs[size] = ref
+    return refs
+
+def get_app_icon_variants(app_name, sizes, image_format="png", use_cache=True):
+    """Get an app's icon at several sizes as {size: data URL}"""
+    store = icon_store.get_default_store()
+    refs = get_app_icon_refs(app_name, sizes, image_format, use_cache)
+    return {size: icon_normalize.to_data_url(store.read(ref), ref["mime"]) for size, ref in refs.items()}
+
+def load_app_icon_image(app_name, source=None, size=icon_normalize.DEFAULT_ICON_SIZE):
+    """Get application icon as an image using platform-specific methods (a placeholder if none is found)"""
+    from PIL import Image, ImageDraw
+    
+    system = platform.system()
+    image = None
+    
+    if system == "Windows":
+        # For Windows, we try different methods
+        try:
+            import win32ui
+            import win32gui
+            import win32con
+            import win32api
+            import pywintypes
+            
+            # Extract from the executable resolved by resolve_icon_source
+            if source and os.path.isfile(source):
+                try:
+                    # Get the large icon
+                    ico_x = win32api.GetSystemMetrics(win32con.SM_CXICON)
+                    ico_y = win32api.GetSystemMetrics(win32con.SM_CYICON)
                     
-                    # Possible locations
-                    paths = [
-                        os.path.join(program_files, app_name),
-                        os.path.join(program_files_x86, app_name),
-                    ]
+                    large, small = win32gui.ExtractIconEx(source, 0)
+                    if large:
+                        # We got the icon handle
+                        icon_handle = large[0]
+                        
+                        # Create a DC and bitmap for the icon
+                        hdc = win32ui.CreateDCFromHandle(win32gui.GetDC(0))
+                        hbmp = win32ui.CreateBitmap()
+                        hbmp.CreateCompatibleBitmap(hdc, ico_x, ico_y)
+                        hdc = hdc.CreateCompatibleDC()
+                        
+                        # Draw the icon onto the bitmap
+                        hdc.SelectObject(hbmp)
+                        hdc.DrawIcon((0, 0), icon_handle)
+                        
+                        # Convert bitmap to Python Image
+                        bmpinfo = hbmp.GetInfo()
+                        bmpstr = hbmp.GetBitmapBits(True)
+                        img = Image.frombuffer(
+                            'RGBA',
+                            (bmpinfo['bmWidth'], bmpinfo['bmHeight']),
+                            bmpstr, 'raw', 'BGRA', 0, 1
+                        )
+                        
+                        # Clean up resources
+                        win32gui.DestroyIcon(icon_handle)
+                        hdc.DeleteDC()
+                        
+                        image = img
+                except Exception as e:
+                    diagnostics.report(f"Error extracting icon from {source}: {str(e)}")
+    
+            # If we haven't found an icon yet, try using the default shell icon
+            if image is None:
+                try:
+                    import win32com.client
+                    import tempfile
                     
-                    # Extract folder name (without .exe)
-                    app_folder = os.path.splitext(app_name)[0]
-                    paths.extend([
-                        os.path.join(program_files, app_folder, app_name),
-                        os.path.join(program_files_x86, app_folder, app_name),
-                    ])
+                    shell = win32com.client.Dispatch("WScript.Shell")
+                    # Create a temporary shortcut to get the icon
+                    with tempfile.NamedTemporaryFile(suffix='.lnk', delete=False) as temp_file:
+                        shortcut_path = temp_file.name
                     
-                    # Try to find the executable
-                    for path in paths:
-                        if os.path.isfile(path):
-                            try:
-                                # Get the large icon
-                                ico_x = win32api.GetSystemMetrics(win32con.SM_CXICON)
-                                ico_y = win32api.GetSystemMetrics(win32con.SM_CYICON)
-                                
-                                large, small = win32gui.ExtractIconEx(path, 0)
-                                if large:
-                                    # We got the icon handle
-                                    icon_handle = large[0]
-                                    
-                                    # Create a DC and bitmap for the icon
-                                    hdc = win32ui.CreateDCFromHandle(win32gui.GetDC(0))
-                                    hbmp = win32ui.CreateBitmap()
-                                    hbmp.CreateCompatibleBitmap(hdc, ico_x, ico_y)
-                                    hdc = hdc.CreateCompatibleDC()
-                                    
-                                    # Draw the icon onto the bitmap
-                                    hdc.SelectObject(hbmp)
-                                    hdc.DrawIcon((0, 0), icon_handle)
-                                    
-                                    # Convert bitmap to Python Image
-                                    bmpinfo = hbmp.GetInfo()
-                                    bmpstr = hbmp.GetBitmapBits(True)
-                                    img = Image.frombuffer(
-                                        'RGBA',
-                                        (bmpinfo['bmWidth'], bmpinfo['bmHeight']),
-                                        bmpstr, 'raw', 'BGRA', 0, 1
-                                    )
-                                    
-                                    # Clean up resources
-                                    win32gui.DestroyIcon(icon_handle)
-                                    hdc.DeleteDC()
-                                    
-                                    # Convert to base64
-                                    buffered = io.BytesIO()
-                                    img.save(buffered, format="PNG")
-                                    icon_data = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                                    break
-                            except Exception as e:
-                                print(f"Error extracting icon from {path}: {str(e)}")
-                
-                # If we haven't found an icon yet, try using the default shell icon
-                if not icon_data:
-                    try:
-                        import win32com.client
-                        
-                        shell = win32com.client.Dispatch("WScript.Shell")
-                        # Create a temporary shortcut to get the icon
-                        with tempfile.NamedTemporaryFile(suffix='.lnk', delete=False) as temp_file:
-                            shortcut_path = temp_file.name
+                    shortcut = shell.CreateShortCut(shortcut_path)
+                    if app_name.lower().endswith('.exe'):
+                        # Set the target to the executable name
+                        shortcut.TargetPath = app_name
+                        shortcut.Save()
                         
-                        shortcut = shell.CreateShortCut(shortcut_path)
-                        if app_name.lower().endswith('.exe'):
-                            # Set the target to the executable name
-                            shortcut.TargetPath = app_name
-                            shortcut.Save()
+                        # Extract icon from the shortcut
+                        icon_path = win32gui.ExtractIcon(0, shortcut_path, 0)
+                        if icon_path:
+                            # Same process as before to convert icon to image
+                            ico_x = win32api.GetSystemMetrics(win32con.SM_CXICON)
+                            ico_y = win32api.GetSystemMetrics(win32con.SM_CYICON)
                             
-                            # Extract icon from the shortcut
-                            icon_path = win32gui.ExtractIcon(0, shortcut_path, 0)
-                            if icon_path:
-                                # Same process as before to convert icon to image
-                                ico_x = win32api.GetSystemMetrics(win32con.SM_CXICON)
-                                ico_y = win32api.GetSystemMetrics(win32con.SM_CYICON)
-                                
-                                hdc = win32ui.CreateDCFromHandle(win32gui.GetDC(0))
-                                hbmp = win32ui.CreateBitmap()
-                                hbmp.CreateCompatibleBitmap(hdc, ico_x, ico_y)
-                                hdc = hdc.CreateCompatibleDC()
-                                
-                                hdc.SelectObject(hbmp)
-                                hdc.DrawIcon((0, 0), icon_path)
-                                
-                                bmpinfo = hbmp.GetInfo()
-                                bmpstr = hbmp.GetBitmapBits(True)
-                                img = Image.frombuffer(
-                                    'RGBA',
-                                    (bmpinfo['bmWidth'], bmpinfo['bmHeight']),
-                                    bmpstr, 'raw', 'BGRA', 0, 1
-                                )
-                                
-                                win32gui.DestroyIcon(icon_path)
-                                hdc.DeleteDC()
-                                
-                                buffered = io.BytesIO()
-                                img.save(buffered, format="PNG")
-                                icon_data = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                        
-                        # Clean up
-                        try:
-                            os.unlink(shortcut_path)
-                        except:
-                            pass
-                    except Exception as e:
-                        print(f"Error getting icon from shortcut: {str(e)}")
-            except ImportError:
-                print("Missing required Windows libraries")
-        
-        elif system == "Darwin":  # macOS
-            try:
-                # Use AppleScript to get the app's icon
-                script = f'''
-                tell application "System Events"
-                    try
-                        set appPath to path of application file "{app_name}"
-                        set appIcon to icon of application file appPath
-                        -- Save icon to temporary file
-                        set tempFolder to path to temporary items
-                        set tempFile to (tempFolder as text) & "icon_temp.png"
-                        -- Ensure the file doesn't exist
-                        try
-                            tell application "Finder"
-                                delete file tempFile
-                            end tell
-                        end try
-                        -- Save icon to file
-                        save appIcon as «class PNGf» in tempFile
-                        return tempFile
-                    on error errorMsg
-                        return "Error: " & errorMsg
-                    end try
-                end tell
-                '''
-                
-                # Run the AppleScript
-                proc = subprocess.run(["osascript", "-e", script], capture_output=True, text=True)
-                output = proc.stdout.strip()
-                
-                if output and not output.startswith("Error:"):
-                    # Read the icon file
-                    with open(output, 'rb') as icon_file:
-                        icon_bytes = icon_file.read()
-                        icon_data = base64.b64encode(icon_bytes).decode('utf-8')
+                            hdc = win32ui.CreateDCFromHandle(win32gui.GetDC(0))
+                            hbmp = win32ui.CreateBitmap()
+                            hbmp.CreateCompatibleBitmap(hdc, ico_x, ico_y)
+                            hdc = hdc.CreateCompatibleDC()
+                            
+                            hdc.SelectObject(hbmp)
+                            hdc.DrawIcon((0, 0), icon_path)
+                            
+                            bmpinfo = hbmp.GetInfo()
+                            bmpstr = hbmp.GetBitmapBits(True)
+                            img = Image.frombuffer(
+                                'RGBA',
+                                (bmpinfo['bmWidth'], bmpinfo['bmHeight']),
+                                bmpstr, 'raw', 'BGRA', 0, 1
+                            )
+                            
+                            win32gui.DestroyIcon(icon_path)
+                            hdc.DeleteDC()
+                            
+                            image = img
                     
                     # Clean up
                     try:
-                        os.unlink(output)
+                        os.unlink(shortcut_path)
                     except:
                         pass
-            except Exception as e:
-                print(f"Error getting macOS app icon: {str(e)}")
-        
-        elif system == "Linux":
-            try:
-                # Try to find the icon in the system icon theme
-                icon_name = app_name.lower().replace('.exe', '')
-                
-                # Use the 'find' command to locate the icon in common icon locations
-                icon_paths = subprocess.run([
-                    "find", 
-                    "/usr/share/icons", "/usr/share/pixmaps", 
-                    "-name", f"{icon_name}.*", "-o", "-name", f"{icon_name.split('.')[0]}.*"
-                ], capture_output=True, text=True).stdout.strip().split('\n')
-                
-                # Filter for image files
-                valid_exts = ['.png', '.svg', '.xpm', '.jpg', '.jpeg', '.ico']
-                icon_paths = [p for p in icon_paths if any(p.lower().endswith(ext) for ext in valid_exts)]
-                
-                if icon_paths and icon_paths[0]:
-                    icon_path = icon_paths[0]
-                    # Read the icon file
-                    with open(icon_path, 'rb') as icon_file:
-                        icon_bytes = icon_file.read()
-                        icon_data = base64.b64encode(icon_bytes).decode('utf-8')
-            except Exception as e:
-                print(f"Error getting Linux app icon: {str(e)}")
-        
-        # If no icon was found, create a placeholder
-        if not icon_data:
-            # Create a simple colored box with app initials
-            size = 64
-            img = Image.new('RGBA', (size, size), (50, 150, 250, 255))
-            draw = ImageDraw.Draw(img)
-            
-            # Draw a border
-            draw.rectangle([(0, 0), (size-1, size-1)], outline=(255, 255, 255, 200), width=2)
-            
-            # Get initials (max 2 characters)
-            app_basename = os.path.basename(app_name)
-            app_name_without_ext = os.path.splitext(app_basename)[0]
-            initials = app_name_without_ext[0:1].upper()
-            if len(app_name_without_ext) > 1:
-                # Get first letter and first letter after a space or underscore
-                for i in range(1, len(app_name_without_ext)):
-                    if app_name_without_ext[i-1] in [' ', '_', '-'] or app_name_without_ext[i-1].islower() and app_name_without_ext[i].isupper():
-                        initials += app_name_without_ext[i:i+1].upper()
-                        break
+                except Exception as e:
+                    diagnostics.report(f"Error getting icon from shortcut: {str(e)}")
+        except ImportError:
+            diagnostics.report("Missing required Windows libraries")
+    
+    elif system == "Darwin":  # macOS
+        try:
+            # Use AppleScript to get the app's icon
+            script = f'''
+            tell application "System Events"
+                try
+                    set appPath to path of application file "{app_name}"
+                    set appIcon to icon of application file appPath
+                    -- Save icon to temporary file
+                    set tempFolder to path to temporary items
+                    set tempFile to (tempFolder as text) & "icon_temp.png"
+                    -- Ensure the file doesn't exist
+                    try
+                        tell application "Finder"
+                            delete file tempFile
+                        end tell
+                    end try
+                    -- Save icon to file
+                    save appIcon as «class PNGf» in tempFile
+                    return tempFile
+                on error errorMsg
+                    return "Error: " & errorMsg
+                end try
+            end tell
+            '''
             
-            # Center text (approximate)
-            draw.text((size/2-10, size/2-12), initials, fill=(255, 255, 255, 255))
+            # Run the AppleScript
+            import command_runner
+            proc = command_runner.run_command(["osascript", "-e", script], command_runner.Deadline(ICON_COMMAND_DEADLINE))
+            output = proc.stdout.strip()
             
-            # Convert to base64
-            buffered = io.BytesIO()
-            img.save(buffered, format="PNG")
-            icon_data = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            if output and not output.startswith("Error:"):
+                # Read the icon file
+                image = icon_normalize.open_icon_file(output, size)
+                
+                # Clean up
+                try:
+                    os.unlink(output)
+                except:
+                    pass
+        except Exception as e:
+            diagnostics.report(f"Error getting macOS app icon: {str(e)}")
+    
+    elif system == "Linux":
+        try:
+            # Open the icon file found by resolve_icon_source; vector
+            # icons are rendered directly at the requested size
+            if source:
+                image = icon_normalize.open_icon_file(source, size)
+        except Exception as e:
+            diagnostics.report(f"Error getting Linux app icon: {str(e)}")
+    
+    # If no icon was found, create a placeholder
+    if image is None:
+        # Create a simple colored box with app initials
+        box_size = 64
+        img = Image.new('RGBA', (box_size, box_size), (50, 150, 250, 255))
+        draw = ImageDraw.Draw(img)
+        
+        # Draw a border
+        draw.rectangle([(0, 0), (box_size-1, box_size-1)], outline=(255, 255, 255, 200), width=2)
         
-        # Return as a data URL
-        return f"data:image/png;base64,{icon_data}"
+        # Get initials (max 2 characters)
+        app_basename = os.path.basename(app_name)
+        app_name_without_ext = os.path.splitext(app_basename)[0]
+        initials = app_name_without_ext[0:1].upper()
+        if len(app_name_without_ext) > 1:
+            # Get first letter and first letter after a space or underscore
+            for i in range(1, len(app_name_without_ext)):
+                if app_name_without_ext[i-1] in [' ', '_', '-'] or app_name_without_ext[i-1].islower() and app_name_without_ext[i].isupper():
+                    initials += app_name_without_ext[i:i+1].upper()
+                    break
+        
+        # Center text (approximate)
+        draw.text((box_size/2-10, box_size/2-12), initials, fill=(255, 255, 255, 255))
+        image = img
     
-    except Exception as e:
-        return json.dumps({"error": str(e)})
+    return image
 
 # Main execution
 if __name__ == "__main__":
-    if len(sys.argv) > 2:
+    if len(sys.argv) > 1 and sys.argv[1] == "get_app_icons":
+        import argparse
+        
+        parser = argparse.ArgumentParser(prog="app_icon_util.py get_app_icons",
+                                         description="Read app names from stdin, write one JSON result per line")
+        parser.add_argument("--workers", type=int, default=DEFAULT_ICON_WORKERS)
+        parser.add_argument("--size", type=int, default=icon_normalize.DEFAULT_ICON_SIZE)
+        parser.add_argument("--format", default="png", choices=sorted(icon_normalize.FORMATS))
+        options = parser.parse_args(sys.argv[2:])
+        
+        app_names = _read_app_names(sys.stdin)
+        for result in get_app_icons(app_names, options.workers, options.size, options.format):
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+    elif len(sys.argv) > 2:
         command = sys.argv[1]
         if command == "get_app_icon":
+            # get_app_icon <app_name> [size] [png|webp]
             app_name = sys.argv[2]
-            print(get_app_icon(app_name))
+            size = sys.argv[3] if len(sys.argv) > 3 else icon_normalize.DEFAULT_ICON_SIZE
+            image_format = sys.argv[4] if len(sys.argv) > 4 else "png"
+            print(get_app_icon(app_name, size, image_format))
+        elif command == "get_app_icon_ref":
+            # get_app_icon_ref <app_name> [size] [png|webp]
+            try:
+                size = sys.argv[3] if len(sys.argv) > 3 else icon_normalize.DEFAULT_ICON_SIZE
+                image_format = sys.argv[4] if len(sys.argv) > 4 else "png"
+                print(json.dumps(get_app_icon_ref(sys.argv[2], size, image_format)))
+            except Exception as e:
+                print(json.dumps({"error": str(e)}))
+        elif command == "invalidate_icon_cache":
+            print(json.dumps(icon_cache.get_default_cache().invalidate(sys.argv[2])))
         else:
             print(json.dumps({"error": f"Unknown command: {command}"}))
+    elif len(sys.argv) > 1 and sys.argv[1] == "invalidate_icon_cache":
+        print(json.dumps(icon_cache.get_default_cache().invalidate()))
     else:
         print(json.dumps({"error": "No command or app name specified"}))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+App Snapshots - Sequence-numbered snapshots of the running application map
+
+Lets a long-lived process answer "what changed since token X" instead of
+re-sending the full application map on every enumeration.
+'''
+
+import os
+import threading
+from collections import OrderedDict
+
+# Number of past snapshots a client can still get a delta against
+HISTORY_SIZE = 8
+
+def diff_apps(old, new):
+    """Compute the added, changed and removed apps between two app maps"""
+    added = {}
+    changed = {}
+    for app_name, info in new.items():
+        if app_name not in old:
+            added[app_name] = info
+        elif old[app_name] != info:
+            changed[app_name] = info
+    removed = [app_name for app_name in old if app_name not in new]
+    return added, changed, removed
+
+class SnapshotHistory:
+    """Keeps the last few app maps, each identified by an opaque token"""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        # Tokens from another process never match, so clients fall back to a full snapshot
+        self._session = os.urandom(4).hex()
+        self._sequence = 0
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, apps, since=None):
+        """Store a new app map and return it as a full snapshot or a delta against `since`"""
+        apps = dict(apps)
+        error = apps.pop("error", None)
+        timed_out = apps.pop("timed_out", False)
+
+        # A failed enumeration says nothing about what changed, so don't
+        # report every app as removed; the client keeps its token
+        if error and not apps and since:
+            return {"token": since, "full": False, "added": {}, "changed": {}, "removed": [], "error": error}
+
+        with self._lock:
+            self._sequence += 1
+            token = f"{self._session}:{self._sequence}"
+            previous = self._snapshots.get(since) if since else None
+
+            # A timed-out or failed enumeration only lists some of the apps,
+            # so the missing ones are kept rather than reported as removed
+            partial = bool(timed_out or error)
+            if partial and previous is not None:
+                apps = dict(previous, **apps)
+
+            self._snapshots[token] = apps
+            while len(self._snapshots) > self.size:
+                self._snapshots.popitem(last=False)
+
+        if previous is None:
+            result = {"token": token, "full": True, "apps": apps}
+        else:
+            added, changed, removed = diff_apps(previous, apps)
+            result = {"token": token, "full": False, "added": added, "changed": changed, "removed": removed}
+
+        if error:
+            result["error"] = error
+        if timed_out:
+            result["timed_out"] = True
+        return result
+
+_default_history = None
+
+def get_default_history():
+    """Get the process-wide snapshot history"""
+    global _default_history
+    if _default_history is None:
+        _default_history = SnapshotHistory()
+    return _default_history
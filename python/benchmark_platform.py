@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Platform Benchmark - Wall time, forks and output size of the Linux platform layer
+
+Regressions in window_utils.py and app_icon_util.py (an extra fork per
+window, a filesystem walk per icon, a bloated response) rarely break
+anything; they just make sampling more expensive. This benchmark runs the
+commands against a synthetic desktop that needs no display: scripted fakes
+of xdotool, wmctrl, xprop and find on PATH serve a configurable number of
+windows and log every invocation, and a generated icon theme tree with a
+configurable number of files stands in for /usr/share/icons. All caches and
+indexes go to the same temporary directory.
+
+Each scenario is measured as a one-shot CLI call and, where one exists, as a
+request to a long-lived "serve" process: median wall time, external
+commands spawned (invocations of the fakes) and stdout bytes. The first,
+cold run is reported separately and not compared. Results are compared
+against a JSON baseline stored per configuration; a missing baseline is
+recorded from the current run.
+
+Usage:
+    benchmark_platform.py [--windows N] [--icon-files N] [--runs N]
+                          [--baseline PATH] [--save-baseline] [--tolerance F]
+
+Windows are meant to range from 10 to 500 and icon files from 10k to 100k.
+Exits 1 when a result regressed against the baseline, 0 otherwise.
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import site
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), "data")
+
+DEFAULT_BASELINE = os.path.join(DATA_DIR, "benchmarks", "platform_baseline.json")
+DEFAULT_WINDOWS = 50
+DEFAULT_ICON_FILES = 10000
+DEFAULT_RUNS = 5
+# Relative slowdown (and output growth) tolerated before a result counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Wall time differences below this are noise, whatever the ratio
+MIN_REGRESSION_MS = 5.0
+
+# No X server listens here, so python-xlib fails fast and the tools backend is used
+FAKE_DISPLAY = ":1999"
+FIRST_WINDOW_ID = 0x04000001
+
+ICON_SIZES = ["16x16", "22x22", "24x24", "32x32", "48x48", "64x64", "128x128", "256x256", "scalable"]
+ICON_CONTEXTS = ["actions", "apps", "categories", "devices", "emblems", "mimetypes", "places", "status"]
+
+# Every fake appends its name to $BENCH_LOG, one line per invocation
+FAKE_TOOLS = {
+    "xdotool": """#!/bin/sh
+echo xdotool >> "$BENCH_LOG"
+case "$1" in
+    getactivewindow) echo $(( {first} ));;
+    getwindowclassname) echo App0;;
+    getwindowname) echo "Document 0 - App0";;
+    *) exit 1;;
+esac
+""",
+    "wmctrl": """#!/bin/sh
+echo wmctrl >> "$BENCH_LOG"
+[ "$1" = "-l" ] || exit 1
+cat "$BENCH_ROOT/wmctrl.txt"
+""",
+    "xprop": """#!/bin/sh
+echo xprop >> "$BENCH_LOG"
+[ "$1" = "-id" ] || exit 1
+app=$(( ($2 - {first}) % $BENCH_APPS ))
+echo "WM_CLASS(STRING) = \\"app$app\\", \\"App$app\\""
+""",
+    # Passes through to the real find, so a reintroduced directory walk still works but is counted
+    "find": """#!/bin/sh
+echo find >> "$BENCH_LOG"
+exec {real_find} "$@"
+""",
+}
+
+def app_count(windows):
+    """Distinct apps behind the windows: some apps have several windows"""
+    return max(1, windows * 2 // 3)
+
+def _icon_png():
+    """A small valid PNG for the app icons, so the icon pipeline has something to decode"""
+    from io import BytesIO
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGBA", (48, 48), (40, 120, 200, 255)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def make_environment(root, windows, icon_files):
+    """Create fakes, window list, icon theme and .desktop files under root; return the environment"""
+    apps = app_count(windows)
+    bin_dir = os.path.join(root, "bin")
+    os.makedirs(bin_dir)
+    real_find = shutil.which("find") or "/usr/bin/find"
+    for tool, script in FAKE_TOOLS.items():
+        path = os.path.join(bin_dir, tool)
+        with open(path, 'w') as tool_file:
+            tool_file.write(script.replace("{first}", str(FIRST_WINDOW_ID)).replace("{real_find}", real_find))
+        os.chmod(path, 0o755)
+
+    with open(os.path.join(root, "wmctrl.txt"), 'w') as listing:
+        for i in range(windows):
+            listing.write(f"0x{FIRST_WINDOW_ID + i:08x}  0 bench Document {i} - App{i % apps}\n")
+
+    share = os.path.join(root, "share")
+    theme = os.path.join(share, "icons", "hicolor")
+    directories = [(size, os.path.join(theme, size, context)) for size in ICON_SIZES for context in ICON_CONTEXTS]
+    for _, directory in directories:
+        os.makedirs(directory)
+
+    # App icons in two sizes, the rest is filler that only the index sees
+    png = _icon_png()
+    for i in range(apps):
+        for size in ("48x48", "128x128"):
+            with open(os.path.join(theme, size, "apps", f"app{i}.png"), 'wb') as icon_file:
+                icon_file.write(png)
+    filler = max(icon_files - 2 * apps, 0)
+    for i in range(filler):
+        size, directory = directories[i % len(directories)]
+        extension = ".svg" if size == "scalable" else ".png"
+        open(os.path.join(directory, f"filler-{i}{extension}"), 'wb').close()
+
+    applications = os.path.join(share, "applications")
+    os.makedirs(applications)
+    for i in range(apps):
+        with open(os.path.join(applications, f"app{i}.desktop"), 'w') as desktop_file:
+            desktop_file.write(f"[Desktop Entry]\nName=App {i}\nExec=app{i}\nIcon=app{i}\nStartupWMClass=App{i}\n")
+
+    home = os.path.join(root, "home")
+    os.makedirs(home)
+    cache = os.path.join(root, "cache")
+
+    env = dict(os.environ)
+    env.update({
+        "PATH": bin_dir + os.pathsep + env.get("PATH", ""),
+        "DISPLAY": FAKE_DISPLAY,
+        # HOME keeps ~/.icons out of the index; packages installed with --user must still import
+        "HOME": home,
+        "PYTHONUSERBASE": site.getuserbase(),
+        "XDG_DATA_HOME": os.path.join(home, ".local", "share"),
+        "XDG_DATA_DIRS": share,
+        "ACTIVITY_TRACKER_ICON_INDEX": os.path.join(cache, "icon_index.json"),
+        "ACTIVITY_TRACKER_ICON_CACHE_DIR": os.path.join(cache, "icons"),
+        "ACTIVITY_TRACKER_ICON_STORE_DIR": os.path.join(cache, "icon_store"),
+        "BENCH_ROOT": root,
+        "BENCH_LOG": os.path.join(root, "spawns.log"),
+        "BENCH_APPS": str(apps),
+    })
+    return env
+
+def spawn_count(env):
+    """Fake tool invocations logged so far"""
+    try:
+        with open(env["BENCH_LOG"], 'rb') as log:
+            return log.read().count(b"\n")
+    except FileNotFoundError:
+        return 0
+
+def _scenarios(windows):
+    apps = app_count(windows)
+    icon_names = "\n".join(f"app{i}" for i in range(apps)) + "\n"
+    return [
+        {
+            "name": "active_window",
+            "cli": (["window_utils.py", "get_active_window_info"], None),
+            "serve": ("get_active_window_info", {}),
+        },
+        {
+            "name": "running_applications",
+            "cli": (["window_utils.py", "get_running_applications"], None),
+            "serve": ("get_running_applications", {}),
+        },
+        {
+            "name": "app_icon_ref",
+            "cli": (["app_icon_util.py", "get_app_icon_ref", "app1"], None),
+            "serve": ("get_app_icon_ref", {"app_name": "app1"}),
+        },
+        {
+            "name": "app_icons_batch",
+            "cli": (["app_icon_util.py", "get_app_icons"], icon_names),
+            "serve": ("get_app_icons", {"app_names": icon_names.split()}),
+        },
+    ]
+
+def run_cli(env, args, stdin):
+    """Run one CLI call; returns (wall ms, spawns, stdout bytes, stdout)"""
+    spawns = spawn_count(env)
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable] + [os.path.join(SCRIPT_DIR, args[0])] + args[1:],
+                          input=(stdin or "").encode(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          env=env, cwd=SCRIPT_DIR)
+    wall = (time.perf_counter() - started) * 1000
+    return wall, spawn_count(env) - spawns, len(proc.stdout), proc.stdout
+
+class ServeClient:
+    """A window_utils.py serve process driven over its stdin/stdout"""
+
+    def __init__(self, env):
+        self.env = env
+        self.proc = subprocess.Popen([sys.executable, os.path.join(SCRIPT_DIR, "window_utils.py"), "serve"],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     env=env, cwd=SCRIPT_DIR)
+        self._next_id = 0
+
+    def request(self, command, params):
+        """Send one request; returns (wall ms, spawns, stdout bytes, stdout) up to its final line"""
+        self._next_id += 1
+        request_id = self._next_id
+        spawns = spawn_count(self.env)
+        started = time.perf_counter()
+        self.proc.stdin.write((json.dumps({"id": request_id, "command": command, "params": params}) + "\n").encode())
+        self.proc.stdin.flush()
+
+        output = b""
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f"serve exited during {command}")
+            output += line
+            message = json.loads(line)
+            # Streaming commands send "item" lines before the final result
+            if message.get("id") == request_id and "item" not in message:
+                break
+        wall = (time.perf_counter() - started) * 1000
+        return wall, spawn_count(self.env) - spawns, len(output), output
+
+    def close(self):
+        try:
+            self.proc.stdin.write(b'{"command": "shutdown"}\n')
+            self.proc.stdin.flush()
+            self.proc.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proc.kill()
+
+def measure(call, runs):
+    """First (cold) run plus the medians of `runs` further runs"""
+    first = call()
+    samples = [call() for _ in range(runs)]
+    return {
+        "first_ms": round(first[0], 2),
+        "wall_ms": round(statistics.median(sample[0] for sample in samples), 2),
+        "subprocesses": statistics.median(sample[1] for sample in samples),
+        "stdout_bytes": statistics.median(sample[2] for sample in samples),
+        "timed_out": any(b'"timed_out": true' in sample[3] for sample in samples),
+    }
+
+def run_benchmarks(windows, icon_files, runs):
+    """Build the synthetic desktop and measure every scenario; returns {"scenario/mode": result}"""
+    root = tempfile.mkdtemp(prefix="activity-tracker-bench-")
+    try:
+        started = time.perf_counter()
+        env = make_environment(root, windows, icon_files)
+        print(f"Synthetic desktop ready in {time.perf_counter() - started:.1f}s: "
+              f"{windows} windows, {app_count(windows)} apps, {icon_files} icon files", file=sys.stderr)
+
+        results = {}
+        for scenario in _scenarios(windows):
+            args, stdin = scenario["cli"]
+            results[f"{scenario['name']}/cli"] = measure(lambda: run_cli(env, args, stdin), runs)
+
+        client = ServeClient(env)
+        try:
+            for scenario in _scenarios(windows):
+                command, params = scenario["serve"]
+                results[f"{scenario['name']}/serve"] = measure(lambda: client.request(command, params), runs)
+        finally:
+            client.close()
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def compare(results, baseline, tolerance):
+    """Descriptions of the results that regressed against the baseline"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if (result["wall_ms"] > base["wall_ms"] * (1 + tolerance)
+                and result["wall_ms"] - base["wall_ms"] > MIN_REGRESSION_MS):
+            regressions.append(f"{key}: wall time {base['wall_ms']}ms -> {result['wall_ms']}ms")
+        if result["subprocesses"] > base["subprocesses"]:
+            regressions.append(f"{key}: subprocesses {base['subprocesses']} -> {result['subprocesses']}")
+        if result["stdout_bytes"] > base["stdout_bytes"] * (1 + tolerance):
+            regressions.append(f"{key}: stdout {base['stdout_bytes']} -> {result['stdout_bytes']} bytes")
+    return regressions
+
+def load_baselines(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as baseline_file:
+            return json.load(baseline_file)
+    except (OSError, ValueError):
+        return {}
+
+def save_baselines(path, baselines):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Linux platform layer against fake X tools")
+    parser.add_argument("--windows", type=int, default=DEFAULT_WINDOWS, help="open windows (10 to 500)")
+    parser.add_argument("--icon-files", type=int, default=DEFAULT_ICON_FILES,
+                        help="files in the icon theme tree (10k to 100k)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="measured runs per scenario")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="replace the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    options = parser.parse_args()
+
+    results = run_benchmarks(options.windows, options.icon_files, options.runs)
+
+    # Baselines are only comparable for the same configuration
+    config_key = f"windows={options.windows},icon_files={options.icon_files}"
+    baselines = load_baselines(options.baseline)
+    baseline = baselines.get(config_key)
+    regressions = compare(results, baseline, options.tolerance) if baseline and not options.save_baseline else []
+
+    if baseline is None or options.save_baseline:
+        baselines[config_key] = results
+        save_baselines(options.baseline, baselines)
+
+    print(json.dumps({
+        "config": {"windows": options.windows, "icon_files": options.icon_files, "runs": options.runs},
+        "results": results,
+        "baseline": options.baseline if baseline is not None and not options.save_baseline else None,
+        "regressions": regressions,
+    }, indent=2))
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Import Time Check - Keep the CLI entry points cheap to start
+
+One-shot invocations of window_utils.py and app_icon_util.py pay for module
+import on every call, which puts a floor under sampling latency. This check
+imports each entry point in a fresh interpreter with "-X importtime" and
+fails when the cumulative import time exceeds a budget, or when a heavy
+module (PIL, psutil, win32/COM) is loaded at import time instead of on the
+code path that needs it.
+
+Usage:
+    check_import_time.py [--budget-ms N] [--runs N] [module ...]
+
+Exits 0 when every module is within budget, 1 otherwise.
+'''
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MODULES = ["window_utils", "app_icon_util"]
+DEFAULT_BUDGET_MS = float(os.environ.get("ACTIVITY_TRACKER_IMPORT_BUDGET_MS", 50))
+DEFAULT_RUNS = 5
+
+# Top-level packages that must only be imported lazily
+HEAVY_MODULES = ("PIL", "psutil", "win32api", "win32gui", "win32ui", "win32con", "win32process",
+                 "win32com", "pythoncom", "pywintypes", "numpy")
+
+def measure(module):
+    """
+    Import a module in a fresh interpreter and return (cumulative microseconds,
+    names of all modules imported along the way)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPT_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {proc.stderr.strip().splitlines()[-1:]}")
+
+    cumulative = None
+    imported = []
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        imported.append(name)
+        if name == module:
+            cumulative = int(parts[1])
+
+    if cumulative is None:
+        raise RuntimeError(f"No import time reported for {module}")
+    return cumulative, imported
+
+def check(module, budget_ms, runs=DEFAULT_RUNS):
+    """Best-of-N import time for a module, and the heavy modules it pulled in"""
+    best = None
+    heavy = set()
+    for _ in range(runs):
+        cumulative, imported = measure(module)
+        best = cumulative if best is None else min(best, cumulative)
+        heavy.update(name for name in imported if name.split(".")[0] in HEAVY_MODULES)
+
+    return {
+        "module": module,
+        "import_ms": round(best / 1000.0, 2),
+        "budget_ms": budget_ms,
+        "heavy_imports": sorted(heavy),
+        "ok": best / 1000.0 <= budget_ms and not heavy,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import time of the CLI entry points")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    options = parser.parse_args()
+
+    # The first run also compiles bytecode; don't count that against the budget
+    for module in options.modules:
+        measure(module)
+
+    results = [check(module, options.budget_ms, options.runs) for module in options.modules]
+    for result in results:
+        print(json.dumps(result))
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Process Cache Check - Application names derived from process metadata
+
+app_identity only looks at a process's name, executable and command line,
+and _process_windows only at the entries the process cache returns, so both
+can be checked with scripted processes: this script checks the identity of
+interpreter command lines (including options that take a value) and that
+the process table still names apps by their process name.
+
+Usage:
+    check_process_cache.py
+
+Prints one JSON line per scenario; exits 0 when all pass, 1 otherwise.
+'''
+
+import sys
+import json
+
+import process_cache
+
+# (name, exe, cmdline) -> expected identity
+IDENTITIES = [
+    (("python3", "/usr/bin/python3.12", ["python3", "-W", "ignore", "app.py"]), "app.py"),
+    (("python3", "/usr/bin/python3.12", ["python3", "-Wignore", "-X", "utf8", "tools/app.py", "-v"]), "app.py"),
+    (("python3", "/usr/bin/python3.12", ["python3", "-u", "-m", "http.server", "8000"]), "http.server"),
+    (("python3", "/usr/bin/python3.12", ["python3", "-c", "print(1)"]), "python3.12"),
+    (("java.exe", "C:\\jdk\\bin\\java.exe",
+      ["java.exe", "-classpath", "x.jar", "com.dat.activity_tracker.MainKt"]), "com.dat.activity_tracker.MainKt"),
+    (("java", "/usr/bin/java", ["java", "-Xmx1g", "-Dkey=value", "-jar", "/opt/app/tool.jar"]), "tool.jar"),
+    (("java", "/usr/bin/java", ["java", "-p", "mods", "-m", "app.module/app.Main"]), "app.Main"),
+    (("node", "/usr/bin/node", ["node", "--require", "ts-node/register", "server.ts"]), "server.ts"),
+    (("node", "/usr/bin/node", ["node", "-p", "1 + 1"]), "node"),
+    (("gnome-control-c", "/usr/bin/gnome-control-center", ["gnome-control-center"]), "gnome-control-center"),
+]
+
+class FakeCache:
+    """Stands in for ProcessCache.scan with scripted entries"""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def scan(self):
+        return self.entries
+
+def entry(pid, name, exe, cmdline):
+    return {"pid": pid, "create_time": 1.0, "name": name, "exe": exe, "cmdline": cmdline,
+            "username": "user", "access_denied": False,
+            "app_name": process_cache.app_identity(name, exe, cmdline)}
+
+def expect(name, actual, expected):
+    return {"check": name, "ok": actual == expected, "actual": actual, "expected": expected}
+
+def check_identities():
+    """Interpreters are named by what they run, skipping option values"""
+    actual = [process_cache.app_identity(*process) for process, _ in IDENTITIES]
+    return expect("identities", actual, [identity for _, identity in IDENTITIES])
+
+def check_process_windows():
+    """The process table keeps the process name; the identity is only the title"""
+    import window_backends
+
+    previous = process_cache._default_process_cache
+    process_cache._default_process_cache = FakeCache([
+        entry(10, "java", "/usr/bin/java", ["java", "-cp", "x.jar", "com.dat.activity_tracker.MainKt"]),
+        entry(11, "firefox", "/usr/lib/firefox/firefox", ["firefox"]),
+    ])
+    try:
+        return expect("process_windows", window_backends._process_windows(), {
+            "proc:10:1.0": {"app_name": "java", "title": "com.dat.activity_tracker.MainKt"},
+            "proc:11:1.0": {"app_name": "firefox", "title": "firefox"},
+        })
+    finally:
+        process_cache._default_process_cache = previous
+
+CHECKS = [check_identities, check_process_windows]
+
+if __name__ == "__main__":
+    results = []
+    for run_check in CHECKS:
+        try:
+            result = run_check()
+        except Exception as e:
+            result = {"check": run_check.__name__[len("check_"):], "ok": False, "error": repr(e)}
+        if result["ok"]:
+            result = {"check": result["check"], "ok": True}
+        results.append(result)
+        print(json.dumps(result, default=str))
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
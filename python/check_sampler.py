@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Sampler Check - Drive the activity sampler with a stub sample source
+
+ActivitySampler takes its samples from any callable and its clock from any
+function, so its behaviour can be checked without a desktop: this script
+feeds scripted samples at scripted times through ActivitySampler.observe
+and checks the coalesced intervals, the batching of flushes, the handling
+of sampling gaps and idle periods, and what ActivityWriter stores in a
+temporary database.
+
+Usage:
+    check_sampler.py
+
+Prints one JSON line per scenario; exits 0 when all pass, 1 otherwise.
+'''
+
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+import activity_sampler
+import idle_state
+
+START = datetime(2026, 1, 5, 9, 0, 0)
+
+def window(app_name, window_title="", category="Development"):
+    return {"app_name": app_name, "window_title": window_title, "category": category}
+
+def idle(state, since_s, changed):
+    """An idle_state check result, as IdleMonitor.check() returns it"""
+    return {"state": state, "since": (START + timedelta(seconds=since_s)).isoformat(), "changed": changed,
+            "next_interval_s": idle_state.ACTIVE_INTERVAL if state == idle_state.ACTIVE else idle_state.IDLE_INTERVAL}
+
+class Recorder:
+    """Stands in for ActivityWriter.write, keeping every batch"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, intervals, events=()):
+        self.batches.append((list(intervals), list(events)))
+
+    def intervals(self):
+        return [(i["app_name"], i["window_title"], seconds(i["start"]), seconds(i["end"]))
+                for batch, _ in self.batches for i in batch]
+
+    def events(self):
+        return [(event_type, seconds(timestamp)) for _, batch in self.batches for event_type, timestamp in batch]
+
+def seconds(moment):
+    return int((moment - START).total_seconds())
+
+def drive(samples, **options):
+    """
+    Feed (offset seconds, sample) pairs to a new sampler, then shut it down
+    one second after the last sample. Returns (sampler, recorder).
+    """
+    recorder = Recorder()
+    clock = [START]
+    sampler = activity_sampler.ActivitySampler(None, recorder, clock=lambda: clock[0], **options)
+    for offset, sample in samples:
+        clock[0] = START + timedelta(seconds=offset)
+        sampler.observe(sample, clock[0])
+    clock[0] += timedelta(seconds=1)
+    sampler.shutdown()
+    return sampler, recorder
+
+def expect(name, actual, expected):
+    return {"check": name, "ok": actual == expected, "actual": actual, "expected": expected}
+
+def check_coalescing():
+    """Identical samples extend one interval; a change closes it at the change"""
+    samples = [(t, window("code", "main.py")) for t in range(0, 4)]
+    samples += [(t, window("firefox", "Docs", "Browser")) for t in range(4, 7)]
+    samples += [(7, window("code", "main.py"))]
+    _, recorder = drive(samples)
+    return expect("coalescing", recorder.intervals(),
+                  [("code", "main.py", 0, 4), ("firefox", "Docs", 4, 7), ("code", "main.py", 7, 8)])
+
+def check_empty_samples():
+    """A sample without an app ends the interval and starts none"""
+    samples = [(0, window("code")), (1, window("code")), (2, {}), (3, {}), (4, window("code"))]
+    _, recorder = drive(samples)
+    return expect("empty_samples", recorder.intervals(), [("code", "", 0, 2), ("code", "", 4, 5)])
+
+def check_gap():
+    """A gap longer than MAX_GAP_SAMPLES intervals isn't credited to the app"""
+    gap = int(activity_sampler.MAX_GAP_SAMPLES) + 5
+    samples = [(0, window("code")), (1, window("code")), (1 + gap, window("code"))]
+    _, recorder = drive(samples)
+    return expect("gap", recorder.intervals(), [("code", "", 0, 1), ("code", "", 1 + gap, 2 + gap)])
+
+def check_batching():
+    """Closed intervals are written batch_size at a time, the rest on shutdown"""
+    samples = [(t, window(f"app{t}")) for t in range(7)]
+    sampler, recorder = drive(samples, batch_size=3, flush_interval=3600)
+    return expect("batching", [len(batch) for batch, _ in recorder.batches], [3, 3, 1])
+
+def check_flush_interval():
+    """A partial batch is written once flush_interval seconds have passed"""
+    samples = [(0, window("code"))] + [(t, window("firefox")) for t in range(1, 12)]
+    _, recorder = drive(samples, batch_size=50, flush_interval=10)
+    return expect("flush_interval", [len(batch) for batch, _ in recorder.batches], [1, 1])
+
+def check_idle():
+    """Going idle ends the interval at the last input and records the transitions"""
+    samples = [(t, dict(window("code"), idle_state=idle(idle_state.ACTIVE, 0, False))) for t in range(0, 5)]
+    # Idleness noticed at 130s, but the last input was at 2s
+    samples += [(130, {"idle_state": idle(idle_state.IDLE, 2, True)})]
+    samples += [(160, {"idle_state": idle(idle_state.LOCKED, 160, True)})]
+    samples += [(190, dict(window("code"), idle_state=idle(idle_state.ACTIVE, 190, True)))]
+    sampler, recorder = drive(samples)
+    return expect("idle", {"intervals": recorder.intervals(), "events": recorder.events(),
+                           "idle_interval": sampler.next_interval(samples[-2][1])},
+                  {"intervals": [("code", "", 0, 2), ("code", "", 190, 191)],
+                   "events": [("idle", 2), ("locked", 160), ("active", 190)],
+                   "idle_interval": idle_state.IDLE_INTERVAL})
+
+def check_write_failure():
+    """Intervals survive a failed write and go out with the next flush"""
+    calls = []
+
+    def flaky_write(intervals, events=()):
+        calls.append(len(intervals))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+
+    clock = [START]
+    sampler = activity_sampler.ActivitySampler(None, flaky_write, batch_size=1, clock=lambda: clock[0])
+    stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+    try:
+        for offset, app_name in [(0, "code"), (1, "firefox"), (2, "code")]:
+            clock[0] = START + timedelta(seconds=offset)
+            sampler.observe(window(app_name), clock[0])
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+    return expect("write_failure", calls, [1, 2])
+
+def check_database():
+    """ActivityWriter stores intervals, categories and events in one database"""
+    directory = tempfile.mkdtemp(prefix="activity-sampler-check-")
+    try:
+        db_path = os.path.join(directory, "activity_tracker.db")
+        writer = activity_sampler.ActivityWriter(db_path)
+        samples = [(t, dict(window("code", "main.py"), idle_state=idle(idle_state.ACTIVE, 0, False)))
+                   for t in range(0, 3)]
+        samples += [(t, dict(window("firefox", "Docs", "Browser"), idle_state=idle(idle_state.ACTIVE, 0, False)))
+                    for t in range(3, 10)]
+        # Still sampled as active until 9s, but the last input was at 5s
+        samples += [(10, {"idle_state": idle(idle_state.IDLE, 5, True)})]
+        _, recorder = drive(samples)
+        for intervals, events in recorder.batches:
+            writer.write(intervals, events)
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        try:
+            activities = conn.execute(
+                "SELECT app_name, window_title, start_time, end_time, duration, category "
+                "FROM activities ORDER BY id").fetchall()
+            categories = conn.execute("SELECT app_name, category FROM app_categories ORDER BY app_name").fetchall()
+            events = conn.execute("SELECT event_type, timestamp FROM system_events").fetchall()
+        finally:
+            conn.close()
+        return expect("database", {"activities": activities, "categories": categories, "events": events,
+                                   "flushes": writer.flushes}, {
+            "activities": [("code", "main.py", "2026-01-05T09:00:00", "2026-01-05T09:00:03", 3, "Development"),
+                           ("firefox", "Docs", "2026-01-05T09:00:03", "2026-01-05T09:00:05", 2, "Browser")],
+            "categories": [("code", "Development"), ("firefox", "Browser")],
+            "events": [("idle", "2026-01-05T09:00:05")],
+            "flushes": 1,
+        })
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+CHECKS = [check_coalescing, check_empty_samples, check_gap, check_batching, check_flush_interval,
+          check_idle, check_write_failure, check_database]
+
+if __name__ == "__main__":
+    results = []
+    for run_check in CHECKS:
+        try:
+            result = run_check()
+        except Exception as e:
+            result = {"check": run_check.__name__[len("check_"):], "ok": False, "error": repr(e)}
+        if result["ok"]:
+            result = {"check": result["check"], "ok": True}
+        results.append(result)
+        print(json.dumps(result, default=str))
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Xlib Backend Check - Run the python-xlib backend against a fake display
+
+XlibBackend accepts a display object, so its property decoding, the
+request burst in get_properties and the event subscriptions of watch() can
+be checked without an X server: this script builds a fake display holding
+a few windows (one of which disappears mid-burst) and checks what the
+backend and the xlib window backend report for it. python-xlib itself must
+be installed, since the backend uses its constants.
+
+Usage:
+    check_xlib_backend.py
+
+Prints one JSON line per scenario; exits 0 when all pass, 1 otherwise.
+'''
+
+import sys
+import json
+
+import xlib_backend
+
+PROPERTY_CHANGE = 1 << 22
+
+class FakeProperty:
+    def __init__(self, value):
+        self.value = value
+        self.property_type = 1 if value is not None else 0
+
+class FakeWindow:
+    def __init__(self, display, window_id):
+        self.display = display
+        self.id = window_id
+
+    def get_full_property(self, atom, property_type):
+        value = self.display.root_properties.get(atom)
+        return FakeProperty(value) if value is not None else None
+
+    def change_attributes(self, event_mask, onerror=None):
+        self.display.event_masks[self.id] = event_mask
+
+class FakeDisplay:
+    """Root properties and per-window properties; atoms are their own names"""
+
+    def __init__(self, windows, active=None, vanished=()):
+        self.windows = windows
+        self.vanished = set(vanished)
+        self.root_properties = {"_NET_CLIENT_LIST": list(windows), "_NET_ACTIVE_WINDOW": [active or 0]}
+        self.event_masks = {}
+        self.log = []
+        self.display = self
+
+    def screen(self):
+        class Screen:
+            root = FakeWindow(self, "root")
+        return Screen
+
+    def intern_atom(self, name):
+        return name
+
+    def create_resource_object(self, kind, window_id):
+        return FakeWindow(self, window_id)
+
+    def flush(self):
+        self.log.append("flush")
+
+    def close(self):
+        pass
+
+class FakeGetProperty:
+    """Stands in for Xlib.protocol.request.GetProperty on the fake display"""
+
+    def __init__(self, display, defer, delete, window, property, type, long_offset, long_length):
+        self.display = display
+        self.window = window
+        self.property = property
+        display.log.append("request")
+
+    def reply(self):
+        self.display.log.append("reply")
+        if self.window in self.display.vanished:
+            raise RuntimeError("BadWindow")
+        value = self.display.windows[self.window].get(self.property)
+        self.value = value
+        self.property_type = 1 if value is not None else 0
+
+WINDOWS = {
+    0x1a00003: {"_NET_WM_NAME": "main.py — Visual Studio Code".encode('utf-8'),
+                "WM_CLASS": b"code\0Code\0", "_NET_WM_PID": [4242]},
+    0x2c00001: {"WM_NAME": "R\xe9sum\xe9.odt".encode('latin-1'), "WM_CLASS": b"libreoffice\0libreoffice-writer\0"},
+    0x3e00007: {"_NET_WM_NAME": b"Gone", "WM_CLASS": b"gone\0Gone\0"},
+}
+
+def make_backend(active=None, vanished=()):
+    display = FakeDisplay(WINDOWS, active, vanished)
+    backend = xlib_backend.XlibBackend(display)
+    backend._get_property = FakeGetProperty
+    return display, backend
+
+def expect(name, actual, expected):
+    return {"check": name, "ok": actual == expected, "actual": actual, "expected": expected}
+
+def check_active_window():
+    """_NET_WM_NAME is decoded as UTF-8, WM_CLASS split into instance and class"""
+    _, backend = make_backend(active=0x1a00003)
+    return expect("active_window", backend.active_window(), {
+        "window_id": 0x1a00003, "title": "main.py — Visual Studio Code",
+        "instance": "code", "wm_class": "Code", "pid": 4242,
+    })
+
+def check_no_active_window():
+    _, backend = make_backend(active=None)
+    return expect("no_active_window", backend.active_window(), None)
+
+def check_wm_name_fallback():
+    """Without _NET_WM_NAME the Latin-1 WM_NAME is used"""
+    _, backend = make_backend(active=0x2c00001)
+    window = backend.active_window()
+    return expect("wm_name_fallback", (window["title"], window["wm_class"], window["pid"]),
+                  ("R\xe9sum\xe9.odt", "libreoffice-writer", None))
+
+def check_burst():
+    """Every property request is sent before the first reply is awaited"""
+    display, backend = make_backend()
+    backend.list_windows()
+    first_reply = display.log.index("reply")
+    requests = len(WINDOWS) * len(xlib_backend.WINDOW_PROPERTIES)
+    return expect("burst", (display.log[:first_reply].count("request"), display.log[first_reply - 1]),
+                  (requests, "flush"))
+
+def check_vanished_window():
+    """A window destroyed mid-burst is skipped, the others are still listed"""
+    _, backend = make_backend(vanished=[0x3e00007])
+    return expect("vanished_window", [window["instance"] for window in backend.list_windows()],
+                  ["code", "libreoffice"])
+
+def check_watch():
+    """The root is subscribed once; focus moves unsubscribe the previous window"""
+    display, backend = make_backend()
+    masks = []
+    for window_id in [0x1a00003, 0x1a00003, 0x2c00001, None]:
+        backend.watch(window_id)
+        masks.append(dict(display.event_masks))
+    return expect("watch", masks, [
+        {"root": PROPERTY_CHANGE, 0x1a00003: PROPERTY_CHANGE},
+        {"root": PROPERTY_CHANGE, 0x1a00003: PROPERTY_CHANGE},
+        {"root": PROPERTY_CHANGE, 0x1a00003: 0, 0x2c00001: PROPERTY_CHANGE},
+        {"root": PROPERTY_CHANGE, 0x1a00003: 0, 0x2c00001: 0},
+    ])
+
+def check_window_backend():
+    """The registry's xlib backend maps windows to the fields window_utils reports"""
+    import window_backends
+
+    _, backend = make_backend(active=0x1a00003, vanished=[0x3e00007])
+    previous = xlib_backend._backend, xlib_backend._backend_error
+    xlib_backend._backend, xlib_backend._backend_error = backend, None
+    try:
+        window_backend = window_backends.XlibWindowBackend()
+        return expect("window_backend", {
+            "active": window_backend.active_window(None),
+            "windows": window_backend.list_windows(None),
+        }, {
+            "active": {"app_name": "Code", "window_title": "main.py — Visual Studio Code"},
+            "windows": {f"x11:{0x1a00003}": {"app_name": "code", "title": "main.py — Visual Studio Code"},
+                        f"x11:{0x2c00001}": {"app_name": "libreoffice", "title": "R\xe9sum\xe9.odt"}},
+        })
+    finally:
+        xlib_backend._backend, xlib_backend._backend_error = previous
+
+CHECKS = [check_active_window, check_no_active_window, check_wm_name_fallback, check_burst,
+          check_vanished_window, check_watch, check_window_backend]
+
+if __name__ == "__main__":
+    results = []
+    for run_check in CHECKS:
+        try:
+            result = run_check()
+        except Exception as e:
+            result = {"check": run_check.__name__[len("check_"):], "ok": False, "error": repr(e)}
+        if result["ok"]:
+            result = {"check": result["check"], "ok": True}
+        results.append(result)
+        print(json.dumps(result, default=str, ensure_ascii=False))
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Command Runner - Deadline-bounded external commands on asyncio
+
+Platform queries shell out to tools such as xdotool, xprop, osascript or
+rsvg-convert, any of which can hang (a wedged X server, a stalled Apple
+Events call, an icon directory on a slow network mount). Commands here run
+as asyncio subprocesses under one deadline per query: independent commands
+(e.g. a window's name and class) run concurrently, whatever is still running
+when the deadline passes is killed, and the caller gets the finished results
+plus the list of commands that timed out, so it can return a partial answer
+instead of blocking the sample.
+'''
+
+import os
+import time
+import signal
+import subprocess
+from collections import namedtuple
+
+import diagnostics
+
+# Overall time budget for one query, across all of its commands
+DEFAULT_DEADLINE = float(os.environ.get("ACTIVITY_TRACKER_COMMAND_DEADLINE", 2.0))
+
+# Commands started at once by run_commands
+MAX_CONCURRENCY = 8
+
+CommandOutput = namedtuple("CommandOutput", ["returncode", "stdout", "stderr"])
+
+class Deadline:
+    """A point in monotonic time shared by every stage of one query"""
+
+    def __init__(self, seconds=DEFAULT_DEADLINE):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires - time.monotonic(), 0)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+def _kill(proc):
+    """Kill a process and, on POSIX, everything in its process group"""
+    if os.name == "posix":
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+            return
+        except OSError:
+            pass
+    proc.kill()
+
+# asyncio is imported where it is used: it is slow to import, and queries
+# answered in-process (python-xlib, win32) never need it
+
+async def _run(args, semaphore):
+    import asyncio
+
+    async with semaphore:
+        diagnostics.count("subprocesses")
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            # Own process group, so a straggler's children can be killed with it
+            start_new_session=(os.name == "posix"),
+        )
+        try:
+            stdout, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            # Don't leave stragglers running once the deadline has passed
+            if proc.returncode is None:
+                _kill(proc)
+                await proc.wait()
+            raise
+        return CommandOutput(proc.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace'))
+
+async def _run_all(commands, timeout, max_concurrency):
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = {key: asyncio.ensure_future(_run(args, semaphore)) for key, args in commands.items()}
+
+    _, pending = await asyncio.wait(list(tasks.values()), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {}
+    timed_out = []
+    for key, task in tasks.items():
+        if task in pending:
+            timed_out.append(key)
+        else:
+            # A command that could not start (e.g. FileNotFoundError) reports its exception
+            results[key] = task.exception() or task.result()
+    return results, timed_out
+
+def run_commands(commands, deadline=None, max_concurrency=MAX_CONCURRENCY):
+    """
+    Run independent commands concurrently until the deadline.
+
+    commands maps a key to an argument list. Returns (results, timed_out):
+    results maps each finished key to a CommandOutput, or to the exception
+    that prevented it from starting; timed_out lists the keys that were
+    killed at the deadline.
+    """
+    if deadline is None:
+        deadline = Deadline()
+    if not commands:
+        return {}, []
+    if deadline.expired():
+        return {}, list(commands)
+
+    import asyncio
+    return asyncio.run(_run_all(commands, deadline.remaining(), max_concurrency))
+
+def run_command(args, deadline=None):
+    """Run one command, raising subprocess.TimeoutExpired at the deadline"""
+    if deadline is None:
+        deadline = Deadline()
+    results, timed_out = run_commands({"command": args}, deadline)
+    if timed_out:
+        raise subprocess.TimeoutExpired(args, deadline.seconds)
+
+    result = results["command"]
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+def check_output(args, deadline=None):
+    """Like subprocess.check_output, but bounded by a deadline and returning stripped text"""
+    result = run_command(args, deadline)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, args, result.stdout, result.stderr)
+    return result.stdout.strip()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Diagnostics - Error reporting, per-request profiles and latency statistics
+
+stdout of the CLI and of serve mode is parsed as JSON by the JVM, so errors
+and warnings from the platform code go to stderr through report() instead
+of being printed. While a profile is active (a "--profile" CLI call or a
+serve request with "profile": true) they are also collected into its
+"diagnostics" list, and code that wants to be accounted for marks phases
+and counts events on it:
+
+    with diagnostics.phase("icon"):
+        ...
+    diagnostics.count("subprocesses")
+
+Both are near no-ops when nothing is being profiled. A phase opened inside
+another one of the same thread is reported under its path
+("icon/icon_resolve"), so the top-level phases never overlap and their sum
+never exceeds total_ms. Long-lived modes also keep per-command latency
+histograms (fixed log-scale buckets, so memory is constant) for the
+"stats" command.
+'''
+
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+# The profile of the request being handled; serve handles one at a time, and
+# worker threads of that request (e.g. icon batches) report into it as well
+_active = None
+
+# Names of the phases open in each thread, outermost first
+_open_phases = threading.local()
+
+def report(message):
+    """Write an error or warning to stderr, and to the active profile's diagnostics"""
+    profile = _active
+    if profile is not None:
+        profile.add_diagnostic(message)
+    sys.stderr.write(f"{message}\n")
+    sys.stderr.flush()
+
+class Profile:
+    """Phase timings, counters and diagnostics of one command"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.diagnostics = []
+        self._lock = threading.Lock()
+
+    def add_phase(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_diagnostic(self, message):
+        with self._lock:
+            self.diagnostics.append(message)
+
+    def timings(self, payload_bytes=None):
+        """The "timings" object: total and per-phase milliseconds, plus counters"""
+        with self._lock:
+            timings = {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "phases": {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()},
+                "subprocesses": self.counters.get("subprocesses", 0),
+            }
+            other = {name: value for name, value in self.counters.items() if name != "subprocesses"}
+            if other:
+                timings["counters"] = other
+        if payload_bytes is not None:
+            timings["payload_bytes"] = payload_bytes
+        return timings
+
+@contextmanager
+def profiling(enabled=True):
+    """Make a new Profile active for the duration of a command; yields it (or None)"""
+    global _active
+    if not enabled:
+        yield None
+        return
+    previous, _active = _active, Profile()
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+@contextmanager
+def phase(name):
+    """
+    Time a block as a phase of the active profile; phases repeated in loops
+    add up, and nested ones are named by their path from the outermost
+    """
+    profile = _active
+    if profile is None:
+        yield
+        return
+    outer = getattr(_open_phases, "path", "")
+    path = f"{outer}/{name}" if outer else name
+    _open_phases.path = path
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_phase(path, time.perf_counter() - started)
+        _open_phases.path = outer
+
+def count(name, amount=1):
+    """Count an event (e.g. "subprocesses") on the active profile"""
+    profile = _active
+    if profile is not None:
+        profile.count(name, amount)
+
+# Histogram buckets: upper bounds from 0.1ms growing by 25% up to about a minute
+_BUCKET_BOUNDS_MS = []
+_bound = 0.1
+while _bound < 60000:
+    _BUCKET_BOUNDS_MS.append(_bound)
+    _bound *= 1.25
+_BUCKET_BOUNDS_MS.append(float("inf"))
+
+class LatencyHistogram:
+    """Cumulative latency distribution in fixed log-scale buckets"""
+
+    def __init__(self):
+        self.buckets = [0] * len(_BUCKET_BOUNDS_MS)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, milliseconds, error=False):
+        index = 0
+        while milliseconds > _BUCKET_BOUNDS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.errors += bool(error)
+        self.total_ms += milliseconds
+        self.max_ms = max(self.max_ms, milliseconds)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples (within 25%)"""
+        if not self.count:
+            return None
+        threshold = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= threshold:
+                return round(min(_BUCKET_BOUNDS_MS[index], self.max_ms), 3)
+        return round(self.max_ms, 3)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+class CommandStats:
+    """Latency histograms per command for a long-lived process"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, command, milliseconds, error=False):
+        with self._lock:
+            histogram = self._histograms.get(command)
+            if histogram is None:
+                histogram = self._histograms[command] = LatencyHistogram()
+            histogram.record(milliseconds, error)
+
+    def summary(self):
+        with self._lock:
+            return {command: histogram.summary() for command, histogram in sorted(self._histograms.items())}
+
+def hit_rate(hits, misses):
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else None}
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Icon Cache - Two-tier cache for extracted app icons
+
+An in-process LRU sits in front of an on-disk store, both bounded by a byte
+cap. Entries are keyed by the app name plus the resolved icon source and its
+mtime, so a changed executable or icon file naturally gets a fresh entry.
+The source itself is remembered per app name for SOURCE_TTL seconds, so a
+hit only costs a stat of the source instead of resolving it again.
+'''
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import diagnostics
+
+# Default locations and limits, overridable through the environment
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+CACHE_DIR = os.environ.get("ACTIVITY_TRACKER_ICON_CACHE_DIR", os.path.join(DATA_DIR, "cache", "icons"))
+MEMORY_LIMIT_BYTES = int(os.environ.get("ACTIVITY_TRACKER_ICON_MEMORY_BYTES", 8 * 1024 * 1024))
+DISK_LIMIT_BYTES = int(os.environ.get("ACTIVITY_TRACKER_ICON_DISK_BYTES", 64 * 1024 * 1024))
+# Seconds a resolved icon source is reused before resolving it again
+SOURCE_TTL = float(os.environ.get("ACTIVITY_TRACKER_ICON_SOURCE_TTL", 60.0))
+
+ENTRY_SUFFIX = ".icon"
+
+def make_key(app_name, source, variant=""):
+    """
+    Build the cache key for an app and its resolved icon source (None for
+    misses). The variant distinguishes encodings of the same icon, e.g. "64.png".
+    """
+    mtime = 0
+    if source:
+        try:
+            mtime = os.stat(source).st_mtime_ns
+        except OSError:
+            source = None
+    return (app_name, source or "", mtime, variant)
+
+def _app_hash(app_name):
+    return hashlib.sha1(app_name.encode('utf-8')).hexdigest()[:16]
+
+def key_digest(key):
+    """
+    Short stable string for a cache key, used as the icon reference handed to
+    clients. It is prefixed with the app hash so one app can be invalidated.
+    """
+    app_name, source, mtime, variant = key
+    source_hash = hashlib.sha1(f"{source}\0{mtime}\0{variant}".encode('utf-8')).hexdigest()[:16]
+    return f"{_app_hash(app_name)}-{source_hash}"
+
+def _entry_filename(key):
+    return key_digest(key) + ENTRY_SUFFIX
+
+def evict_least_recent(paths, limit):
+    """
+    Delete the least recently used files (by mtime) until their total size is
+    10% under limit. Returns the remaining total size.
+    """
+    entries = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError:
+            pass
+
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    target = limit * 0.9
+    for _, size, path in entries:
+        if total <= target:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError:
+            pass
+    return total
+
+class IconCache:
+    """In-process LRU in front of a size-bounded on-disk store"""
+
+    def __init__(self, directory=CACHE_DIR, memory_limit=MEMORY_LIMIT_BYTES, disk_limit=DISK_LIMIT_BYTES,
+                 source_ttl=SOURCE_TTL):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.source_ttl = source_ttl
+        # App name -> (icon source, monotonic time it was resolved)
+        self._sources = {}
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def source(self, app_name, resolve):
+        """The app's icon source from resolve(app_name), reused for source_ttl seconds"""
+        with self._lock:
+            known = self._sources.get(app_name)
+        now = time.monotonic()
+        if known is not None and now - known[1] < self.source_ttl:
+            return known[0]
+
+        # Resolve outside the lock, so icon workers don't wait on each other
+        source = resolve(app_name)
+        with self._lock:
+            self._sources[app_name] = (source, now)
+        return source
+
+    def get(self, key):
+        """Return the cached icon for a key, or None"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+
+            value = self._read_disk(key)
+            if value is not None:
+                self._remember(key, value)
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store an icon in both tiers"""
+        with self._lock:
+            self._remember(key, value)
+            self._write_disk(key, value)
+
+    def invalidate(self, app_name=None):
+        """Drop cached icons for one app, or everything when app_name is None"""
+        with self._lock:
+            if app_name is None:
+                self._sources.clear()
+                self._memory.clear()
+                self._memory_bytes = 0
+            else:
+                self._sources.pop(app_name, None)
+                for key in [k for k in self._memory if k[0] == app_name]:
+                    self._memory_bytes -= len(self._memory.pop(key))
+
+            prefix = _app_hash(app_name) + "-" if app_name is not None else ""
+            removed = 0
+            for entry in self._scan_disk():
+                if entry.name.startswith(prefix):
+                    try:
+                        os.unlink(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
+            self._disk_bytes = None
+            return {"invalidated": removed}
+
+    def _remember(self, key, value):
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+
+        self._memory[key] = value
+        self._memory_bytes += len(value)
+
+        while self._memory_bytes > self.memory_limit and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _scan_disk(self):
+        try:
+            return [e for e in os.scandir(self.directory) if e.name.endswith(ENTRY_SUFFIX)]
+        except OSError:
+            return []
+
+    def _read_disk(self, key):
+        path = os.path.join(self.directory, _entry_filename(key))
+        try:
+            with open(path, 'r', encoding='utf-8') as entry_file:
+                value = entry_file.read()
+            # The file mtime doubles as the LRU timestamp for disk eviction
+            os.utime(path)
+            return value
+        except OSError:
+            return None
+
+    def _write_disk(self, key, value):
+        path = os.path.join(self.directory, _entry_filename(key))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            # Write to a temporary file first so readers never see partial entries
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as entry_file:
+                entry_file.write(value)
+            os.replace(temp_path, path)
+        except OSError as e:
+            diagnostics.report(f"Error writing icon cache entry: {str(e)}")
+            return
+
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(e.stat().st_size for e in self._scan_disk())
+        else:
+            self._disk_bytes += len(value)
+
+        if self._disk_bytes > self.disk_limit:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        self._disk_bytes = evict_least_recent([e.path for e in self._scan_disk()], self.disk_limit)
+
+_default_cache = None
+
+def get_default_cache():
+    """Get the process-wide icon cache"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IconCache()
+    return _default_cache
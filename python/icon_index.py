@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Icon Index - Prebuilt name-to-file index of the Linux icon themes
+
+Instead of walking /usr/share/icons for every lookup, the icon theme
+directories, pixmaps and the Icon= entries of .desktop files are indexed once
+per session. The index is persisted between runs and refreshed incrementally:
+only directories whose mtime changed are listed again. Each refresh runs
+under a deadline, so a slow (e.g. network-mounted) data directory delays
+the first lookup by at most SCAN_DEADLINE seconds; the listings gathered so
+far are kept and the scan carries on at the next refresh.
+'''
+
+import os
+import re
+import json
+import time
+import threading
+import configparser
+
+import diagnostics
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+INDEX_PATH = os.environ.get("ACTIVITY_TRACKER_ICON_INDEX", os.path.join(DATA_DIR, "cache", "icon_index.json"))
+INDEX_VERSION = 1
+
+# How often a long-lived process re-checks directory mtimes
+REFRESH_INTERVAL = 60
+
+# Seconds one refresh may spend walking directories
+SCAN_DEADLINE = float(os.environ.get("ACTIVITY_TRACKER_ICON_SCAN_DEADLINE", 5.0))
+
+ICON_EXTENSIONS = {'.png': 0, '.svg': 1, '.xpm': 2, '.jpg': 3, '.jpeg': 3, '.ico': 3}
+SIZE_DIR_PATTERN = re.compile(r'^(\d+)(?:x\d+)?(?:@(\d+)x?)?$')
+
+def _data_dirs():
+    """XDG data directories, user directory first"""
+    home = os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share"))
+    system = os.environ.get("XDG_DATA_DIRS", "/usr/local/share:/usr/share").split(":")
+    return [home] + [d for d in system if d]
+
+def default_icon_roots():
+    """Directories containing icon themes or loose icons"""
+    roots = [os.path.expanduser("~/.icons")]
+    roots += [os.path.join(d, "icons") for d in _data_dirs()]
+    roots += [os.path.join(d, "pixmaps") for d in _data_dirs()]
+    return roots
+
+def default_desktop_dirs():
+    """Directories containing .desktop application entries"""
+    return [os.path.join(d, "applications") for d in _data_dirs()]
+
+def preferred_theme():
+    """Read the user's icon theme from the environment or the GTK settings"""
+    theme = os.environ.get("ACTIVITY_TRACKER_ICON_THEME")
+    if theme:
+        return theme
+
+    for settings_path in ["~/.config/gtk-3.0/settings.ini", "~/.config/gtk-4.0/settings.ini"]:
+        parser = configparser.ConfigParser(interpolation=None)
+        try:
+            parser.read(os.path.expanduser(settings_path))
+            theme = parser.get("Settings", "gtk-icon-theme-name", fallback=None)
+            if theme:
+                return theme
+        except configparser.Error:
+            pass
+    return None
+
+def _describe_icon(root, rel_dir):
+    """Parse theme and pixel size (0 for scalable/unknown) from an icon path"""
+    parts = rel_dir.split(os.sep) if rel_dir else []
+    theme = parts[0] if parts and os.path.basename(root) in ("icons", ".icons") else ""
+    size = 0
+    for part in parts[1:]:
+        match = SIZE_DIR_PATTERN.match(part)
+        if match:
+            size = int(match.group(1)) * int(match.group(2) or 1)
+            break
+    return theme, size
+
+def _normalize_name(name):
+    return name.lower().replace('.exe', '')
+
+class IconIndex:
+    """Name-to-candidates map over icon themes, pixmaps and .desktop entries"""
+
+    def __init__(self, icon_roots=None, desktop_dirs=None, path=INDEX_PATH, scan_deadline=SCAN_DEADLINE):
+        self.icon_roots = icon_roots if icon_roots is not None else default_icon_roots()
+        self.desktop_dirs = desktop_dirs if desktop_dirs is not None else default_desktop_dirs()
+        self.path = path
+        self.scan_deadline = scan_deadline
+        # The user's preferred theme, read again on every refresh
+        self.theme = None
+        self.complete = False
+        self._dirs = {}
+        self._names = {}
+        self._desktop_icons = {}
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self.dirs_listed = 0
+
+    def load(self):
+        """Load the persisted directory listings, if any"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as index_file:
+                data = json.load(index_file)
+            if data.get("version") == INDEX_VERSION:
+                self._dirs = data.get("dirs", {})
+        except (OSError, ValueError):
+            self._dirs = {}
+
+    def save(self):
+        """Persist the directory listings for the next run"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as index_file:
+                json.dump({"version": INDEX_VERSION, "dirs": self._dirs}, index_file, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            diagnostics.report(f"Error saving icon index: {str(e)}")
+
+    def refresh(self):
+        """Re-list only directories whose mtime changed and rebuild the name map"""
+        from command_runner import Deadline
+
+        self.dirs_listed = 0
+        self.theme = preferred_theme()
+        deadline = Deadline(self.scan_deadline)
+        seen = set()
+
+        for root in self.icon_roots:
+            self._refresh_dir(root, seen, deadline, recursive=True)
+        for desktop_dir in self.desktop_dirs:
+            self._refresh_dir(desktop_dir, seen, deadline, recursive=False, desktop=True)
+
+        self.complete = not deadline.expired()
+        if self.complete:
+            changed = self.dirs_listed > 0 or len(seen) != len(self._dirs)
+            self._dirs = {path: entry for path, entry in self._dirs.items() if path in seen}
+        else:
+            # Directories the walk didn't reach keep their previous listings
+            diagnostics.report(f"Icon index scan stopped after {self.scan_deadline}s, "
+                               f"{len(seen)} directories checked")
+            changed = self.dirs_listed > 0
+        self._rebuild()
+        self._checked_at = time.monotonic()
+        return changed
+
+    def _refresh_dir(self, path, seen, deadline, recursive, desktop=False):
+        if deadline.expired():
+            return
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        seen.add(path)
+
+        entry = self._dirs.get(path)
+        if entry is None or entry["m"] != mtime:
+            entry = self._list_dir(path, mtime, desktop)
+            self._dirs[path] = entry
+            self.dirs_listed += 1
+
+        if recursive:
+            for subdir in entry["d"]:
+                self._refresh_dir(os.path.join(path, subdir), seen, deadline, recursive)
+
+    def _list_dir(self, path, mtime, desktop):
+        entry = {"m": mtime, "f": [], "d": []}
+        if desktop:
+            entry["e"] = {}
+        try:
+            for item in os.scandir(path):
+                if item.is_dir(follow_symlinks=True):
+                    entry["d"].append(item.name)
+                elif desktop and item.name.endswith(".desktop"):
+                    entry["e"][item.name] = self._parse_desktop_file(item.path)
+                elif os.path.splitext(item.name)[1].lower() in ICON_EXTENSIONS:
+                    entry["f"].append(item.name)
+        except OSError:
+            pass
+        return entry
+
+    @staticmethod
+    def _parse_desktop_file(path):
+        """Collect the Icon= value and the names a window may report for it"""
+        icon = None
+        keys = [os.path.splitext(os.path.basename(path))[0]]
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as desktop_file:
+                in_main_section = False
+                for line in desktop_file:
+                    line = line.strip()
+                    if line.startswith('['):
+                        in_main_section = line == "[Desktop Entry]"
+                    elif in_main_section and '=' in line:
+                        field, value = line.split('=', 1)
+                        if field == "Icon":
+                            icon = value.strip()
+                        elif field == "StartupWMClass":
+                            keys.append(value.strip())
+                        elif field == "Exec" and value.strip():
+                            keys.append(os.path.basename(value.split()[0]))
+        except OSError:
+            pass
+        return {"icon": icon, "keys": keys}
+
+    def _rebuild(self):
+        names = {}
+        desktop_icons = {}
+        roots = sorted(self.icon_roots, key=len, reverse=True)
+
+        for path, entry in self._dirs.items():
+            for desktop_entry in entry.get("e", {}).values():
+                if desktop_entry["icon"]:
+                    for key in desktop_entry["keys"]:
+                        desktop_icons.setdefault(_normalize_name(key), desktop_entry["icon"])
+
+            if not entry["f"]:
+                continue
+            root = next((r for r in roots if path == r or path.startswith(r + os.sep)), path)
+            rel_dir = os.path.relpath(path, root) if path != root else ""
+            theme, size = _describe_icon(root, rel_dir)
+            for filename in entry["f"]:
+                stem, ext = os.path.splitext(filename)
+                candidate = (os.path.join(path, filename), theme, size, ext.lower())
+                names.setdefault(stem.lower(), []).append(candidate)
+
+        self._names = names
+        self._desktop_icons = desktop_icons
+
+    def ensure_fresh(self):
+        """Build the index on first use and re-check mtimes every REFRESH_INTERVAL"""
+        with self._lock:
+            if not self._checked_at:
+                self.load()
+                if self.refresh():
+                    self.save()
+            elif time.monotonic() - self._checked_at > REFRESH_INTERVAL:
+                if self.refresh():
+                    self.save()
+
+    def candidates(self, name):
+        """All indexed files for an icon name"""
+        self.ensure_fresh()
+        return list(self._names.get(name.lower(), []))
+
+    def lookup(self, app_name, size=64, theme=None):
+        """Resolve the best icon file for an app at the requested pixel size"""
+        self.ensure_fresh()
+        theme = theme or self.theme
+
+        icon_name = _normalize_name(app_name)
+        names = [icon_name, icon_name.split('.')[0], icon_name.split('.')[-1]]
+
+        desktop_icon = self._desktop_icons.get(icon_name)
+        if desktop_icon:
+            if os.path.isabs(desktop_icon):
+                if os.path.isfile(desktop_icon):
+                    return desktop_icon
+            else:
+                names.insert(0, _normalize_name(desktop_icon))
+
+        for name in names:
+            candidates = self._names.get(name)
+            if candidates:
+                return min(candidates, key=lambda c: self._score(c, size, theme))[0]
+        return None
+
+    @staticmethod
+    def _score(candidate, size, theme):
+        """Lower is better: theme preference, then size fit, then format"""
+        _, candidate_theme, candidate_size, ext = candidate
+        if theme and candidate_theme == theme:
+            theme_rank = 0
+        elif candidate_theme == "hicolor":
+            theme_rank = 1
+        elif candidate_theme:
+            theme_rank = 2
+        else:
+            theme_rank = 3
+
+        if candidate_size == size:
+            size_rank = 0
+        elif candidate_size > size:
+            size_rank = 1 + (candidate_size - size) / 1000
+        elif candidate_size == 0:
+            size_rank = 2
+        else:
+            size_rank = 3 + (size - candidate_size) / 1000
+
+        return (theme_rank, size_rank, ICON_EXTENSIONS.get(ext, 9))
+
+_default_index = None
+
+def get_default_index():
+    """Get the process-wide icon index"""
+    global _default_index
+    if _default_index is None:
+        _default_index = IconIndex()
+    return _default_index
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Icon Normalize - Convert icon sources to small, consistent payloads
+
+Every source (PNG, ICO, XPM, JPEG, SVG or an extracted bitmap) is scaled to
+a square of the requested pixel size, stripped of metadata and encoded as an
+optimized PNG or WebP, labelled with its real MIME type.
+'''
+
+import io
+import os
+import base64
+import shutil
+import subprocess
+
+import diagnostics
+
+DEFAULT_ICON_SIZE = 64
+SUPPORTED_SIZES = (16, 24, 32, 48, 64, 128, 256)
+FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+def validate(size, image_format):
+    """Check a requested size and format, raising ValueError otherwise"""
+    if int(size) not in SUPPORTED_SIZES:
+        raise ValueError(f"Unsupported icon size: {size}")
+    if image_format not in FORMATS:
+        raise ValueError(f"Unsupported icon format: {image_format}")
+    return int(size), image_format
+
+def _rasterize_svg(path, size):
+    """Render an SVG at the given size with cairosvg or rsvg-convert, if available"""
+    from PIL import Image
+    
+    try:
+        import cairosvg
+        png_bytes = cairosvg.svg2png(url=path, output_width=size, output_height=size)
+        return Image.open(io.BytesIO(png_bytes))
+    except ImportError:
+        pass
+
+    if shutil.which("rsvg-convert"):
+        diagnostics.count("subprocesses")
+        proc = subprocess.run(
+            ["rsvg-convert", "-w", str(size), "-h", str(size), "-f", "png", path],
+            capture_output=True, timeout=10,
+        )
+        if proc.returncode == 0 and proc.stdout:
+            return Image.open(io.BytesIO(proc.stdout))
+
+    raise RuntimeError("No SVG renderer available (install cairosvg or rsvg-convert)")
+
+def open_icon_file(path, size=DEFAULT_ICON_SIZE):
+    """Open an icon file as an image, rendering vector formats at `size`"""
+    from PIL import Image
+    
+    if os.path.splitext(path)[1].lower() in (".svg", ".svgz"):
+        image = _rasterize_svg(path, size)
+    else:
+        image = Image.open(path)
+        if image.format == "ICO":
+            # Pick the embedded size closest to (but not below) the target
+            sizes = sorted(image.info.get("sizes", []), key=lambda s: (s[0] < size, abs(s[0] - size)))
+            if sizes:
+                image.size = sizes[0]
+    image.load()
+    return image
+
+def normalize(image, size=DEFAULT_ICON_SIZE):
+    """Fit an image into a transparent size x size RGBA square"""
+    from PIL import Image
+    
+    image = image.convert("RGBA")
+    if image.size != (size, size):
+        fitted = image.copy()
+        fitted.thumbnail((size, size), Image.LANCZOS)
+        if fitted.size == image.size and max(image.size) < size:
+            # thumbnail() never upscales; small sources are enlarged here
+            scale = size / max(image.size)
+            fitted = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+
+        canvas = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        canvas.paste(fitted, ((size - fitted.width) // 2, (size - fitted.height) // 2))
+        image = canvas
+
+    # A fresh image carries no EXIF, text chunks or colour profiles
+    return Image.frombytes("RGBA", image.size, image.tobytes())
+
+def encode(image, image_format="png"):
+    """Encode a normalized image with size-optimized settings"""
+    buffered = io.BytesIO()
+    if image_format == "webp":
+        image.save(buffered, format="WEBP", lossless=True, method=6)
+    else:
+        image.save(buffered, format="PNG", optimize=True)
+    return buffered.getvalue()
+
+def encode_icon(image, size=DEFAULT_ICON_SIZE, image_format="png"):
+    """Normalize and encode an image, returning (bytes, MIME type)"""
+    return encode(normalize(image, size), image_format), FORMATS[image_format]
+
+def to_data_url(data, mime):
+    """Wrap encoded icon bytes as a base64 data URL"""
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Icon Store - Content-addressed on-disk store for encoded icons
+
+Each encoded icon is written once to a file named by the SHA-256 of its
+bytes, so identical icons are stored once. Instead of inlining base64 data
+URLs in every JSON response, callers hand out a small reference with the hash,
+file path and MIME type, and the JVM side reads the file when it needs it.
+'''
+
+import os
+import hashlib
+import threading
+
+from icon_cache import DATA_DIR, evict_least_recent
+
+STORE_DIR = os.environ.get("ACTIVITY_TRACKER_ICON_STORE_DIR", os.path.join(DATA_DIR, "cache", "icon_store"))
+STORE_LIMIT_BYTES = int(os.environ.get("ACTIVITY_TRACKER_ICON_STORE_BYTES", 64 * 1024 * 1024))
+
+EXTENSIONS = {"image/png": ".png", "image/webp": ".webp"}
+
+class IconStore:
+    """Content-addressed directory of encoded icon files, bounded in size"""
+
+    def __init__(self, directory=STORE_DIR, limit=STORE_LIMIT_BYTES):
+        self.directory = directory
+        self.limit = limit
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    def path_for(self, digest, mime):
+        """Path of a stored icon; files are fanned out by the first two hex digits"""
+        return os.path.join(self.directory, digest[:2], digest + EXTENSIONS[mime])
+
+    def put(self, data, mime):
+        """Store encoded icon bytes (if not already present) and return a reference"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest, mime)
+
+        if os.path.isfile(path):
+            # Refresh the mtime so eviction treats this icon as recently used
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as icon_file:
+                icon_file.write(data)
+            os.replace(temp_path, path)
+            self._account(len(data))
+
+        return {"hash": digest, "path": path, "mime": mime}
+
+    def exists(self, ref):
+        """Whether a reference still points at a stored file"""
+        return bool(ref) and os.path.isfile(ref.get("path", ""))
+
+    def read(self, ref):
+        """Read the bytes behind a reference"""
+        with open(ref["path"], 'rb') as icon_file:
+            return icon_file.read()
+
+    def _files(self):
+        files = []
+        try:
+            for fan_out in os.scandir(self.directory):
+                if fan_out.is_dir():
+                    files.extend(e.path for e in os.scandir(fan_out.path) if not e.name.endswith(".tmp"))
+        except OSError:
+            pass
+        return files
+
+    def _account(self, added):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(os.stat(path).st_size for path in self._files() if os.path.isfile(path))
+            else:
+                self._total_bytes += added
+
+            if self._total_bytes > self.limit:
+                self._total_bytes = evict_least_recent(self._files(), self.limit)
+
+_default_store = None
+
+def get_default_store():
+    """Get the process-wide icon store"""
+    global _default_store
+    if _default_store is None:
+        _default_store = IconStore()
+    return _default_store
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Idle State - User idle time, screen lock and the next sample interval
+
+A fixed one-second sampling rate spends as much on an empty desk as on a
+busy one, and credits the time to whatever window was last focused. This
+module tells the samplers whether anyone is there. On Linux the idle time
+comes from the X server's MIT-SCREEN-SAVER extension over the shared
+python-xlib connection (no subprocess per sample), with the screen saver
+being on taken as the screen being locked. Without an X display, logind's
+IdleHint and LockedHint are read through loginctl instead.
+
+Each check classifies the user as "active", "idle" (no input for
+IDLE_THRESHOLD seconds) or "locked", and recommends when to sample next:
+every ACTIVE_INTERVAL seconds while active, IDLE_INTERVAL seconds while
+idle or locked. Transitions are reported once, with the time the new state
+began, so samplers can end the open interval at the last input and record
+the change in system_events.
+
+Like the window backend registry, the monitor keeps the first source that
+probes fine, but probes again every REPROBE_INTERVAL seconds while it has
+none, had to fall back past a faster one, or its source failed, so a
+display or session that wasn't ready when the tracker started is picked
+up once it is.
+'''
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import diagnostics
+
+# Seconds without input after which the user counts as idle
+IDLE_THRESHOLD = float(os.environ.get("ACTIVITY_TRACKER_IDLE_THRESHOLD", 120.0))
+# Recommended seconds between samples while active, and while idle or locked
+ACTIVE_INTERVAL = float(os.environ.get("ACTIVITY_TRACKER_ACTIVE_INTERVAL", 1.0))
+IDLE_INTERVAL = float(os.environ.get("ACTIVITY_TRACKER_IDLE_INTERVAL", 30.0))
+# Seconds after which the sources are probed again while degraded
+REPROBE_INTERVAL = float(os.environ.get("ACTIVITY_TRACKER_IDLE_REPROBE", 30.0))
+
+ACTIVE = "active"
+IDLE = "idle"
+LOCKED = "locked"
+
+class XScreenSaverSource:
+    """Idle time and screen saver state from the MIT-SCREEN-SAVER extension"""
+
+    name = "xscreensaver"
+
+    def probe(self):
+        import xlib_backend
+        from window_backends import BackendUnavailable
+
+        if xlib_backend.backend_error() is not None:
+            xlib_backend.reset_backend()
+        backend = xlib_backend.get_backend()
+        if backend is None:
+            raise BackendUnavailable(f"no X display via python-xlib: {xlib_backend.backend_error()}")
+        if not backend.display.has_extension("MIT-SCREEN-SAVER"):
+            raise BackendUnavailable("the X server has no MIT-SCREEN-SAVER extension")
+        return "MIT-SCREEN-SAVER extension on the X display"
+
+    def read(self, deadline):
+        import xlib_backend
+        from Xlib.ext import screensaver
+
+        backend = xlib_backend.get_backend()
+        if backend is None:
+            raise RuntimeError(f"X display unavailable: {xlib_backend.backend_error()}")
+        try:
+            info = backend.root.screensaver_query_info()
+        except Exception:
+            # Reconnect on the next call
+            xlib_backend.reset_backend()
+            raise
+        return {"idle_s": info.idle / 1000, "locked": info.state == screensaver.StateOn}
+
+class LogindSource:
+    """IdleHint and LockedHint of the current logind session, through loginctl"""
+
+    name = "logind"
+
+    def __init__(self):
+        self.session = os.environ.get("XDG_SESSION_ID") or "self"
+
+    def probe(self):
+        import command_runner
+        from window_backends import BackendUnavailable, require_tools
+
+        require_tools("loginctl")
+        try:
+            self.read(command_runner.Deadline())
+        except Exception as e:
+            raise BackendUnavailable(f"loginctl show-session {self.session} failed: {e}")
+        return f"logind session {self.session} via loginctl"
+
+    def read(self, deadline):
+        import command_runner
+
+        output = command_runner.check_output(
+            ["loginctl", "show-session", self.session,
+             "-p", "IdleHint", "-p", "IdleSinceHintMonotonic", "-p", "LockedHint"], deadline)
+        properties = dict(line.split("=", 1) for line in output.splitlines() if "=" in line)
+
+        result = {"idle_s": 0.0, "locked": properties.get("LockedHint") == "yes"}
+        if properties.get("IdleHint") == "yes":
+            # The desktop sets the hint after its own timeout, so trust it
+            # over IDLE_THRESHOLD; the timestamp is CLOCK_MONOTONIC in µs
+            since = int(properties.get("IdleSinceHintMonotonic") or 0)
+            result["idle"] = True
+            result["idle_s"] = max(time.monotonic() - since / 1e6, 0.0) if since else 0.0
+        return result
+
+def default_sources():
+    """Idle sources to try, fastest first (only Linux has any)"""
+    import platform
+    if platform.system() != "Linux":
+        return []
+    return [XScreenSaverSource(), LogindSource()]
+
+class IdleMonitor:
+    """
+    Classifies the user as active, idle or locked from the first working
+    source, and remembers the previous state to report transitions.
+    """
+
+    def __init__(self, sources=None, idle_threshold=IDLE_THRESHOLD, active_interval=ACTIVE_INTERVAL,
+                 idle_interval=IDLE_INTERVAL, reprobe_interval=REPROBE_INTERVAL, clock=datetime.now):
+        self._candidates = sources
+        self.idle_threshold = idle_threshold
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.reprobe_interval = reprobe_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._source = None
+        self._rejected = None
+        self._failed = False
+        self._probes = 0
+        self._probed_at = 0
+        self.state = None
+        self.since = None
+
+    def _probe(self):
+        """Try each source in order and keep the first that works"""
+        from window_backends import BackendUnavailable
+
+        self._source = None
+        self._rejected = {}
+        self._failed = False
+        self._probes += 1
+        self._probed_at = time.monotonic()
+
+        candidates = self._candidates if self._candidates is not None else default_sources()
+        for candidate in candidates:
+            try:
+                candidate.probe()
+                self._source = candidate
+                return
+            except BackendUnavailable as e:
+                self._rejected[candidate.name] = str(e)
+            except Exception as e:
+                self._rejected[candidate.name] = f"probe failed: {e}"
+
+    def degraded(self):
+        """Whether a faster source was rejected, none works, or the chosen one failed"""
+        return self._source is None or bool(self._rejected) or self._failed
+
+    def source(self):
+        """The chosen source, probing on first use and periodically while degraded"""
+        if self._probes == 0:
+            self._probe()
+        elif self.degraded() and time.monotonic() - self._probed_at >= self.reprobe_interval:
+            self._probe()
+        return self._source
+
+    def check(self, deadline=None):
+        """
+        {"state", "idle_s", "locked", "since", "changed", "next_interval_s",
+        "source"}: the current state, when it began (ISO timestamp), whether
+        this check saw it change, and when to sample next. Without a working
+        source the user is always reported active, with an "error".
+        """
+        with self._lock:
+            now = self.clock()
+            result = {"state": ACTIVE, "idle_s": None, "locked": False}
+            source = self.source()
+            if source is None:
+                result["error"] = f"No idle source available: {self._rejected}"
+            else:
+                if deadline is None:
+                    import command_runner
+                    deadline = command_runner.Deadline()
+                try:
+                    with diagnostics.phase("idle"):
+                        reading = source.read(deadline)
+                    idle = reading.get("idle", reading["idle_s"] >= self.idle_threshold)
+                    result.update(idle_s=round(reading["idle_s"], 3), locked=reading["locked"])
+                    result["state"] = LOCKED if reading["locked"] else IDLE if idle else ACTIVE
+                    self._failed = False
+                except Exception as e:
+                    self._failed = True
+                    diagnostics.report(f"Error reading idle state from {source.name}: {str(e)}")
+                    result["error"] = str(e)
+                    # Keep the last known state rather than flapping to active
+                    if self.state is not None:
+                        result["state"] = self.state
+
+            changed = self.state is not None and result["state"] != self.state
+            if self.state is None or changed:
+                # Idleness began at the last input, not when it was noticed
+                began = now - timedelta(seconds=result["idle_s"]) if result["state"] == IDLE else now
+                self.since = began
+            self.state = result["state"]
+
+            result["since"] = self.since.isoformat()
+            result["changed"] = changed
+            result["next_interval_s"] = self.active_interval if self.state == ACTIVE else self.idle_interval
+            result["source"] = source.name if source is not None else None
+            return result
+
+    def status(self):
+        """Which source is in use, and why the others were rejected"""
+        with self._lock:
+            source = self.source()
+            return {"source": source.name if source else None, "rejected": dict(self._rejected),
+                    "failed": self._failed, "probes": self._probes, "degraded": self.degraded()}
+
+_default_monitor = None
+
+def get_default_monitor():
+    """Get the process-wide idle monitor"""
+    global _default_monitor
+    if _default_monitor is None:
+        _default_monitor = IdleMonitor()
+    return _default_monitor
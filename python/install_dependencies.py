@@ -3,59 +3,191 @@
 
 '''
 Install required Python dependencies for Activity Tracker
+
+Requirements are read from requirements.txt and checked against the installed
+distributions with importlib.metadata; pip only runs for the ones that are
+missing. Once everything is satisfied a stamp file is written, keyed on a hash
+of requirements.txt, the platform and the interpreter, so later startups can
+skip the check almost entirely.
+
+Usage:
+    install_dependencies.py          Install missing requirements
+    install_dependencies.py --check  Exit 0 if satisfied, 1 otherwise (never installs)
 '''
 
-import subprocess
+import os
+import re
 import sys
+import json
+import site
+import hashlib
+import importlib
 import platform
+import subprocess
+
+try:
+    from importlib import metadata
+except ImportError:  # Python < 3.8
+    import importlib_metadata as metadata
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REQUIREMENTS_FILE = os.path.join(SCRIPT_DIR, "requirements.txt")
+DATA_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), "data")
+STAMP_FILE = os.environ.get("ACTIVITY_TRACKER_DEPS_STAMP", os.path.join(DATA_DIR, "cache", "deps_stamp.json"))
+
+# Environment marker variables understood in requirements.txt
+MARKER_VALUES = {
+    "sys_platform": sys.platform,
+    "platform_system": platform.system(),
+    "os_name": os.name,
+    "python_version": "%d.%d" % sys.version_info[:2],
+}
+
+_MARKER_CLAUSE = re.compile(r"""^\s*(\w+)\s*(==|!=)\s*['"]([^'"]*)['"]\s*$""")
+_REQUIREMENT_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
 
-def install_package(package):
-    print(f"Installing {package}...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "--user", package])
-
-# Common dependencies for all platforms
-common_dependencies = [
-    "pillow",  # For image processing
-    "psutil",  # For process information
-]
-
-# Platform-specific dependencies
-if platform.system() == "Windows":
-    windows_dependencies = [
-        "pywin32",     # For Windows API access
-        "pypiwin32",   # Additional Windows-specific utilities
-    ]
-    for package in windows_dependencies:
-        try:
-            install_package(package)
-        except Exception as e:
-            print(f"Failed to install {package}: {e}")
-
-elif platform.system() == "Darwin":  # macOS
-    macos_dependencies = [
-        "pyobjc",      # For macOS API access
-    ]
-    for package in macos_dependencies:
-        try:
-            install_package(package)
-        except Exception as e:
-            print(f"Failed to install {package}: {e}")
-
-elif platform.system() == "Linux":
-    linux_dependencies = [
-        "python-xlib",  # For X Window System access
-    ]
-    for package in linux_dependencies:
-        try:
-            install_package(package)
-        except Exception as e:
-            print(f"Failed to install {package}: {e}")
-
-# Install common dependencies
-for package in common_dependencies:
+def marker_matches(marker):
+    """
+    Evaluate a simple environment marker such as "sys_platform == 'win32'".
+    Clauses may be joined with "and" / "or"; "and" binds tighter.
+    """
+    if not marker:
+        return True
+
+    for alternative in re.split(r"\s+or\s+", marker):
+        satisfied = True
+        for clause in re.split(r"\s+and\s+", alternative):
+            match = _MARKER_CLAUSE.match(clause)
+            if not match or match.group(1) not in MARKER_VALUES:
+                raise ValueError(f"Unsupported environment marker: {clause.strip()}")
+            name, op, value = match.groups()
+            if (MARKER_VALUES[name] == value) != (op == "=="):
+                satisfied = False
+                break
+        if satisfied:
+            return True
+    return False
+
+def read_requirements(path=REQUIREMENTS_FILE):
+    """Return the requirement specifiers that apply to this platform"""
+    requirements = []
+    with open(path, 'r', encoding='utf-8') as requirements_file:
+        for line in requirements_file:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            spec, _, marker = line.partition(";")
+            if marker_matches(marker.strip()):
+                requirements.append(spec.strip())
+    return requirements
+
+def requirement_name(spec):
+    """Distribution name of a requirement specifier, e.g. "pillow>=9" -> "pillow" """
+    match = _REQUIREMENT_NAME.match(spec)
+    return match.group(1) if match else spec
+
+def installed_version(name):
+    """Installed version of a distribution, or None"""
     try:
-        install_package(package)
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+def find_missing(requirements):
+    """Requirements with no installed distribution"""
+    return [spec for spec in requirements if installed_version(requirement_name(spec)) is None]
+
+def fingerprint(path=REQUIREMENTS_FILE):
+    """Hash of the requirements file, the platform and the interpreter"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as requirements_file:
+        digest.update(requirements_file.read())
+    for part in (sys.platform, platform.machine(), sys.version, sys.executable):
+        digest.update(b"\0" + part.encode('utf-8'))
+    return digest.hexdigest()
+
+def read_stamp():
+    try:
+        with open(STAMP_FILE, 'r', encoding='utf-8') as stamp_file:
+            return json.load(stamp_file)
+    except (OSError, ValueError):
+        return {}
+
+def write_stamp(current_fingerprint, requirements):
+    stamp = {
+        "fingerprint": current_fingerprint,
+        "packages": {requirement_name(spec): installed_version(requirement_name(spec)) for spec in requirements},
+    }
+    try:
+        os.makedirs(os.path.dirname(STAMP_FILE), exist_ok=True)
+        temp_path = f"{STAMP_FILE}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as stamp_file:
+            json.dump(stamp, stamp_file)
+        os.replace(temp_path, STAMP_FILE)
+    except OSError as e:
+        print(f"Could not write dependency stamp: {e}")
+
+def stamp_is_current(current_fingerprint):
+    """
+    Whether the stamp matches this interpreter and requirements file and the
+    recorded distributions are still installed at the same versions
+    """
+    stamp = read_stamp()
+    if stamp.get("fingerprint") != current_fingerprint:
+        return False
+    return all(installed_version(name) == version for name, version in stamp.get("packages", {}).items())
+
+def install_packages(packages):
+    print(f"Installing {', '.join(packages)}...")
+    command = [sys.executable, "-m", "pip", "install"]
+    # --user is rejected inside virtual environments
+    if sys.prefix == getattr(sys, "base_prefix", sys.prefix):
+        command.append("--user")
+    subprocess.check_call(command + packages)
+
+def check():
+    """Fast check: True when all requirements are satisfied"""
+    current_fingerprint = fingerprint()
+    if stamp_is_current(current_fingerprint):
+        return True
+
+    requirements = read_requirements()
+    if find_missing(requirements):
+        return False
+    write_stamp(current_fingerprint, requirements)
+    return True
+
+def ensure_dependencies():
+    """Install whatever is missing; returns True when all requirements are satisfied"""
+    if check():
+        return True
+
+    requirements = read_requirements()
+    missing = find_missing(requirements)
+    try:
+        install_packages(missing)
     except Exception as e:
-        print(f"Failed to install {package}: {e}")
+        print(f"Failed to install {', '.join(missing)}: {e}")
+
+    # A first --user install creates the user site directory after startup
+    user_site = site.getusersitepackages()
+    if os.path.isdir(user_site) and user_site not in sys.path:
+        sys.path.append(user_site)
+    importlib.invalidate_caches()
+
+    still_missing = find_missing(requirements)
+    if still_missing:
+        print(f"Missing dependencies: {', '.join(still_missing)}")
+        return False
+
+    write_stamp(fingerprint(), requirements)
+    return True
+
+if __name__ == "__main__":
+    if "--check" in sys.argv[1:]:
+        sys.exit(0 if check() else 1)
 
-print("Dependencies installation completed.")
+    if ensure_dependencies():
+        print("Dependencies installation completed.")
+        sys.exit(0)
+    sys.exit(1)
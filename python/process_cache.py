@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Process Cache - Per-process metadata cached by (pid, create_time)
+
+Enumerating running applications from the process table used to re-inspect
+every process on every scan. A process's name, executable and command line
+never change for its lifetime, and (pid, create_time) identifies that
+lifetime even when pids are reused. So each scan only inspects processes
+that appeared since the last one, reuses everything else, and forgets
+processes that are gone. AccessDenied results are cached the same way
+instead of being retried every few seconds.
+'''
+
+import os
+import threading
+
+# Processes whose name is a launcher for the real application, by family
+INTERPRETERS = {
+    "python": "python", "python3": "python", "pythonw": "python",
+    "java": "java", "javaw": "java",
+    "node": "node", "electron": "node",
+    "mono": "mono",
+}
+
+# Per family: options whose value is the next argument, options naming the
+# application in the next argument, and options running inline code
+VALUE_OPTIONS = {
+    "python": {"-W", "-X", "--check-hash-based-pycs"},
+    "java": {"-cp", "-classpath", "--class-path", "-p", "--module-path", "--upgrade-module-path",
+             "--add-modules", "--add-opens", "--add-exports", "--add-reads", "--limit-modules",
+             "--enable-native-access"},
+    "node": {"-r", "--require", "--import", "--loader", "--experimental-loader", "-C", "--conditions",
+             "--env-file", "--input-type", "--title"},
+    "mono": set(),
+}
+TARGET_OPTIONS = {"python": {"-m"}, "java": {"-jar", "-m", "--module"}, "node": set(), "mono": set()}
+INLINE_OPTIONS = {"python": {"-c"}, "java": set(), "node": {"-e", "--eval", "-p", "--print"}, "mono": set()}
+
+def app_identity(name, exe, cmdline):
+    """
+    Descriptive application name for a process.
+
+    Linux truncates process names to 15 characters, so the executable's base
+    name is preferred when the name is a prefix of it. For interpreters the
+    script, module, jar or main class being run identifies the application
+    better. Activities are recorded under the plain process name, so this is
+    only for labels that want to tell interpreter processes apart.
+    """
+    exe_name = os.path.basename(exe) if exe else ""
+    if exe_name and name and exe_name != name and exe_name.startswith(name):
+        name = exe_name
+
+    family = INTERPRETERS.get(os.path.splitext(name or "")[0].lower())
+    if family and cmdline:
+        args = iter(cmdline[1:])
+        for arg in args:
+            if arg in INLINE_OPTIONS[family]:
+                # Inline code: nothing better than the interpreter name
+                break
+            if arg in TARGET_OPTIONS[family]:
+                arg = next(args, "")
+            elif arg in VALUE_OPTIONS[family]:
+                next(args, None)
+                continue
+            elif arg.startswith("-"):
+                # Flags, and options with their value attached (-Wignore, -Dkey=value)
+                continue
+            script = os.path.basename(arg.rstrip("/\\"))
+            if script:
+                return script
+            break
+
+    return name or exe_name
+
+class ProcessCache:
+    """Metadata for live processes, inspected once per (pid, create_time)"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.inspected = 0
+        self.reused = 0
+
+    def _inspect(self, proc, key):
+        import psutil
+
+        entry = {"pid": key[0], "create_time": key[1], "name": "", "exe": "", "cmdline": [],
+                 "username": None, "access_denied": False}
+        with proc.oneshot():
+            for field in ("name", "exe", "cmdline", "username"):
+                try:
+                    value = getattr(proc, field)()
+                    if value is not None:
+                        entry[field] = value
+                except psutil.AccessDenied:
+                    # Remember the denial; it won't change for this process
+                    entry["access_denied"] = True
+                except psutil.ZombieProcess:
+                    pass
+
+        entry["app_name"] = app_identity(entry["name"], entry["exe"], entry["cmdline"])
+        self.inspected += 1
+        return entry
+
+    def _entry(self, proc):
+        """Cached entry for a psutil.Process, inspecting it if it is new"""
+        # psutil memoizes create_time on the Process object, and process_iter
+        # reuses those objects, so this is cheap for known processes
+        key = (proc.pid, proc.create_time())
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = self._inspect(proc, key)
+        else:
+            self.reused += 1
+        return key, entry
+
+    def scan(self):
+        """Entries for all live processes; forgets processes that have exited"""
+        import psutil
+
+        with self._lock:
+            live = {}
+            for proc in psutil.process_iter():
+                try:
+                    key, entry = self._entry(proc)
+                    live[key] = entry
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+            self._entries = live
+            return list(live.values())
+
+    def lookup(self, pid):
+        """Entry for one pid, or None if the process is gone"""
+        import psutil
+
+        with self._lock:
+            try:
+                return self._entry(psutil.Process(pid))[1]
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                return None
+
+    def stats(self):
+        """Counters for diagnostics"""
+        with self._lock:
+            return {"entries": len(self._entries), "inspected": self.inspected, "reused": self.reused}
+
+_default_process_cache = None
+
+def get_default_process_cache():
+    """Get the process-wide process cache"""
+    global _default_process_cache
+    if _default_process_cache is None:
+        _default_process_cache = ProcessCache()
+    return _default_process_cache
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Title Analytics - Streaming top-N window titles per app in bounded memory
+
+Window titles are the most detailed signal collected, and there are far too
+many distinct ones to count exactly over months. Titles are first
+normalized to what they are about: the site or domain for browsers, the
+document name for editors, with unread counters ("(3) Inbox"), progress
+percentages and clock times removed. The normalized titles are then counted
+per app with Space-Saving sketches: a fixed number of apps, each with a
+fixed number of title counters, so memory stays constant however many
+titles go through. Each reported count is an upper bound, and `error` says
+by how much it may overestimate.
+
+Titles can be fed live (serve mode counts every get_active_window_info
+sample) or streamed from the activities history, weighted by duration.
+'''
+
+import re
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# Apps tracked at once, and title counters per app
+DEFAULT_APP_CAPACITY = 64
+DEFAULT_TITLE_CAPACITY = 32
+
+# Normalized titles are cut to this length
+MAX_TITLE_LENGTH = 120
+
+# Leading unread/notification markers: "(3) ", "[12] ", "● ", "* "
+_LEADING_MARKER = re.compile(r"^(?:\(\d+\+?\)|\[\d+\+?\]|[●•*])\s*")
+# Trailing counters: "Inbox (3)"
+_TRAILING_COUNTER = re.compile(r"\s*\(\d+\+?\)$")
+# Separators between title segments: "Page - Site - Browser"
+_SEPARATOR = re.compile(r"\s+[-—–|·]\s+")
+# Host names, but not the domain part of an e-mail address
+_DOMAIN = re.compile(r"(?<![\w@.-])(?:https?://)?((?:[a-z0-9-]+\.)+[a-z]{2,})(?:[:/]|\b)", re.IGNORECASE)
+_FILE_NAME = re.compile(r"^[^\\/:*?\"<>|]+\.[A-Za-z0-9]{1,5}$")
+_VOLATILE = re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\b|\b\d+(?:\.\d+)?%")
+
+# Window title suffixes naming the application rather than the content
+APP_SUFFIXES = ("google chrome", "mozilla firefox", "microsoft edge", "brave", "opera",
+                "safari", "chromium", "visual studio code", "intellij idea", "android studio", "notepad++",
+                "microsoft word", "microsoft excel", "microsoft powerpoint", "word", "excel", "powerpoint",
+                "libreoffice writer", "libreoffice calc")
+
+def _app_stem(app_name):
+    name = re.split(r"[\\/]", app_name or "")[-1].lower()
+    return name[:-4] if name.endswith(".exe") else name
+
+def _names_app(segment, stem):
+    segment = segment.lower()
+    return segment in APP_SUFFIXES or (len(stem) > 2 and stem in segment.replace(" ", ""))
+
+@lru_cache(maxsize=4096)
+def normalize_title(app_name, window_title, category=None):
+    """
+    What a window title is about: the domain or site for browsers, the file
+    name for documents, otherwise its first segment, without volatile parts
+    """
+    title = (window_title or "").strip()
+    while True:
+        stripped = _LEADING_MARKER.sub("", title)
+        if stripped == title:
+            break
+        title = stripped
+    title = _TRAILING_COUNTER.sub("", title)
+    if not title:
+        return ""
+
+    segments = [segment for segment in _SEPARATOR.split(title) if segment]
+    stem = _app_stem(app_name)
+    while len(segments) > 1 and _names_app(segments[-1], stem):
+        segments.pop()
+
+    if category is None:
+        import app_categorizer
+        category = app_categorizer.categorize(app_name)
+
+    if category == "Browser":
+        domain = _DOMAIN.search(title)
+        if domain:
+            result = domain.group(1).lower()
+            result = result[4:] if result.startswith("www.") else result
+        else:
+            # Sites put their own name last: "Video title - YouTube"
+            result = segments[-1]
+    else:
+        documents = [segment for segment in segments if _FILE_NAME.match(segment)]
+        result = documents[0] if documents else segments[0]
+
+    result = _VOLATILE.sub("#", _TRAILING_COUNTER.sub("", result)).strip()
+    return result[:MAX_TITLE_LENGTH]
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters over at most `capacity` items.
+
+    A new item arriving when the sketch is full replaces the item with the
+    smallest count and inherits that count as its error, so every reported
+    count is at least the true count and at most `error` above it. Any item
+    with more than total/capacity weight is guaranteed to be kept.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+
+    def add(self, item, weight=1):
+        """Count an item; returns the item it evicted, if any"""
+        self.total += weight
+        if item in self.counts:
+            self.counts[item] += weight
+            return None
+        if len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0
+            return None
+
+        # Linear scan: capacities are small, and evictions only happen for new items
+        victim = min(self.counts, key=self.counts.get)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[item] = floor + weight
+        self.errors[item] = floor
+        return victim
+
+    def top(self, n=None):
+        """[(item, count, error)], highest count first"""
+        ranked = sorted(self.counts.items(), key=lambda entry: (-entry[1], entry[0]))
+        return [(item, count, self.errors[item]) for item, count in ranked[:n]]
+
+class TitleAnalytics:
+    """Per-app Space-Saving sketches of normalized window titles"""
+
+    def __init__(self, app_capacity=DEFAULT_APP_CAPACITY, title_capacity=DEFAULT_TITLE_CAPACITY):
+        self.title_capacity = title_capacity
+        self.apps = SpaceSaving(app_capacity)
+        self.titles = {}
+        self._lock = threading.Lock()
+
+    def observe(self, app_name, window_title, weight=1, category=None):
+        """Count one title of an app, with a weight (a sample, or seconds)"""
+        if not app_name or weight <= 0:
+            return
+        title = normalize_title(app_name, window_title, category)
+        with self._lock:
+            evicted = self.apps.add(app_name, weight)
+            if evicted is not None:
+                self.titles.pop(evicted, None)
+            sketch = self.titles.get(app_name)
+            if sketch is None:
+                sketch = self.titles[app_name] = SpaceSaving(self.title_capacity)
+            sketch.add(title, weight)
+
+    def top_titles(self, app_name, n=10):
+        """[{"title", "weight", "error"}] for one app"""
+        with self._lock:
+            sketch = self.titles.get(app_name)
+            if sketch is None:
+                return []
+            return [{"title": title, "weight": count, "error": error} for title, count, error in sketch.top(n)]
+
+    def summary(self, n=10, apps=None):
+        """Top apps (all tracked ones unless `apps` is given) with their top n titles each"""
+        with self._lock:
+            ranked = self.apps.top(apps)
+        return {
+            "total": self.apps.total,
+            "apps": [{"app_name": app_name, "weight": count, "error": error,
+                      "titles": self.top_titles(app_name, n)} for app_name, count, error in ranked],
+        }
+
+_default_title_analytics = None
+
+def get_default_title_analytics():
+    """Get the process-wide title analytics"""
+    global _default_title_analytics
+    if _default_title_analytics is None:
+        _default_title_analytics = TitleAnalytics()
+    return _default_title_analytics
+
+def analyze_history(db_path=None, days=90, app_capacity=DEFAULT_APP_CAPACITY, title_capacity=DEFAULT_TITLE_CAPACITY):
+    """Stream the last `days` days of activities into a TitleAnalytics, weighted by seconds"""
+    import activity_sampler
+
+    analytics = TitleAnalytics(app_capacity, title_capacity)
+    since = (datetime.now() - timedelta(days=days)).isoformat()
+    conn = activity_sampler.connect(db_path or activity_sampler.DB_PATH)
+    try:
+        for app_name, window_title, duration, category in conn.execute(
+                "SELECT app_name, window_title, duration, category FROM activities WHERE start_time >= ?",
+                (since,)):
+            # Rows recorded without a category are categorized here
+            analytics.observe(app_name, window_title, duration or 0,
+                              category if category and category != "Unknown" else None)
+    finally:
+        conn.close()
+    return analytics
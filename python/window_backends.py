@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Window Backends - Probe-once registry of active window / window list sources
+
+Each platform has a few ways of answering "which window is focused" and
+"which windows are open": python-xlib, the xdotool/wmctrl/xprop tools,
+win32 APIs, osascript, or just the process table via psutil. Instead of
+trying them all on every sample, the registry probes the candidates once,
+picks the first (fastest) one that works and keeps using it. Missing tools
+are remembered, so a desktop without xdotool does not pay for failing forks
+on every poll. The chosen backend is only re-probed on demand, after
+several consecutive failures, or - while a faster candidate was rejected,
+e.g. because X was not up yet when the tracker started - every
+REPROBE_INTERVAL seconds, since a fallback like the process table
+"succeeds" with empty results and would otherwise be kept for good.
+
+status() reports the active backend, why it was chosen and why the faster
+candidates were rejected, so an empty result can be explained.
+'''
+
+import os
+import shutil
+import platform
+import subprocess
+import threading
+import time
+
+# Consecutive failures after which the registry probes the backends again
+FAILURE_THRESHOLD = int(os.environ.get("ACTIVITY_TRACKER_BACKEND_FAILURES", 3))
+
+# Seconds after which a fallback (or missing) backend is probed again
+REPROBE_INTERVAL = float(os.environ.get("ACTIVITY_TRACKER_BACKEND_REPROBE", 30.0))
+
+class BackendUnavailable(Exception):
+    """Raised by probe() when a backend cannot work on this machine"""
+
+_tool_paths = {}
+
+def which(tool):
+    """shutil.which with the result (including a miss) cached for the process"""
+    if tool not in _tool_paths:
+        _tool_paths[tool] = shutil.which(tool)
+    return _tool_paths[tool]
+
+def require_tools(*tools):
+    missing = [tool for tool in tools if which(tool) is None]
+    if missing:
+        raise BackendUnavailable(f"{', '.join(missing)} not found on PATH")
+
+def _process_windows(current_user_only=False):
+    """One entry per named process, keyed by pid and create time"""
+    import process_cache
+
+    username = None
+    if current_user_only:
+        import getpass
+        username = getpass.getuser()
+
+    windows = {}
+    for entry in process_cache.get_default_process_cache().scan():
+        # Kernel threads have no executable
+        if username and (entry["username"] != username or not entry["exe"]):
+            continue
+        # The process name, as activities are recorded under; the
+        # command-line identity tells interpreter processes apart
+        if entry["name"]:
+            windows[f"proc:{entry['pid']}:{entry['create_time']}"] = {
+                "app_name": entry["name"],
+                "title": entry["app_name"] or entry["name"],
+            }
+    return windows
+
+class XlibWindowBackend:
+    """In-process EWMH queries over python-xlib"""
+
+    name = "xlib"
+
+    def probe(self):
+        import xlib_backend
+        if xlib_backend.backend_error() is not None:
+            # Retry a connection that failed before (e.g. when re-probing)
+            xlib_backend.reset_backend()
+        if xlib_backend.get_backend() is None:
+            raise BackendUnavailable(f"no X display via python-xlib: {xlib_backend.backend_error()}")
+        return "python-xlib connected to the X display"
+
+    def _call(self, method):
+        import xlib_backend
+        backend = xlib_backend.get_backend()
+        if backend is None:
+            raise RuntimeError(f"X display unavailable: {xlib_backend.backend_error()}")
+        try:
+            return method(backend)
+        except Exception:
+            # Reconnect on the next call
+            xlib_backend.reset_backend()
+            raise
+
+    def active_window(self, deadline):
+        window = self._call(lambda backend: backend.active_window()) or {}
+        return {"app_name": window.get("wm_class", ""), "window_title": window.get("title", "")}
+
+    def list_windows(self, deadline):
+        windows = {}
+        for window in self._call(lambda backend: backend.list_windows()):
+            if window["instance"]:
+                windows[f"x11:{window['window_id']}"] = {
+                    "app_name": window["instance"],
+                    "title": window["title"],
+                }
+        return windows
+
+class X11ToolsBackend:
+    """xdotool for the focused window, wmctrl and xprop for the window list"""
+
+    name = "x11-tools"
+
+    def probe(self):
+        if not os.environ.get("DISPLAY"):
+            raise BackendUnavailable("DISPLAY is not set")
+        require_tools("xdotool")
+        if which("wmctrl") is None or which("xprop") is None:
+            return "xdotool found (window list falls back to the process table: wmctrl/xprop missing)"
+        return "xdotool, wmctrl and xprop found"
+
+    def active_window(self, deadline):
+        import command_runner
+
+        result = {"app_name": "", "window_title": ""}
+        try:
+            window_id = command_runner.check_output(["xdotool", "getactivewindow"], deadline)
+        except subprocess.CalledProcessError:
+            # xdotool exits non-zero when no window has focus
+            return result
+        except subprocess.TimeoutExpired:
+            result["timed_out"] = True
+            return result
+
+        # Name and class are independent, so ask for both at once
+        outputs, timed_out = command_runner.run_commands({
+            "app_name": ["xdotool", "getwindowclassname", window_id],
+            "window_title": ["xdotool", "getwindowname", window_id],
+        }, deadline)
+        for key, output in outputs.items():
+            if isinstance(output, BaseException):
+                raise output
+            if output.returncode == 0:
+                result[key] = output.stdout.strip()
+        if timed_out:
+            result["timed_out"] = True
+        return result
+
+    def list_windows(self, deadline):
+        import command_runner
+
+        if which("wmctrl") is None or which("xprop") is None:
+            return _process_windows(current_user_only=True)
+
+        titles = {}
+        try:
+            listing = command_runner.check_output(["wmctrl", "-l"], deadline)
+        except subprocess.TimeoutExpired:
+            return {"timed_out": True}
+        for line in listing.splitlines():
+            parts = line.split(None, 3)
+            if len(parts) >= 4:
+                titles[parts[0]] = parts[3]
+
+        # One xprop per window, run concurrently under the same deadline
+        outputs, timed_out = command_runner.run_commands(
+            {window_id: ["xprop", "-id", window_id, "WM_CLASS"] for window_id in titles}, deadline)
+
+        windows = {}
+        for window_id, output in outputs.items():
+            # Failures mean the window closed between wmctrl and xprop
+            if isinstance(output, BaseException) or output.returncode != 0 or "=" not in output.stdout:
+                continue
+            app_name = output.stdout.split("=")[1].strip().split(",")[0].strip('"')
+            windows[f"x11:{int(window_id, 16)}"] = {
+                "app_name": app_name,
+                "title": titles[window_id],
+            }
+        if timed_out:
+            windows["timed_out"] = True
+        return windows
+
+class Win32Backend:
+    """Foreground window via pywin32, processes via psutil"""
+
+    name = "win32"
+
+    def probe(self):
+        try:
+            import win32gui
+            import win32process
+            import psutil
+        except ImportError as e:
+            raise BackendUnavailable(f"missing Python library: {e.name}")
+        return "pywin32 and psutil available"
+
+    def active_window(self, deadline):
+        import win32gui
+        import win32process
+        import process_cache
+
+        # Get foreground window handle and title
+        hwnd = win32gui.GetForegroundWindow()
+        window_title = win32gui.GetWindowText(hwnd)
+
+        # Get process name, from the same cache the window list uses
+        _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        # The process name, as before the cache, so existing activities,
+        # app_categories.json keys and rollups keep matching
+        entry = process_cache.get_default_process_cache().lookup(pid)
+        app_name = entry["name"] if entry and entry["name"] else "Unknown"
+        return {"app_name": app_name, "window_title": window_title}
+
+    def list_windows(self, deadline):
+        return _process_windows()
+
+class OsaScriptBackend:
+    """System Events queries through osascript"""
+
+    name = "osascript"
+
+    ACTIVE_WINDOW_SCRIPT = '''
+    tell application "System Events"
+        set frontApp to name of first application process whose frontmost is true
+        set frontAppPath to path of first application process whose frontmost is true
+        set windowTitle to ""
+
+        tell process frontApp
+            if exists (1st window whose value of attribute "AXMain" is true) then
+                set windowTitle to name of 1st window whose value of attribute "AXMain" is true
+            end if
+        end tell
+
+        return frontApp & ":" & windowTitle & ":" & frontAppPath
+    end tell
+    '''
+
+    LIST_SCRIPT = '''
+    tell application "System Events"
+        set appList to ""
+        repeat with theProcess in application processes
+            set appName to name of theProcess
+            set appPath to path of theProcess
+            set appList to appList & appName & ":" & appPath & ";"
+        end repeat
+        return appList
+    end tell
+    '''
+
+    def probe(self):
+        require_tools("osascript")
+        return "osascript found"
+
+    def _run_script(self, script, deadline):
+        import command_runner
+        proc = command_runner.run_command(["osascript", "-e", script], deadline)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip() or f"osascript exited with {proc.returncode}")
+        return proc.stdout.strip()
+
+    def active_window(self, deadline):
+        result = {"app_name": "", "window_title": ""}
+        try:
+            output = self._run_script(self.ACTIVE_WINDOW_SCRIPT, deadline)
+        except subprocess.TimeoutExpired:
+            result["timed_out"] = True
+            return result
+
+        parts = output.split(":")
+        if len(parts) >= 3:
+            result["app_name"] = parts[0]
+            result["window_title"] = parts[1]
+        return result
+
+    def list_windows(self, deadline):
+        windows = {}
+        try:
+            output = self._run_script(self.LIST_SCRIPT, deadline)
+        except subprocess.TimeoutExpired:
+            return {"timed_out": True}
+
+        for app in output.split(";"):
+            if app and ":" in app:
+                parts = app.split(":")
+                app_name = parts[0]
+                app_path = ":".join(parts[1:])  # Rejoin path in case it contains colons
+                if app_name:
+                    windows[f"app:{app_path or app_name}"] = {
+                        "app_name": app_name,
+                        "title": app_name,
+                    }
+        return windows
+
+class ProcessTableBackend:
+    """Last resort: running processes from psutil, with no notion of focus"""
+
+    name = "psutil"
+
+    def probe(self):
+        try:
+            import psutil
+        except ImportError:
+            raise BackendUnavailable("psutil is not installed")
+        return "process table only; the focused window cannot be determined"
+
+    def active_window(self, deadline):
+        return {"app_name": "", "window_title": ""}
+
+    def list_windows(self, deadline):
+        # Without window information, the user's own processes are the best
+        # approximation of "running applications" (skips kernel threads and daemons)
+        return _process_windows(current_user_only=platform.system() != "Windows")
+
+def default_candidates(system=None):
+    """Backends to try on a platform, fastest first"""
+    system = system or platform.system()
+    if system == "Windows":
+        return [Win32Backend(), ProcessTableBackend()]
+    if system == "Darwin":
+        return [OsaScriptBackend(), ProcessTableBackend()]
+    if system == "Linux":
+        return [XlibWindowBackend(), X11ToolsBackend(), ProcessTableBackend()]
+    return [ProcessTableBackend()]
+
+class BackendRegistry:
+    """Chooses a window backend once and keeps it until it keeps failing"""
+
+    def __init__(self, candidates=None, failure_threshold=FAILURE_THRESHOLD, reprobe_interval=REPROBE_INTERVAL):
+        self._candidates = candidates
+        self.failure_threshold = failure_threshold
+        self.reprobe_interval = reprobe_interval
+        self._lock = threading.Lock()
+        self._backend = None
+        self._reason = ""
+        self._rejected = {}
+        self._failures = 0
+        self._last_error = None
+        self._probes = 0
+        self._probed_at = 0
+
+    def _probe(self):
+        """Try each candidate in order and keep the first that works"""
+        self._backend = None
+        self._reason = "no working backend"
+        self._rejected = {}
+        self._failures = 0
+        self._probes += 1
+        self._probed_at = time.monotonic()
+
+        candidates = self._candidates if self._candidates is not None else default_candidates()
+        for candidate in candidates:
+            try:
+                self._reason = candidate.probe()
+                self._backend = candidate
+                return
+            except BackendUnavailable as e:
+                self._rejected[candidate.name] = str(e)
+            except Exception as e:
+                self._rejected[candidate.name] = f"probe failed: {e}"
+
+    def degraded(self):
+        """Whether a faster candidate was rejected (or none works at all)"""
+        return bool(self._rejected)
+
+    def backend(self):
+        """The chosen backend, probing on first use and periodically while degraded"""
+        with self._lock:
+            if self._probes == 0:
+                self._probe()
+            elif self.degraded() and time.monotonic() - self._probed_at >= self.reprobe_interval:
+                # The rejected candidates may work now (X started, tools installed)
+                _tool_paths.clear()
+                self._probe()
+            return self._backend
+
+    def reprobe(self):
+        """Forget the cached choice (and tool lookups) and probe again"""
+        with self._lock:
+            _tool_paths.clear()
+            self._probe()
+            return self._status()
+
+    def call(self, operation, deadline=None):
+        """
+        Run operation ("active_window" or "list_windows") on the chosen backend,
+        within deadline (a command_runner.Deadline; the default budget if None).
+
+        Errors propagate to the caller, and a result that hit the deadline
+        carries "timed_out": True. Either counts as a failure, as does having
+        no backend at all: after FAILURE_THRESHOLD consecutive failures the
+        candidates are probed again.
+        """
+        backend = self.backend()
+        if backend is None:
+            error = f"No window backend available: {self._rejected}"
+            self._record_failure(None, error)
+            # The failure may have triggered a probe that found one
+            backend = self._backend
+            if backend is None:
+                raise RuntimeError(error)
+
+        if deadline is None:
+            import command_runner
+            deadline = command_runner.Deadline()
+
+        try:
+            result = getattr(backend, operation)(deadline)
+        except Exception as e:
+            self._record_failure(backend, f"{backend.name}.{operation}: {e}")
+            raise
+
+        if result.get("timed_out"):
+            self._record_failure(backend, f"{backend.name}.{operation}: timed out after {deadline.seconds}s")
+        elif self._failures:
+            with self._lock:
+                self._failures = 0
+        return result
+
+    def _record_failure(self, backend, error):
+        with self._lock:
+            self._failures += 1
+            self._last_error = error
+            if self._failures >= self.failure_threshold and self._backend is backend:
+                _tool_paths.clear()
+                self._probe()
+
+    def _status(self):
+        return {
+            "backend": self._backend.name if self._backend else None,
+            "reason": self._reason,
+            "rejected": dict(self._rejected),
+            "failures": self._failures,
+            "last_error": self._last_error,
+            "probes": self._probes,
+            "degraded": self.degraded(),
+        }
+
+    def status(self):
+        """Active backend, why it was chosen, and why faster ones were skipped"""
+        self.backend()
+        with self._lock:
+            return self._status()
+
+_default_registry = None
+
+def get_default_registry():
+    """Get the process-wide backend registry"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = BackendRegistry()
+    return _default_registry
@@ -6,253 +6,570 @@ Window Utilities - Advanced window tracking methods
 
 This module provides platform-specific window tracking functionality
 that may be complex to implement directly in Java/Kotlin.
+
+Besides one-shot commands, "serve" keeps the interpreter alive and answers
+line-delimited JSON requests on stdin, so the JVM side does not pay for a
+new Python process on every sample. "watch_active_window" streams one JSON
+line per focus or title change instead of being polled, and "sample"
+records coalesced activity intervals straight into the database.
+"export" keeps a columnar copy of the history that "analytics" aggregates
+with NumPy, and "top_titles" reports the most used window titles per app.
+
+Window queries go through the backend chosen once by window_backends;
+"get_backend_status" reports which one is active and why. "get_idle_state"
+says whether the user is active, idle or behind a locked screen, and how
+long to wait before the next sample.
+
+stdout only carries results: errors go to stderr through diagnostics.
+"--profile" (or "profile": true on a serve request) adds per-phase
+"timings" and the "diagnostics" reported along the way, and the serve
+"stats" command returns latency percentiles and cache hit rates.
 '''
 
-import os
-import platform
-import subprocess
 import json
 import sys
-import base64
-import io
-from PIL import Image
+import time
+import contextlib
+
+import diagnostics
+
+def _window_backend(operation):
+    """Run "active_window" or "list_windows" on the probed platform backend"""
+    import window_backends
+    with diagnostics.phase(operation):
+        return window_backends.get_default_registry().call(operation)
+
+_app_icon_util = None
+
+def _icons():
+    """
+    The app_icon_util module, imported on first use. Commands that never touch
+    icons don't pay for loading the icon pipeline, and per-window loops don't
+    repeat the import.
+    """
+    global _app_icon_util
+    if _app_icon_util is None:
+        import app_icon_util
+        _app_icon_util = app_icon_util
+    return _app_icon_util
+
+def _category(app_name):
+    """Category for an app from app_categories.json, or Unknown"""
+    try:
+        import app_categorizer
+        with diagnostics.phase("category"):
+            return app_categorizer.categorize(app_name)
+    except Exception as e:
+        diagnostics.report(f"Error categorizing {app_name}: {str(e)}")
+        return "Unknown"
+
+def _attach_icon_ref(result, app_name):
+    """
+    Add a reference to the app's stored icon (hash, file path and MIME type)
+    rather than inlining it as base64 on every sample
+    """
+    with diagnostics.phase("icon"):
+        ref = _icons().get_app_icon_ref(app_name)
+    result["icon_hash"] = ref["hash"]
+    result["icon_path"] = ref["path"]
+    result["icon_mime"] = ref["mime"]
 
 def get_active_window_info():
+    """Get information about the active window as a JSON string"""
+    return json.dumps(active_window_info())
+
+def active_window_info(include_icon=True):
     """Get information about the active window using platform-specific methods"""
-    system = platform.system()
-    result = {"app_name": "", "window_title": "", "category": "Unknown", "icon": ""}
+    result = {"app_name": "", "window_title": "", "category": "Unknown", "icon_hash": "", "icon_path": ""}
     
     try:
-        if system == "Windows":
-            # For Windows, we use Python libraries directly
-            try:
-                import win32gui
-                import win32process
-                import psutil
-                
-                # Get foreground window handle
-                hwnd = win32gui.GetForegroundWindow()
-                
-                # Get window title
-                window_title = win32gui.GetWindowText(hwnd)
-                
-                # Get process ID
-                _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                
-                # Get process name
-                try:
-                    process = psutil.Process(pid)
-                    app_name = process.name()
-                    
-                    # Try to get icon data
-                    if hasattr(process, 'exe'):
-                        try:
-                            from app_icon_util import get_app_icon
-                            icon_data = get_app_icon(app_name)
-                            if icon_data and not "error" in icon_data:
-                                result["icon"] = icon_data
-                        except Exception as e:
-                            print(f"Error getting icon: {str(e)}")
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    app_name = "Unknown"
-                    
-                result["app_name"] = app_name
-                result["window_title"] = window_title
-                
-            except ImportError:
-                # Fallback if libraries aren't available
-                result["app_name"] = "Python import error"
-        
-        elif system == "Darwin":  # macOS
-            # AppleScript to get active application name and window title
-            script = '''
-            tell application "System Events"
-                set frontApp to name of first application process whose frontmost is true
-                set frontAppPath to path of first application process whose frontmost is true
-                set windowTitle to ""
-                
-                tell process frontApp
-                    if exists (1st window whose value of attribute "AXMain" is true) then
-                        set windowTitle to name of 1st window whose value of attribute "AXMain" is true
-                    end if
-                end tell
-                
-                return frontApp & ":" & windowTitle & ":" & frontAppPath
-            end tell
-            '''
-            
-            proc = subprocess.run(["osascript", "-e", script], capture_output=True, text=True)
-            if proc.stdout:
-                parts = proc.stdout.strip().split(":")
-                if len(parts) >= 3:
-                    result["app_name"] = parts[0]
-                    result["window_title"] = parts[1]
-                    app_path = ":".join(parts[2:])  # Rejoin in case path contains colons
-                    
-                    # Try to get icon
-                    try:
-                        from app_icon_util import get_app_icon
-                        icon_data = get_app_icon(result["app_name"])
-                        if icon_data and not "error" in icon_data:
-                            result["icon"] = icon_data
-                    except Exception as e:
-                        print(f"Error getting macOS icon: {str(e)}")
-        
-        elif system == "Linux":
-            # Use xdotool to get active window info
-            try:
-                # Get window ID
-                window_id = subprocess.check_output(["xdotool", "getactivewindow"]).decode().strip()
-                
-                # Get window name
-                window_name = subprocess.check_output(
-                    ["xdotool", "getwindowname", window_id]
-                ).decode().strip()
-                
-                # Get window class (app name)
-                window_class = subprocess.check_output(
-                    ["xdotool", "getwindowclassname", window_id]
-                ).decode().strip()
-                
-                result["app_name"] = window_class
-                result["window_title"] = window_name
-                
-                # Try to get icon
-                try:
-                    from app_icon_util import get_app_icon
-                    icon_data = get_app_icon(result["app_name"])
-                    if icon_data and not "error" in icon_data:
-                        result["icon"] = icon_data
-                except Exception as e:
-                    print(f"Error getting Linux icon: {str(e)}")
-            except:
-                pass
+        result.update(_window_backend("active_window"))
     except Exception as e:
         result["error"] = str(e)
+        return result
+    
+    result["category"] = _category(result["app_name"])
     
-    return json.dumps(result)
+    # Try to get icon
+    try:
+        if include_icon and result["app_name"]:
+            _attach_icon_ref(result, result["app_name"])
+    except Exception as e:
+        diagnostics.report(f"Error getting icon for {result['app_name']}: {str(e)}")
+    
+    return result
 
-def get_running_applications():
-    """Get a list of all running applications using platform-specific methods"""
-    system = platform.system()
-    result = {}
+def get_running_applications(include_icons=False):
+    """Get a list of all running applications as a JSON string"""
+    return json.dumps(running_applications(include_icons))
+
+def running_windows():
+    """
+    Enumerate running applications as per-window entries.
     
+    Returns a dict keyed by a stable identity (the X window id, or the
+    process pid and create time) mapping to {"app_name": ..., "title": ...}.
+    An "error" key is set if enumeration failed, and "timed_out" if it hit
+    the command deadline and only covers part of the windows.
+    """
     try:
-        if system == "Windows":
-            try:
-                import psutil
-                
-                for proc in psutil.process_iter(['pid', 'name', 'exe']):
-                    try:
-                        proc_info = proc.info()
-                        app_name = proc_info['name']
-                        
-                        if app_name and app_name not in result:
-                            # Try to get window title if available
-                            window_title = ""
-                            
-                            # Try to get icon
-                            icon_data = ""
-                            try:
-                                from app_icon_util import get_app_icon
-                                icon_data = get_app_icon(app_name)
-                            except Exception as e:
-                                print(f"Error getting icon for {app_name}: {str(e)}")
-                            
-                            # Store results with icon data
-                            result[app_name] = {
-                                "title": window_title or app_name,
-                                "icon": icon_data if icon_data and not "error" in icon_data else ""
-                            }
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
-            except ImportError:
-                result["error"] = "Missing required Python libraries"
-        
-        elif system == "Darwin":  # macOS
-            # AppleScript to get list of running applications
-            script = '''
-            tell application "System Events"
-                set appList to ""
-                repeat with theProcess in application processes
-                    set appName to name of theProcess
-                    set appPath to path of theProcess
-                    set appList to appList & appName & ":" & appPath & ";"
-                end repeat
-                return appList
-            end tell
-            '''
-            
-            proc = subprocess.run(["osascript", "-e", script], capture_output=True, text=True)
-            if proc.stdout:
-                apps = proc.stdout.strip().split(";")
-                for app in apps:
-                    if app and ":" in app:
-                        parts = app.split(":")
-                        app_name = parts[0]
-                        app_path = ":".join(parts[1:])  # Rejoin path in case it contains colons
-                        
-                        if app_name:
-                            # Try to get icon
-                            icon_data = ""
-                            try:
-                                from app_icon_util import get_app_icon
-                                icon_data = get_app_icon(app_name)
-                            except Exception as e:
-                                print(f"Error getting icon for {app_name}: {str(e)}")
-                            
-                            result[app_name] = {
-                                "title": app_name,
-                                "icon": icon_data if icon_data and not "error" in icon_data else ""
-                            }
+        return _window_backend("list_windows")
+    except Exception as e:
+        return {"error": str(e)}
+
+# Per-window state from the previous enumeration, so icon references are only
+# resolved for windows that are new or now belong to a different app
+_known_windows = {}
+
+def _window_icon_key(identity, app_name):
+    """Icon reference for a window, reused from the previous enumeration when possible"""
+    known = _known_windows.get(identity)
+    if known is not None and known["app_name"] == app_name:
+        return known["icon_key"]
+    
+    try:
+        with diagnostics.phase("icon_key"):
+            return _icons().get_icon_key(app_name)
+    except Exception as e:
+        diagnostics.report(f"Error getting icon key for {app_name}: {str(e)}")
+        return ""
+
+def _app_icon(app_name):
+    """Icon data URL for an app, or an empty string"""
+    icon_data = ""
+    try:
+        with diagnostics.phase("icon"):
+            icon_data = _icons().get_app_icon(app_name)
+    except Exception as e:
+        diagnostics.report(f"Error getting icon for {app_name}: {str(e)}")
+    return icon_data if icon_data and not "error" in icon_data else ""
+
+def running_applications(include_icons=False):
+    """
+    Get a map of running application names to their title, category and icon_key.
+    
+    Icons are not extracted during enumeration; clients fetch them lazily with
+    get_app_icon for the apps they display, using icon_key to know when a
+    previously fetched icon is stale. include_icons inlines them as before.
+    """
+    global _known_windows
+    windows = running_windows()
+    result = {}
+    
+    if "error" in windows:
+        result["error"] = windows.pop("error")
+    if windows.pop("timed_out", False):
+        result["timed_out"] = True
+    
+    known_windows = {}
+    for identity, window in windows.items():
+        app_name = window["app_name"]
+        icon_key = _window_icon_key(identity, app_name)
+        known_windows[identity] = dict(window, icon_key=icon_key)
         
-        elif system == "Linux":
-            # Use wmctrl to get list of windows
-            try:
-                output = subprocess.check_output(["wmctrl", "-l"]).decode()
-                for line in output.splitlines():
-                    parts = line.split(None, 3)
-                    if len(parts) >= 4:
-                        window_id = parts[0]
-                        window_title = parts[3]
-                        
-                        # Get window class
-                        try:
-                            window_class = subprocess.check_output(
-                                ["xprop", "-id", window_id, "WM_CLASS"]
-                            ).decode().strip()
-                            if "=" in window_class:
-                                app_name = window_class.split("=")[1].strip().split(",")[0].strip('"')
-                                
-                                # Try to get icon
-                                icon_data = ""
-                                try:
-                                    from app_icon_util import get_app_icon
-                                    icon_data = get_app_icon(app_name)
-                                except Exception as e:
-                                    print(f"Error getting icon for {app_name}: {str(e)}")
-                                
-                                result[app_name] = {
-                                    "title": window_title,
-                                    "icon": icon_data if icon_data and not "error" in icon_data else ""
-                                }
-                        except:
-                            pass
-            except:
-                pass
+        result[app_name] = {"title": window["title"], "category": _category(app_name), "icon_key": icon_key}
+        if include_icons:
+            result[app_name]["icon"] = _app_icon(app_name)
+    _known_windows = known_windows
+    
+    return result
+
+def running_applications_delta(since=None):
+    """
+    Get running applications as a full snapshot or as changes since a token.
+    
+    Without a token (or with one this process no longer knows) the result is
+    {"token": ..., "full": true, "apps": {...}}. With a known token it is
+    {"token": ..., "full": false, "added": {...}, "changed": {...}, "removed": [...]}.
+    """
+    import app_snapshots
+    return app_snapshots.get_default_history().record(running_applications(), since)
+
+def _serve_get_app_icon(params):
+    """Serve handler for get_app_icon, unwrapping the JSON error string"""
+    app_name = params.get("app_name")
+    if not app_name:
+        raise ValueError("Missing parameter: app_name")
+    
+    import icon_normalize
+    from app_icon_util import get_app_icon, get_app_icon_variants
+    size = params.get("size", icon_normalize.DEFAULT_ICON_SIZE)
+    image_format = params.get("format", "png")
+    
+    # "sizes" asks for several variants at once, returned as {size: data URL}
+    if params.get("sizes"):
+        variants = get_app_icon_variants(app_name, params["sizes"], image_format)
+        return {str(size): icon for size, icon in variants.items()}
+    
+    icon_data = get_app_icon(app_name, size, image_format)
+    if not icon_data.startswith("data:"):
+        raise RuntimeError(json.loads(icon_data).get("error", "Icon not found"))
+    return icon_data
+
+def _serve_get_app_icon_ref(params):
+    """Serve handler for get_app_icon_ref"""
+    app_name = params.get("app_name")
+    if not app_name:
+        raise ValueError("Missing parameter: app_name")
+    
+    import icon_normalize
+    from app_icon_util import get_app_icon_ref
+    return get_app_icon_ref(app_name, params.get("size", icon_normalize.DEFAULT_ICON_SIZE), params.get("format", "png"))
+
+def _serve_invalidate_icon_cache(params):
+    """Serve handler for invalidate_icon_cache, optionally scoped to one app"""
+    import icon_cache
+    return icon_cache.get_default_cache().invalidate(params.get("app_name"))
+
+def backend_status(reprobe=False):
+    """Which window backend is in use and why, optionally probing again first"""
+    import idle_state
+    import window_backends
+    registry = window_backends.get_default_registry()
+    status = registry.reprobe() if reprobe else registry.status()
+    status["idle"] = idle_state.get_default_monitor().status()
+    return status
+
+def idle_info():
+    """User idle time, screen lock state and the recommended next sample interval"""
+    import idle_state
+    return idle_state.get_default_monitor().check()
+
+def _serve_get_active_window_info(params):
+    """Serve handler for get_active_window_info, counting the title for get_top_titles"""
+    result = active_window_info()
+    try:
+        import title_analytics
+        title_analytics.get_default_title_analytics().observe(
+            result["app_name"], result["window_title"], category=result["category"])
     except Exception as e:
-        result["error"] = str(e)
+        diagnostics.report(f"Error counting window title: {str(e)}")
+    return result
+
+def _serve_get_top_titles(params):
+    """Serve handler for get_top_titles: one app's top titles, or all tracked apps"""
+    import title_analytics
+    analytics = title_analytics.get_default_title_analytics()
+    n = int(params.get("n") or 10)
+    if params.get("app_name"):
+        return analytics.top_titles(params["app_name"], n)
+    return analytics.summary(n)
+
+# Latency of every command handled by this serve process
+_command_stats = diagnostics.CommandStats()
+
+def cache_stats():
+    """Hit rates of the caches this process has used so far"""
+    caches = {}
+    icon_cache = sys.modules.get("icon_cache")
+    if icon_cache is not None and icon_cache._default_cache is not None:
+        cache = icon_cache._default_cache
+        caches["icon_cache"] = diagnostics.hit_rate(cache.hits, cache.misses)
+    app_categorizer = sys.modules.get("app_categorizer")
+    if app_categorizer is not None and app_categorizer._default_categorizer is not None:
+        categorizer = app_categorizer._default_categorizer
+        caches["categories"] = diagnostics.hit_rate(categorizer.hits, categorizer.misses)
+    process_cache = sys.modules.get("process_cache")
+    if process_cache is not None and process_cache._default_process_cache is not None:
+        stats = process_cache._default_process_cache.stats()
+        caches["processes"] = dict(diagnostics.hit_rate(stats["reused"], stats["inspected"]), entries=stats["entries"])
+    return caches
+
+def _serve_stats(params):
+    """Serve handler for stats: latency percentiles per command and cache hit rates"""
+    return {
+        "uptime_s": round(time.time() - _command_stats.started, 1),
+        "commands": _command_stats.summary(),
+        "caches": cache_stats(),
+    }
+
+# Commands available in serve mode, each taking the request's params dict
+SERVE_COMMANDS = {
+    "get_active_window_info": _serve_get_active_window_info,
+    "get_running_applications": lambda params: running_applications(bool(params.get("include_icons"))),
+    "get_running_applications_delta": lambda params: running_applications_delta(params.get("since")),
+    "get_app_icon": _serve_get_app_icon,
+    "get_app_icon_ref": _serve_get_app_icon_ref,
+    "invalidate_icon_cache": _serve_invalidate_icon_cache,
+    "get_backend_status": lambda params: backend_status(bool(params.get("reprobe"))),
+    "get_top_titles": _serve_get_top_titles,
+    "get_idle_state": lambda params: idle_info(),
+    "stats": _serve_stats,
+    "ping": lambda params: "pong",
+}
+
+def _serve_get_app_icons(params):
+    """Serve handler for get_app_icons, yielding one item per app as it finishes"""
+    import icon_normalize
+    from app_icon_util import get_app_icons, DEFAULT_ICON_WORKERS
+    app_names = params.get("app_names") or []
+    return get_app_icons(
+        app_names,
+        int(params.get("workers") or DEFAULT_ICON_WORKERS),
+        params.get("size", icon_normalize.DEFAULT_ICON_SIZE),
+        params.get("format", "png"),
+    )
+
+# Streaming commands write one {"id": ..., "item": ...} line per yielded item,
+# followed by a final {"id": ..., "result": {"count": n}} line
+SERVE_STREAM_COMMANDS = {
+    "get_app_icons": _serve_get_app_icons,
+}
+
+def parse_request(line):
+    """Parse a serve-mode request line, returning (request, error)"""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return None, f"Invalid request: {str(e)}"
     
-    return json.dumps(result)
+    if not isinstance(request, dict):
+        return None, "Invalid request: expected a JSON object"
+    return request, None
+
+def handle_request(request):
+    """Run a parsed serve-mode request and return the response dict"""
+    response = {"id": request.get("id")}
+    command = request.get("command")
+    handler = SERVE_COMMANDS.get(command) if isinstance(command, str) else None
+    if handler is None:
+        response["error"] = f"Unknown command: {command}"
+        return response
+    
+    try:
+        response["result"] = handler(request.get("params") or {})
+    except Exception as e:
+        response["error"] = str(e)
+    return response
+
+def handle_stream_request(request, write):
+    """Run a parsed streaming request, writing item lines, and return the final response"""
+    response = {"id": request.get("id")}
+    handler = SERVE_STREAM_COMMANDS[request.get("command")]
+    
+    count = 0
+    try:
+        for item in handler(request.get("params") or {}):
+            write({"id": request.get("id"), "item": item})
+            count += 1
+        response["result"] = {"count": count}
+    except Exception as e:
+        response["error"] = str(e)
+    return response
+
+def _stats_name(command):
+    """Name a request is recorded under for "stats": its command if known, else unknown"""
+    if isinstance(command, str) and (command in SERVE_COMMANDS or command in SERVE_STREAM_COMMANDS):
+        return command
+    return "unknown"
+
+def serve(stdin=None, stdout=None):
+    """
+    Run as a long-lived process speaking line-delimited JSON.
+    
+    Each input line is a request of the form
+    {"id": 1, "command": "get_app_icon", "params": {"app_name": "firefox"}}
+    and produces exactly one output line {"id": 1, "result": ...} or
+    {"id": 1, "error": "..."}. Streaming commands (get_app_icons) first write
+    one {"id": 1, "item": ...} line per item. The loop ends on EOF or a
+    "shutdown" command.
+    
+    A request with "profile": true gets "timings" (per-phase milliseconds,
+    subprocesses spawned, payload bytes) and "diagnostics" (errors reported
+    while handling it) in its response. Every request is recorded for the
+    "stats" command, under "unknown" when its command isn't one of ours.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    written = [0]
+    
+    def write(message):
+        line = json.dumps(message) + "\n"
+        written[0] += len(line)
+        stdout.write(line)
+        stdout.flush()
+    
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        
+        request, error = parse_request(line)
+        if error:
+            response = {"id": None, "error": error}
+        elif request.get("command") == "shutdown":
+            response = {"id": request.get("id"), "result": "bye"}
+        else:
+            command = _stats_name(request.get("command"))
+            started = time.perf_counter()
+            written[0] = 0
+            # Anything still printed by the platform code must not end up in
+            # the response stream, so send it to stderr while a request runs
+            with diagnostics.profiling(bool(request.get("profile"))) as profile, \
+                    contextlib.redirect_stdout(sys.stderr):
+                if command in SERVE_STREAM_COMMANDS:
+                    response = handle_stream_request(request, write)
+                else:
+                    response = handle_request(request)
+                if profile is not None:
+                    # Streamed items count towards the payload as well
+                    with diagnostics.phase("serialize"):
+                        payload_bytes = written[0] + len(json.dumps(response.get("result")))
+                    response["timings"] = profile.timings(payload_bytes)
+                    response["diagnostics"] = profile.diagnostics
+            _command_stats.record(command, (time.perf_counter() - started) * 1000, "error" in response)
+        
+        write(response)
+        
+        if request is not None and request.get("command") == "shutdown":
+            break
+
+def run_profiled(produce, profile=False):
+    """
+    Run a one-shot command and return its result as JSON text; with profile,
+    a dict result also gets "timings" and "diagnostics"
+    """
+    with diagnostics.profiling(profile) as active:
+        result = produce()
+        with diagnostics.phase("serialize"):
+            payload = json.dumps(result)
+        if active is None or not isinstance(result, dict):
+            return payload
+        return json.dumps(dict(result, timings=active.timings(len(payload)), diagnostics=active.diagnostics))
 
 # Main execution for command line use
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         command = sys.argv[1]
+        flags = sys.argv[2:]
+        profile = "--profile" in flags
+        positional = [arg for arg in flags if not arg.startswith("--")]
         if command == "get_active_window_info":
-            print(get_active_window_info())
+            print(run_profiled(active_window_info, profile))
         elif command == "get_running_applications":
-            print(get_running_applications())
+            print(run_profiled(lambda: running_applications("--with-icons" in flags), profile))
+        elif command == "get_running_applications_delta":
+            # A one-shot process has no history, so this is always a full snapshot
+            print(run_profiled(lambda: running_applications_delta(positional[0] if positional else None), profile))
+        elif command == "get_backend_status":
+            print(run_profiled(lambda: backend_status("--reprobe" in flags), profile))
+        elif command == "get_idle_state":
+            print(run_profiled(idle_info, profile))
+        elif command == "serve":
+            serve()
+        elif command == "report":
+            import argparse
+            import activity_report
+            import activity_sampler
+            
+            parser = argparse.ArgumentParser(prog="window_utils.py report",
+                                             description="Usage report for a day or a range of days, from rollup tables")
+            parser.add_argument("start_day", nargs="?", help="YYYY-MM-DD (default: today)")
+            parser.add_argument("end_day", nargs="?", help="YYYY-MM-DD (default: start_day)")
+            parser.add_argument("--save", action="store_true", help="write the report to data/reports")
+            parser.add_argument("--rebuild", action="store_true", help="recompute the rollups from all activities")
+            parser.add_argument("--db", default=activity_sampler.DB_PATH)
+            options = parser.parse_args(sys.argv[2:])
+            
+            report = activity_report.generate_report(options.start_day, options.end_day, options.db, options.rebuild)
+            if options.save:
+                start_day = options.start_day or activity_report.date.today().isoformat()
+                print(activity_report.save_report(report, activity_report.report_path(start_day, options.end_day)))
+            else:
+                sys.stdout.write(report)
+        elif command == "export":
+            import argparse
+            import activity_export
+            import activity_sampler
+            
+            parser = argparse.ArgumentParser(prog="window_utils.py export",
+                                             description="Append new activities to the columnar export (needs numpy)")
+            parser.add_argument("--rebuild", action="store_true", help="discard the export and start over")
+            parser.add_argument("--db", default=activity_sampler.DB_PATH)
+            parser.add_argument("--out", default=activity_export.EXPORT_DIR)
+            options = parser.parse_args(sys.argv[2:])
+            try:
+                activity_export.require_numpy()
+                print(json.dumps(activity_export.export_activities(options.db, options.out, options.rebuild)))
+            except Exception as e:
+                print(json.dumps({"error": str(e)}))
+        elif command == "analytics":
+            import argparse
+            import activity_analytics
+            import activity_export
+            
+            parser = argparse.ArgumentParser(prog="window_utils.py analytics",
+                                             description="Aggregates over the columnar export (needs numpy)")
+            parser.add_argument("kind", choices=["heatmap", "timeline", "weeks", "apps"])
+            parser.add_argument("start_day", help="YYYY-MM-DD")
+            parser.add_argument("end_day", nargs="?", help="YYYY-MM-DD (default: start_day)")
+            parser.add_argument("--out", default=activity_export.EXPORT_DIR, help="export directory")
+            options = parser.parse_args(sys.argv[2:])
+            try:
+                activity_export.require_numpy()
+                print(json.dumps(activity_analytics.summarize(
+                    options.kind,
+                    options.start_day,
+                    options.end_day or options.start_day,
+                    activity_export.ColumnarExport(options.out),
+                )))
+            except Exception as e:
+                print(json.dumps({"error": str(e)}))
+        elif command == "top_titles":
+            import argparse
+            import activity_sampler
+            import title_analytics
+            
+            parser = argparse.ArgumentParser(prog="window_utils.py top_titles",
+                                             description="Most used window titles per app, from activity history")
+            parser.add_argument("--days", type=int, default=90, help="how far back to look")
+            parser.add_argument("--app", help="only this app")
+            parser.add_argument("-n", type=int, default=10, help="titles per app")
+            parser.add_argument("--db", default=activity_sampler.DB_PATH)
+            options = parser.parse_args(sys.argv[2:])
+            
+            analytics = title_analytics.analyze_history(options.db, options.days)
+            if options.app:
+                print(json.dumps(analytics.top_titles(options.app, options.n)))
+            else:
+                print(json.dumps(analytics.summary(options.n)))
+        elif command == "sample":
+            import argparse
+            import activity_sampler
+            
+            parser = argparse.ArgumentParser(prog="window_utils.py sample",
+                                             description="Record active window intervals into the activity database")
+            parser.add_argument("--interval-s", type=float, default=activity_sampler.DEFAULT_SAMPLE_INTERVAL,
+                                help="seconds between samples")
+            parser.add_argument("--batch-size", type=int, default=activity_sampler.DEFAULT_BATCH_SIZE,
+                                help="flush after this many closed intervals")
+            parser.add_argument("--flush-s", type=float, default=activity_sampler.DEFAULT_FLUSH_INTERVAL,
+                                help="flush at least this often")
+            parser.add_argument("--db", default=activity_sampler.DB_PATH)
+            options = parser.parse_args(sys.argv[2:])
+            print(json.dumps(activity_sampler.run_sampler(
+                interval=options.interval_s,
+                batch_size=options.batch_size,
+                flush_interval=options.flush_s,
+                db_path=options.db,
+            )))
+        elif command == "watch_active_window":
+            import argparse
+            from window_watch import watch_active_window
+            
+            parser = argparse.ArgumentParser(prog="window_utils.py watch_active_window")
+            parser.add_argument("--debounce-ms", type=int, default=300,
+                                help="coalesce changes until the state is stable this long")
+            parser.add_argument("--max-delay-ms", type=int, default=2000,
+                                help="emit at the latest after this much continuous churn")
+            parser.add_argument("--heartbeat-s", type=float, default=30.0,
+                                help="interval between heartbeat lines")
+            options = parser.parse_args(sys.argv[2:])
+            watch_active_window(
+                debounce=options.debounce_ms / 1000,
+                max_delay=options.max_delay_ms / 1000,
+                heartbeat=options.heartbeat_s,
+            )
         else:
             print(json.dumps({"error": f"Unknown command: {command}"}))
     else:
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Window Watch - Push-based stream of active window changes
+
+Instead of sampling on a fixed interval, the watcher emits one JSON line only
+when the focused app or window title changes. On X11 it sleeps on
+PropertyNotify events; elsewhere it polls with an interval that backs off
+while nothing changes. Rapid title churn (tab loading, terminal titles) is
+coalesced by a debounce window, and a heartbeat line is written periodically
+so the reader can tell a quiet desktop from a dead process. If the X
+connection fails mid-stream, the watcher drops it and carries on polling.
+'''
+
+import json
+import sys
+import time
+
+import diagnostics
+
+DEFAULT_DEBOUNCE = 0.3
+DEFAULT_MAX_DELAY = 2.0
+DEFAULT_HEARTBEAT = 30.0
+
+# Adaptive polling bounds for platforms without change events
+MIN_POLL_INTERVAL = 0.25
+MAX_POLL_INTERVAL = 2.0
+POLL_BACKOFF = 1.5
+
+class XlibEventSource:
+    """Reads the active window and waits for PropertyNotify events"""
+
+    name = "xlib"
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def read(self):
+        window = self.backend.active_window() or {}
+        # Follow the focused window so its title changes wake us up
+        self.backend.watch(window.get("window_id"))
+        return (window.get("wm_class", ""), window.get("title", ""))
+
+    def wait(self, timeout):
+        return self.backend.wait_for_change(timeout)
+
+    def changed(self, state_changed):
+        pass
+
+class PollingSource:
+    """Polls the active window, backing off while nothing changes"""
+
+    name = "poll"
+
+    def __init__(self, read_state, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+        self.read_state = read_state
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+
+    def read(self):
+        return self.read_state()
+
+    def wait(self, timeout):
+        # Sleep until the next poll is due, or return early for a pending deadline
+        delay = min(self.interval, max(timeout, 0))
+        time.sleep(delay)
+        return delay >= self.interval
+
+    def changed(self, state_changed):
+        if state_changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * POLL_BACKOFF, self.max_interval)
+
+class ActiveWindowWatcher:
+    """
+    Debounces active window states from a source and emits change events.
+
+    A new state is emitted once it has been stable for `debounce` seconds, or
+    after `max_delay` seconds of continuous churn. Each change carries the
+    monotonic timestamp at which the emitted state was first observed.
+    """
+
+    def __init__(self, source, emit, debounce=DEFAULT_DEBOUNCE, max_delay=DEFAULT_MAX_DELAY,
+                 heartbeat=DEFAULT_HEARTBEAT, clock=time.monotonic):
+        self.source = source
+        self.emit = emit
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self.heartbeat = heartbeat
+        self.clock = clock
+        self.current = None
+        self._pending = None
+        self._pending_since = None
+        self._churn_since = None
+
+    def _event(self, kind, state, timestamp):
+        return {
+            "event": kind,
+            "app_name": state[0],
+            "window_title": state[1],
+            "timestamp": timestamp,
+            "source": self.source.name,
+        }
+
+    def observe(self, state, now):
+        """Feed one observed state; returns a change event when one is due"""
+        if state != (self._pending if self._pending is not None else self.current):
+            self._pending = state
+            self._pending_since = now
+            if self._churn_since is None:
+                self._churn_since = now
+
+        if self._pending is None:
+            return None
+
+        stable = now - self._pending_since >= self.debounce
+        overdue = now - self._churn_since >= self.max_delay
+        if not (stable or overdue):
+            return None
+
+        state, since = self._pending, self._pending_since
+        self._pending = None
+        self._churn_since = None
+        if state == self.current:
+            return None
+
+        self.current = state
+        return self._event("change", state, since)
+
+    def next_timeout(self, now, next_heartbeat):
+        """Seconds until the next debounce or heartbeat deadline"""
+        deadline = next_heartbeat
+        if self._pending is not None:
+            deadline = min(deadline, self._pending_since + self.debounce, self._churn_since + self.max_delay)
+        return max(deadline - now, 0)
+
+    def run(self, max_events=None):
+        """Watch until interrupted (or until max_events lines were emitted)"""
+        emitted = 0
+        now = self.clock()
+        next_heartbeat = now + self.heartbeat
+
+        # Report the initial state right away (after a source switch, only if it changed)
+        state = self.source.read()
+        event = self._event("change", state, now) if state != self.current else None
+        self.current = state
+
+        while True:
+            if event is not None:
+                self.emit(event)
+                emitted += 1
+                if max_events is not None and emitted >= max_events:
+                    return
+
+            now = self.clock()
+            woke = self.source.wait(self.next_timeout(now, next_heartbeat))
+            now = self.clock()
+
+            event = None
+            if woke:
+                state = self.source.read()
+                self.source.changed(state != self.current)
+                event = self.observe(state, now)
+            elif self._pending is not None:
+                event = self.observe(self._pending, now)
+
+            if event is None and now >= next_heartbeat and self.current is not None:
+                event = self._event("heartbeat", self.current, now)
+            if now >= next_heartbeat:
+                next_heartbeat = now + self.heartbeat
+
+def _emit_line(event):
+    sys.stdout.write(json.dumps(event) + "\n")
+    sys.stdout.flush()
+
+def create_source():
+    """Use X11 events where available, otherwise adaptive polling"""
+    import window_backends
+    registry = window_backends.get_default_registry()
+    if registry.backend() is not None and registry.backend().name == "xlib":
+        import xlib_backend
+        backend = xlib_backend.get_backend()
+        if backend is not None:
+            return XlibEventSource(backend)
+
+    return create_polling_source()
+
+def create_polling_source():
+    """Poll the active window through the window backend registry"""
+    from window_utils import active_window_info
+
+    def read_state():
+        info = active_window_info(include_icon=False)
+        return (info.get("app_name", ""), info.get("window_title", ""))
+
+    return PollingSource(read_state)
+
+def _xlib_errors():
+    """Exceptions meaning the X connection or a request on it failed"""
+    from Xlib import error
+    return (error.XError, error.ConnectionClosedError, error.DisplayError, OSError)
+
+def watch_active_window(debounce=DEFAULT_DEBOUNCE, heartbeat=DEFAULT_HEARTBEAT, max_delay=DEFAULT_MAX_DELAY):
+    """Stream active window changes to stdout until stdin/stdout closes"""
+    watcher = ActiveWindowWatcher(create_source(), _emit_line, debounce=debounce,
+                                  max_delay=max_delay, heartbeat=heartbeat)
+    while True:
+        try:
+            watcher.run()
+            return
+        except (KeyboardInterrupt, BrokenPipeError):
+            return
+        except Exception as e:
+            if watcher.source.name != "xlib" or not isinstance(e, _xlib_errors()):
+                raise
+            # Keep streaming: drop the connection and poll like other platforms
+            import xlib_backend
+            diagnostics.report(f"X connection failed while watching, falling back to polling: {str(e)}")
+            xlib_backend.reset_backend()
+            watcher.source = create_polling_source()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Xlib Backend - In-process X11 window queries for Linux
+
+Reads the EWMH properties (_NET_ACTIVE_WINDOW, _NET_CLIENT_LIST, _NET_WM_NAME,
+_NET_WM_PID) and WM_CLASS over a single reused display connection, instead of
+forking xdotool/wmctrl/xprop. Property reads for many windows are sent as one
+burst of requests before any reply is awaited.
+'''
+
+# Properties read for every window
+WINDOW_PROPERTIES = ["_NET_WM_NAME", "WM_NAME", "WM_CLASS", "_NET_WM_PID"]
+
+ATOM_NAMES = ["_NET_ACTIVE_WINDOW", "_NET_CLIENT_LIST", "UTF8_STRING"] + WINDOW_PROPERTIES
+
+# Property changes that can alter the focused app or its title
+WATCHED_PROPERTIES = ["_NET_ACTIVE_WINDOW", "_NET_WM_NAME", "WM_NAME"]
+
+def _decode(value, encoding):
+    if isinstance(value, bytes):
+        return value.decode(encoding, errors='replace')
+    return value or ""
+
+class XlibBackend:
+    """Window queries over one python-xlib display connection"""
+
+    def __init__(self, display=None):
+        from Xlib import X, error
+        from Xlib.protocol import request
+
+        if display is None:
+            from Xlib import display as xdisplay
+            display = xdisplay.Display()
+
+        self._X = X
+        self._catch_error = error.CatchError
+        self._any_property_type = X.AnyPropertyType
+        self._get_property = request.GetProperty
+        self.display = display
+        self.root = display.screen().root
+        self.atoms = {name: display.intern_atom(name) for name in ATOM_NAMES}
+        self._watched_window = None
+        self._root_watched = False
+
+    def close(self):
+        """Close the display connection"""
+        try:
+            self.display.close()
+        except Exception:
+            pass
+
+    def _root_property(self, name):
+        prop = self.root.get_full_property(self.atoms[name], self._any_property_type)
+        return list(prop.value) if prop is not None else []
+
+    def get_properties(self, window_ids):
+        """
+        Read WINDOW_PROPERTIES for all windows in one round-trip burst.
+
+        Every GetProperty request is written before the first reply is
+        awaited, so the cost is one round trip rather than one per property.
+        Windows that vanish in the meantime are skipped.
+        """
+        pending = []
+        for window_id in window_ids:
+            for name in WINDOW_PROPERTIES:
+                req = self._get_property(
+                    display=self.display.display,
+                    defer=True,
+                    delete=False,
+                    window=window_id,
+                    property=self.atoms[name],
+                    type=self._any_property_type,
+                    long_offset=0,
+                    long_length=1024,
+                )
+                pending.append((window_id, name, req))
+        self.display.flush()
+
+        properties = {}
+        for window_id, name, req in pending:
+            try:
+                req.reply()
+                value = req.value if req.property_type else None
+            except Exception:
+                # BadWindow: the window was destroyed mid-burst
+                properties[window_id] = None
+                continue
+            window_props = properties.setdefault(window_id, {})
+            if window_props is not None:
+                window_props[name] = value
+
+        return {wid: self._describe(wid, props) for wid, props in properties.items() if props is not None}
+
+    @staticmethod
+    def _describe(window_id, props):
+        """Turn raw property values into the fields window_utils reports"""
+        title = _decode(props.get("_NET_WM_NAME"), 'utf-8') or _decode(props.get("WM_NAME"), 'latin-1')
+
+        # WM_CLASS is "instance\0class\0"
+        class_parts = _decode(props.get("WM_CLASS"), 'latin-1').split('\0')
+        instance = class_parts[0] if class_parts else ""
+        wm_class = class_parts[1] if len(class_parts) > 1 else instance
+
+        pid_value = props.get("_NET_WM_PID")
+        pid = int(pid_value[0]) if pid_value else None
+
+        return {
+            "window_id": window_id,
+            "title": title,
+            "instance": instance,
+            "wm_class": wm_class,
+            "pid": pid,
+        }
+
+    def active_window_id(self):
+        """Id of the focused window, or None"""
+        value = self._root_property("_NET_ACTIVE_WINDOW")
+        return value[0] if value and value[0] else None
+
+    def client_window_ids(self):
+        """Ids of all managed top-level windows"""
+        return self._root_property("_NET_CLIENT_LIST")
+
+    def active_window(self):
+        """Describe the focused window, or return None if there is none"""
+        window_id = self.active_window_id()
+        if window_id is None:
+            return None
+        return self.get_properties([window_id]).get(window_id)
+
+    def list_windows(self):
+        """Describe every managed top-level window"""
+        window_ids = self.client_window_ids()
+        described = self.get_properties(window_ids)
+        return [described[wid] for wid in window_ids if wid in described]
+
+    def watch(self, window_id=None):
+        """
+        Subscribe to PropertyNotify events on the root window and, if given,
+        the focused window (whose title changes are reported on itself).
+        The previously focused window is unsubscribed, so only the current
+        one keeps sending events.
+        """
+        if window_id == self._watched_window and self._root_watched:
+            return
+
+        if not self._root_watched:
+            self.root.change_attributes(event_mask=self._X.PropertyChangeMask)
+            self._root_watched = True
+
+        if window_id != self._watched_window:
+            # Errors are ignored: either window may have been destroyed already
+            if self._watched_window:
+                window = self.display.create_resource_object('window', self._watched_window)
+                window.change_attributes(event_mask=self._X.NoEventMask, onerror=self._catch_error())
+            if window_id:
+                window = self.display.create_resource_object('window', window_id)
+                window.change_attributes(event_mask=self._X.PropertyChangeMask, onerror=self._catch_error())
+            self._watched_window = window_id
+        self.display.flush()
+
+    def wait_for_change(self, timeout):
+        """
+        Block up to timeout seconds for a relevant PropertyNotify event.
+
+        Returns True if the active window or a watched title may have changed.
+        """
+        import select
+
+        watched_atoms = {self.atoms[name] for name in WATCHED_PROPERTIES}
+        changed = False
+
+        if not self.display.pending_events():
+            readable, _, _ = select.select([self.display], [], [], max(timeout, 0))
+            if not readable:
+                return False
+
+        while self.display.pending_events():
+            event = self.display.next_event()
+            if event.type == self._X.PropertyNotify and event.atom in watched_atoms:
+                changed = True
+        return changed
+
+_backend = None
+_backend_error = None
+
+def get_backend():
+    """
+    Get the shared backend, connecting on first use.
+
+    Returns None when python-xlib or the X display is unavailable; the failure
+    is remembered so callers go straight to their fallback afterwards.
+    """
+    global _backend, _backend_error
+    if _backend is None and _backend_error is None:
+        try:
+            _backend = XlibBackend()
+        except Exception as e:
+            _backend_error = str(e)
+    return _backend
+
+def backend_error():
+    """Why the last connection attempt failed, or None"""
+    return _backend_error
+
+def reset_backend():
+    """Drop the shared connection, e.g. after the X server went away"""
+    global _backend, _backend_error
+    if _backend is not None:
+        _backend.close()
+    _backend = None
+    _backend_error = None
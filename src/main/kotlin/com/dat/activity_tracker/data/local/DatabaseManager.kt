@@ -129,13 +129,12 @@ class DatabaseManager(private val dbPath: String) {
     }
 
     /**
-     * Log a system event (startup/shutdown)
+     * Log a system event (startup/shutdown, or the user going idle/locked/active)
      */
-    fun logSystemEvent(eventType: String) {
+    fun logSystemEvent(eventType: String, timestamp: LocalDateTime = LocalDateTime.now()) {
         val conn = getConnection()
         
         try {
-            val timestamp = LocalDateTime.now()
             val stmt = conn.prepareStatement(
                 "INSERT INTO system_events (event_type, timestamp) VALUES (?, ?)"
             )
@@ -32,8 +32,8 @@ class ActivityRepositoryImpl(
         databaseManager.logActivity(appName, windowTitle, startTime, endTime, duration, category)
     }
 
-    override suspend fun logSystemEvent(eventType: String) = withContext(Dispatchers.IO) {
-        databaseManager.logSystemEvent(eventType)
+    override suspend fun logSystemEvent(eventType: String, timestamp: LocalDateTime) = withContext(Dispatchers.IO) {
+        databaseManager.logSystemEvent(eventType, timestamp)
     }
 
     override suspend fun getDailyUsage(date: String?): List<UsageInfo> = withContext(Dispatchers.IO) {
@@ -0,0 +1,13 @@
+package com.dat.activity_tracker.domain.model
+
+import java.time.LocalDateTime
+
+/**
+ * Data class for the user's presence: "active", "idle" or "locked", since
+ * when, and how long to wait before the next sample
+ */
+data class IdleState(
+    val state: String,
+    val since: LocalDateTime,
+    val nextIntervalMs: Long
+)
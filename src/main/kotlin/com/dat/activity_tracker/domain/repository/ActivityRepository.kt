@@ -24,9 +24,9 @@ interface ActivityRepository {
     )
     
     /**
-     * Log a system event (startup/shutdown)
+     * Log a system event (startup/shutdown, or the user going idle/locked/active)
      */
-    suspend fun logSystemEvent(eventType: String)
+    suspend fun logSystemEvent(eventType: String, timestamp: LocalDateTime = LocalDateTime.now())
     
     /**
      * Get daily usage statistics
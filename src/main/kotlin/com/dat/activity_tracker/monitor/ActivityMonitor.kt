@@ -187,8 +187,48 @@ class ActivityMonitor(
             // Variables for tracking
             var lastCheckTime = LocalDateTime.now()
             val backgroundCheckInterval = 5 // Check background apps every 5 seconds
+            var userState = "active"
             
             while (_isMonitoring.value) {
+                // 0. Skip sampling while the user is idle or the screen is locked
+                val idleState = pythonExecutor.getIdleState(interval)
+                if (idleState.state != userState) {
+                    activityRepository.logSystemEvent(idleState.state, idleState.since)
+                    logger.info("User is now ${idleState.state} (since ${idleState.since})")
+                    userState = idleState.state
+                }
+                
+                if (idleState.state != "active") {
+                    // End the current activity at the last input instead of crediting the time away
+                    if (currentApp.isNotBlank() && appStartTime != null) {
+                        val now = LocalDateTime.now()
+                        val idleStart = if (idleState.since.isBefore(now)) idleState.since else now
+                        val endTime = if (idleStart.isAfter(appStartTime)) idleStart else appStartTime!!
+                        val duration = java.time.Duration.between(appStartTime, endTime).seconds.toInt()
+                        if (duration > 0) {
+                            val prevAppCategory = appCategorizer.getCategory(currentApp)
+                            activityRepository.logActivity(
+                                currentApp,
+                                currentWindow,
+                                appStartTime!!,
+                                endTime,
+                                duration,
+                                prevAppCategory
+                            )
+                            logger.fine("Used $currentApp ($currentWindow) for $duration seconds")
+                        }
+                        
+                        // The next active sample starts a new activity
+                        currentApp = ""
+                        currentWindow = ""
+                        appStartTime = null
+                    }
+                    
+                    // Back off while nobody is there
+                    delay(maxOf(interval, idleState.nextIntervalMs))
+                    continue
+                }
+                
                 // 1. Monitor active window
                 val (appName, windowTitle, appCategory) = getActiveWindowInfo()
                 
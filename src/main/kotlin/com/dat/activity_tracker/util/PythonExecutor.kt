@@ -1,12 +1,28 @@
 package com.dat.activity_tracker.util
 
+import java.io.BufferedReader
+import java.io.BufferedWriter
 import java.io.File
+import java.util.concurrent.CompletableFuture
+import java.util.concurrent.TimeUnit
+import java.util.concurrent.TimeoutException
+import java.util.concurrent.atomic.AtomicLong
 import java.util.logging.Level
 import java.util.logging.Logger
 import org.json.JSONObject
+import com.dat.activity_tracker.domain.model.IdleState
+import java.time.LocalDateTime
 import java.nio.file.Files
 import java.nio.file.Paths
 
+// Upper bound for a one-shot script run; the scripts bound their own
+// platform queries well below this, so hitting it means the process hung
+private const val ONE_SHOT_TIMEOUT_SECONDS = 30L
+
+// Upper bound for the next line of a serve response (streamed items reset it);
+// requests are serialized, so a hung one would otherwise block every caller
+private const val SERVE_LINE_TIMEOUT_SECONDS = 15L
+
 /**
  * Executor for Python scripts - calls Python interpreter directly
  */
@@ -15,6 +31,49 @@ class PythonExecutor {
     private val pythonScriptsDir = File("python")
     private val pythonExecutable = findPythonExecutable()
     
+    // Running applications as last reported by the serve process, kept
+    // up to date from deltas against runningAppsToken
+    private val runningAppsCache = mutableMapOf<String, JSONObject>()
+    private var runningAppsToken: String? = null
+    
+    // Icons fetched on demand, keyed by the icon_key reported during enumeration
+    private val iconsByKey = mutableMapOf<String, String>()
+    
+    /**
+     * Long-lived "window_utils.py serve" process shared by all executors,
+     * so that frequent queries don't pay for interpreter startup each time
+     */
+    private object ServeProcess {
+        var process: Process? = null
+        var writer: BufferedWriter? = null
+        var reader: BufferedReader? = null
+        val requestIds = AtomicLong()
+        
+        init {
+            Runtime.getRuntime().addShutdownHook(Thread { stop() })
+        }
+        
+        fun stop() {
+            try {
+                writer?.close()
+            } catch (e: Exception) {
+                // Process is already gone
+            }
+            process?.destroy()
+            process = null
+            writer = null
+            reader = null
+        }
+    }
+    
+    /**
+     * Whether install_dependencies.py already ran in this JVM; executors are
+     * created per lookup, and the script only needs to run once
+     */
+    private object DependencyCheck {
+        var done = false
+    }
+    
     init {
         // Check if Python scripts directory exists
         if (!pythonScriptsDir.exists() || !File(pythonScriptsDir, "window_utils.py").exists()) {
@@ -23,10 +82,15 @@ class PythonExecutor {
         
         logger.info("Python executor initialized with Python executable: $pythonExecutable")
         
-        // Try to install dependencies
+        // Make sure dependencies are installed, once per application run
         try {
             if (File(pythonScriptsDir, "install_dependencies.py").exists()) {
-                installDependencies()
+                synchronized(DependencyCheck) {
+                    if (!DependencyCheck.done) {
+                        installDependencies()
+                        DependencyCheck.done = true
+                    }
+                }
             }
         } catch (e: Exception) {
             logger.log(Level.WARNING, "Failed to install Python dependencies: ${e.message}", e)
@@ -72,17 +136,13 @@ class PythonExecutor {
      */
     private fun installDependencies() {
         try {
-            val processBuilder = ProcessBuilder(
-                pythonExecutable,
-                Paths.get(pythonScriptsDir.absolutePath, "install_dependencies.py").toString()
-            )
-            processBuilder.directory(pythonScriptsDir)
-            processBuilder.redirectErrorStream(true)
-            
-            val process = processBuilder.start()
-            val output = process.inputStream.bufferedReader().readText()
-            val exitCode = process.waitFor()
+            // The fast --check path compares a stamp file and never runs pip
+            if (runInstallScript("--check").first == 0) {
+                logger.info("Python dependencies already satisfied")
+                return
+            }
             
+            val (exitCode, output) = runInstallScript()
             if (exitCode == 0) {
                 logger.info("Python dependencies installed successfully")
             } else {
@@ -93,6 +153,23 @@ class PythonExecutor {
         }
     }
     
+    /**
+     * Run install_dependencies.py with the given arguments, returning its exit code and output
+     */
+    private fun runInstallScript(vararg args: String): Pair<Int, String> {
+        val processBuilder = ProcessBuilder(
+            pythonExecutable,
+            Paths.get(pythonScriptsDir.absolutePath, "install_dependencies.py").toString(),
+            *args
+        )
+        processBuilder.directory(pythonScriptsDir)
+        processBuilder.redirectErrorStream(true)
+        
+        val process = processBuilder.start()
+        val output = process.inputStream.bufferedReader().readText()
+        return process.waitFor() to output
+    }
+    
     /**
      * Execute a Python function in a script
      */
@@ -108,31 +185,144 @@ class PythonExecutor {
             val commandList = mutableListOf(pythonExecutable, scriptPath, functionName)
             commandList.addAll(args)
             
+            // stderr carries the scripts' diagnostics and stays out of the JSON on stdout
             val processBuilder = ProcessBuilder(commandList)
-            processBuilder.redirectErrorStream(true)
             
             val process = processBuilder.start()
-            val output = process.inputStream.bufferedReader().readText()
-            val exitCode = process.waitFor()
+            
+            // Read output on other threads so a hung script can't block past the timeout
+            val output = CompletableFuture.supplyAsync { process.inputStream.bufferedReader().readText() }
+            val diagnostics = CompletableFuture.supplyAsync { process.errorStream.bufferedReader().readText() }
+            if (!process.waitFor(ONE_SHOT_TIMEOUT_SECONDS, TimeUnit.SECONDS)) {
+                process.destroyForcibly()
+                logger.warning("Python function $functionName timed out after ${ONE_SHOT_TIMEOUT_SECONDS}s")
+                return "{\"error\": \"Timed out after ${ONE_SHOT_TIMEOUT_SECONDS}s\", \"timed_out\": true}"
+            }
+            val exitCode = process.exitValue()
+            
+            val errors = diagnostics.get().trim()
+            if (errors.isNotEmpty()) {
+                logger.warning("Python function $functionName reported: $errors")
+            }
             
             if (exitCode != 0) {
                 logger.warning("Python script returned non-zero exit code: $exitCode")
-                return "{\"error\": \"Execution failed with exit code $exitCode\", \"output\": \"$output\"}"
+                return "{\"error\": \"Execution failed with exit code $exitCode\", \"output\": \"${output.get()}\"}"
             }
             
-            return output.trim()
+            return output.get().trim()
         } catch (e: Exception) {
             logger.log(Level.SEVERE, "Error executing Python function: ${e.message}", e)
             return "{\"error\": \"${e.message}\"}"
         }
     }
     
+    /**
+     * Start the shared serve process if it isn't running
+     */
+    private fun ensureServeProcess(): Boolean {
+        if (ServeProcess.process?.isAlive == true) {
+            return true
+        }
+        
+        val scriptPath = Paths.get(pythonScriptsDir.absolutePath, "window_utils.py").toString()
+        if (!Files.exists(Paths.get(scriptPath))) {
+            return false
+        }
+        
+        try {
+            ServeProcess.stop()
+            
+            val processBuilder = ProcessBuilder(pythonExecutable, scriptPath, "serve")
+            processBuilder.redirectError(ProcessBuilder.Redirect.DISCARD)
+            
+            val process = processBuilder.start()
+            ServeProcess.process = process
+            ServeProcess.writer = process.outputStream.bufferedWriter()
+            ServeProcess.reader = process.inputStream.bufferedReader()
+            logger.info("Started Python serve process")
+            return true
+        } catch (e: Exception) {
+            logger.log(Level.WARNING, "Failed to start Python serve process: ${e.message}", e)
+            ServeProcess.stop()
+            return false
+        }
+    }
+    
+    /**
+     * Send a request to the serve process and return its result as a string,
+     * or null if the serve process is unavailable (callers then fall back to
+     * a one-shot execution). Items of streaming commands are passed to onItem
+     * as they arrive.
+     */
+    fun callServe(
+        command: String,
+        params: JSONObject = JSONObject(),
+        onItem: ((JSONObject) -> Unit)? = null
+    ): String? {
+        synchronized(ServeProcess) {
+            if (!ensureServeProcess()) {
+                return null
+            }
+        
+            try {
+                val requestId = ServeProcess.requestIds.incrementAndGet()
+                val request = JSONObject()
+                    .put("id", requestId)
+                    .put("command", command)
+                    .put("params", params)
+            
+                ServeProcess.writer!!.write(request.toString())
+                ServeProcess.writer!!.newLine()
+                ServeProcess.writer!!.flush()
+            
+                // Responses come back in request order; skip any stale ones
+                val reader = ServeProcess.reader!!
+                while (true) {
+                    // Read on another thread so a hung request can't hold the lock past the timeout
+                    val line = CompletableFuture.supplyAsync { reader.readLine() }
+                        .get(SERVE_LINE_TIMEOUT_SECONDS, TimeUnit.SECONDS)
+                        ?: throw IllegalStateException("Serve process exited")
+                    val response = JSONObject(line)
+                    if (response.optLong("id", -1) != requestId) {
+                        continue
+                    }
+                    
+                    if (response.has("item")) {
+                        onItem?.invoke(response.getJSONObject("item"))
+                        continue
+                    }
+                
+                    if (response.has("error")) {
+                        return JSONObject().put("error", response.getString("error")).toString()
+                    }
+                    return response.get("result").toString()
+                }
+            } catch (e: TimeoutException) {
+                logger.warning("Python serve request $command timed out after ${SERVE_LINE_TIMEOUT_SECONDS}s, restarting on next call")
+                ServeProcess.stop()
+                return null
+            } catch (e: Exception) {
+                logger.warning("Python serve request failed, restarting on next call: ${e.message}")
+                ServeProcess.stop()
+                return null
+            }
+        }
+    }
+    
+    /**
+     * Run a window_utils command, preferring the serve process
+     */
+    private fun executeWindowUtils(command: String): String {
+        return callServe(command) ?: executePythonFunction("window_utils", command)
+    }
+    
     /**
      * Get active window information using Python
      */
     fun getActiveWindowInfo(): Triple<String, String, String> {
         try {
-            val result = executePythonFunction("window_utils", "get_active_window_info")
+            val result = executeWindowUtils("get_active_window_info")
             
             try {
                 val jsonObject = JSONObject(result)
@@ -153,11 +343,12 @@ class PythonExecutor {
     }
     
     /**
-     * Get active window information including app icon
+     * Get active window information including the path of the app's icon file
+     * in the Python icon store
      */
     fun getActiveWindowInfoWithIcon(): Pair<Triple<String, String, String>, String> {
         try {
-            val result = executePythonFunction("window_utils", "get_active_window_info")
+            val result = executeWindowUtils("get_active_window_info")
             
             try {
                 val jsonObject = JSONObject(result)
@@ -165,9 +356,9 @@ class PythonExecutor {
                 val appName = jsonObject.optString("app_name", "")
                 val windowTitle = jsonObject.optString("window_title", "")
                 val category = jsonObject.optString("category", "Unknown")
-                val iconData = jsonObject.optString("icon", "")
+                val iconPath = jsonObject.optString("icon_path", "")
                 
-                return Pair(Triple(appName, windowTitle, category), iconData)
+                return Pair(Triple(appName, windowTitle, category), iconPath)
             } catch (e: Exception) {
                 logger.warning("Failed to parse active window info with icon: $result")
                 return Pair(Triple("", "", "Unknown"), "")
@@ -178,12 +369,88 @@ class PythonExecutor {
         }
     }
     
+    /**
+     * Get whether the user is active, idle or behind a locked screen, and the
+     * recommended delay before the next sample. Only asks the serve process:
+     * a one-shot Python per sample would cost more than it saves, so without
+     * it the user counts as active at the default interval.
+     */
+    fun getIdleState(defaultIntervalMs: Long = 1000): IdleState {
+        val active = IdleState("active", LocalDateTime.now(), defaultIntervalMs)
+        val result = callServe("get_idle_state") ?: return active
+        
+        try {
+            val jsonObject = JSONObject(result)
+            if (jsonObject.has("error") && !jsonObject.has("state")) {
+                return active
+            }
+            
+            return IdleState(
+                jsonObject.optString("state", "active"),
+                LocalDateTime.parse(jsonObject.getString("since")),
+                (jsonObject.optDouble("next_interval_s", defaultIntervalMs / 1000.0) * 1000).toLong()
+            )
+        } catch (e: Exception) {
+            logger.warning("Failed to parse idle state: $result")
+            return active
+        }
+    }
+    
+    /**
+     * Get running applications from the serve process as a delta against the
+     * previous call, or null if the serve process is unavailable
+     */
+    @Synchronized
+    private fun fetchRunningApplications(): Map<String, JSONObject>? {
+        val params = JSONObject()
+        runningAppsToken?.let { params.put("since", it) }
+        
+        val result = callServe("get_running_applications_delta", params) ?: return null
+        try {
+            val delta = JSONObject(result)
+            if (!delta.has("token")) {
+                logger.warning("Failed to get running applications delta: ${delta.optString("error")}")
+                return null
+            }
+            
+            if (delta.optBoolean("full", true)) {
+                runningAppsCache.clear()
+                val apps = delta.getJSONObject("apps")
+                for (key in apps.keys()) {
+                    runningAppsCache[key] = apps.getJSONObject(key)
+                }
+            } else {
+                for (section in listOf("added", "changed")) {
+                    val apps = delta.getJSONObject(section)
+                    for (key in apps.keys()) {
+                        runningAppsCache[key] = apps.getJSONObject(key)
+                    }
+                }
+                val removed = delta.getJSONArray("removed")
+                for (i in 0 until removed.length()) {
+                    runningAppsCache.remove(removed.getString(i))
+                }
+            }
+            
+            runningAppsToken = delta.getString("token")
+            return runningAppsCache.toMap()
+        } catch (e: Exception) {
+            logger.warning("Failed to parse running applications delta: ${e.message}")
+            runningAppsToken = null
+            return null
+        }
+    }
+    
     /**
      * Get running applications using Python
      */
     fun getRunningApplications(): Map<String, String> {
+        fetchRunningApplications()?.let { apps ->
+            return apps.mapValues { (_, appInfo) -> appInfo.getString("title") }
+        }
+        
         try {
-            val result = executePythonFunction("window_utils", "get_running_applications")
+            val result = executeWindowUtils("get_running_applications")
             
             try {
                 val jsonObject = JSONObject(result)
@@ -216,8 +483,12 @@ class PythonExecutor {
      * Get running applications with their icons
      */
     fun getRunningApplicationsWithIcons(): Map<String, Pair<String, String>> {
+        fetchRunningApplications()?.let { apps ->
+            return apps.mapValues { (appName, appInfo) -> Pair(appInfo.getString("title"), iconFor(appName, appInfo)) }
+        }
+        
         try {
-            val result = executePythonFunction("window_utils", "get_running_applications")
+            val result = executeWindowUtils("get_running_applications")
             
             try {
                 val jsonObject = JSONObject(result)
@@ -229,8 +500,7 @@ class PythonExecutor {
                         if (jsonObject.get(key) is JSONObject) {
                             val appInfo = jsonObject.getJSONObject(key)
                             val title = appInfo.getString("title")
-                            val icon = appInfo.optString("icon", "")
-                            runningApps[key] = Pair(title, icon)
+                            runningApps[key] = Pair(title, iconFor(key, appInfo))
                         } else {
                             // Old format - no icon data
                             runningApps[key] = Pair(jsonObject.getString(key), "")
@@ -249,12 +519,90 @@ class PythonExecutor {
         }
     }
     
+    /**
+     * Icon for an enumerated app: inline if present, otherwise fetched lazily
+     * and cached until the app's icon_key changes
+     */
+    private fun iconFor(appName: String, appInfo: JSONObject): String {
+        val inlineIcon = appInfo.optString("icon", "")
+        if (inlineIcon.isNotEmpty()) {
+            return inlineIcon
+        }
+        
+        val iconKey = appInfo.optString("icon_key", "")
+        if (iconKey.isEmpty()) {
+            return getAppIcon(appName) ?: ""
+        }
+        
+        synchronized(iconsByKey) {
+            iconsByKey[iconKey]?.let { return it }
+        }
+        
+        val icon = getAppIcon(appName) ?: return ""
+        synchronized(iconsByKey) {
+            iconsByKey[iconKey] = icon
+        }
+        return icon
+    }
+    
+    /**
+     * Get icon files for many apps in one batched, parallel request.
+     * Icons are written once to the Python icon store and only their paths
+     * cross the pipe. Apps whose icon could not be resolved are missing.
+     */
+    fun getAppIconFiles(appNames: List<String>): Map<String, File> {
+        val icons = mutableMapOf<String, File>()
+        if (appNames.isEmpty()) {
+            return icons
+        }
+        
+        val params = JSONObject().put("app_names", appNames)
+        val result = callServe("get_app_icons", params) { item ->
+            val appName = item.optString("app_name", "")
+            val path = item.optString("path", "")
+            if (path.isNotEmpty()) {
+                icons[appName] = File(path)
+            } else {
+                logger.warning("Error getting app icon for $appName: ${item.optString("error")}")
+            }
+        }
+        
+        if (result == null) {
+            // Serve process unavailable, fall back to one lookup per app
+            for (appName in appNames) {
+                getAppIconFile(appName)?.let { icons[appName] = it }
+            }
+        }
+        return icons
+    }
+    
+    /**
+     * Get the icon file for a single app from the Python icon store
+     */
+    fun getAppIconFile(appName: String): File? {
+        try {
+            val result = callServe("get_app_icon_ref", JSONObject().put("app_name", appName))
+                ?: executePythonFunction("app_icon_util", "get_app_icon_ref", appName)
+            
+            val jsonObject = JSONObject(result)
+            if (jsonObject.has("error")) {
+                logger.warning("Error getting app icon for $appName: ${jsonObject.getString("error")}")
+                return null
+            }
+            return File(jsonObject.getString("path"))
+        } catch (e: Exception) {
+            logger.log(Level.WARNING, "Exception getting app icon file for $appName: ${e.message}", e)
+            return null
+        }
+    }
+    
     /**
      * Get app icon using Python
      */
     fun getAppIcon(appName: String): String? {
         try {
-            val result = executePythonFunction("app_icon_util", "get_app_icon", appName)
+            val result = callServe("get_app_icon", JSONObject().put("app_name", appName))
+                ?: executePythonFunction("app_icon_util", "get_app_icon", appName)
             
             // Check if we got a data URL (not an error)
             if (result.startsWith("data:image")) {
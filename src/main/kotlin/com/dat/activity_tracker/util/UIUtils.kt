@@ -70,6 +70,33 @@ fun openReportFile(path: String) {
     }
 }
 
+// Shared executor, so icon lookups reuse one Python serve process
+private val iconExecutor by lazy { PythonExecutor() }
+
+/**
+ * Get icons for many applications with one batched Python request.
+ * The icons are read straight from the files in the Python icon store.
+ * Apps without a Python-provided icon are missing from the result.
+ */
+fun getAppIcons(appNames: List<String>): Map<String, ImageBitmap> {
+    val logger = Logger.getLogger("activity_tracker.util")
+    val result = mutableMapOf<String, ImageBitmap>()
+    
+    try {
+        for ((appName, iconFile) in iconExecutor.getAppIconFiles(appNames)) {
+            try {
+                ImageIO.read(iconFile)?.let { result[appName] = it.toComposeImageBitmap() }
+            } catch (e: Exception) {
+                logger.warning("Failed to read icon file ${iconFile.path}: ${e.message}")
+            }
+        }
+    } catch (e: Exception) {
+        logger.warning("Failed to get icons using Python executor: ${e.message}")
+    }
+    
+    return result
+}
+
 /**
  * Get app icon for the given application name
  * This function attempts multiple methods to retrieve the icon:
@@ -84,8 +111,7 @@ fun getAppIcon(appName: String): ImageBitmap? {
     try {
         // Method 1: Primary method - Try using the Python executor to get icon
         try {
-            val pythonExecutor = com.dat.activity_tracker.util.PythonExecutor()
-            val iconBase64 = pythonExecutor.getAppIcon(appName)
+            val iconBase64 = iconExecutor.getAppIcon(appName)
             
             // Check if we got a valid data URL
             if (iconBase64 != null && iconBase64.startsWith("data:image")) {